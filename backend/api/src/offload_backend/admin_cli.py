@@ -0,0 +1,149 @@
+"""Offline administration commands for the Offload backend.
+
+Run with ``python -m offload_backend.admin_cli <command>`` or the
+``offload-admin`` console script.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sys
+from collections.abc import Iterable, Sequence
+from typing import TextIO
+
+from offload_backend.config import get_settings
+from offload_backend.storage import build_stores, sqlite_backup_runner
+from offload_backend.usage_store import (
+    DEFAULT_EXPORT_PAGE_SIZE,
+    UsageRecord,
+    reshard_usage_databases,
+)
+
+EXPORT_FIELDS = ("install_id", "feature", "count", "updated_at")
+
+
+def write_usage_export(records: Iterable[UsageRecord], output: TextIO, *, fmt: str) -> int:
+    """Stream usage records as NDJSON or CSV, one row at a time. Returns rows written."""
+    written = 0
+    if fmt == "csv":
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_FIELDS)
+        for record in records:
+            writer.writerow(
+                (record.install_id, record.feature, record.count, record.updated_at or "")
+            )
+            written += 1
+        return written
+
+    for record in records:
+        output.write(
+            json.dumps(
+                {
+                    "install_id": record.install_id,
+                    "feature": record.feature,
+                    "count": record.count,
+                    "updated_at": record.updated_at,
+                },
+                separators=(",", ":"),
+            )
+        )
+        output.write("\n")
+        written += 1
+    return written
+
+
+def _export_usage(args: argparse.Namespace) -> int:
+    stores = build_stores(get_settings())
+    try:
+        records = stores.usage_store.iter_usage(page_size=args.page_size)
+        if args.output == "-":
+            written = write_usage_export(records, sys.stdout, fmt=args.format)
+        else:
+            with open(args.output, "w", encoding="utf-8", newline="") as output:
+                written = write_usage_export(records, output, fmt=args.format)
+    finally:
+        stores.close()
+    print(f"exported {written} usage rows", file=sys.stderr)
+    return 0
+
+
+def _reshard_usage(args: argparse.Namespace) -> int:
+    db_path = args.db_path or get_settings().usage_db_path
+    copied = reshard_usage_databases(
+        db_path=db_path,
+        from_shards=args.from_shards,
+        to_shards=args.to_shards,
+    )
+    print(
+        f"resharded {copied} usage rows from {args.from_shards} to {args.to_shards} shard(s)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _backup_usage(args: argparse.Namespace) -> int:
+    settings = get_settings()
+    directory = args.output_dir or settings.sqlite_backup_dir
+    if not directory:
+        print("backup-usage needs --output-dir or OFFLOAD_SQLITE_BACKUP_DIR", file=sys.stderr)
+        return 2
+    stores = build_stores(settings)
+    try:
+        if not stores.sqlite_managers:
+            print("backup-usage only supports the SQLite storage backend", file=sys.stderr)
+            return 2
+        reports = sqlite_backup_runner(settings, stores.sqlite_managers, directory=directory).run()
+    finally:
+        stores.close()
+    for report in reports:
+        print(
+            f"backed up {report.source} to {report.destination}: {report.pages} pages"
+            f" in {report.seconds:.2f}s ({report.pages_per_second:.0f} pages/s)",
+            file=sys.stderr,
+        )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="offload-admin")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser(
+        "export-usage",
+        help="Stream usage counts as newline-delimited JSON or CSV",
+    )
+    export.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    export.add_argument("--output", default="-", help="Output file path, or - for stdout")
+    export.add_argument("--page-size", type=int, default=DEFAULT_EXPORT_PAGE_SIZE)
+    export.set_defaults(handler=_export_usage)
+
+    reshard = commands.add_parser(
+        "reshard-usage",
+        help="Copy usage rows into a new shard layout (run with the API stopped)",
+    )
+    reshard.add_argument("--db-path", help="Base usage database path (default: settings)")
+    reshard.add_argument("--from-shards", type=int, required=True)
+    reshard.add_argument("--to-shards", type=int, required=True)
+    reshard.set_defaults(handler=_reshard_usage)
+
+    backup = commands.add_parser(
+        "backup-usage",
+        help="Take an online snapshot of every SQLite database (safe while the API runs)",
+    )
+    backup.add_argument(
+        "--output-dir", help="Backup directory (default: OFFLOAD_SQLITE_BACKUP_DIR)"
+    )
+    backup.set_defaults(handler=_backup_usage)
+
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
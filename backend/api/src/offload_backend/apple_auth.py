@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+import hashlib
+import time
+from collections.abc import Callable
+
 import jwt
-from jwt import PyJWKClient
+from starlette.concurrency import run_in_threadpool
+
+from offload_backend.apple_jwks import AppleJWKSManager, JWKSError, UnknownSigningKeyError
+from offload_backend.cache import TTLCache
 
 
 class AppleTokenValidationError(Exception):
@@ -11,8 +18,13 @@ class AppleTokenValidationError(Exception):
 class AppleTokenValidator:
     """Validates Apple Sign In identity tokens against Apple's public JWKS.
 
-    Uses PyJWT's PyJWKClient which caches the public keys with a configurable TTL
-    to avoid redundant JWKS fetches on every request.
+    Signing keys come from an AppleJWKSManager, which prefetches and refreshes
+    them in the background, so validation only waits on Apple for a kid it
+    has never seen.
+
+    Verified tokens are remembered by digest until their exp (capped at
+    token_cache_ttl_seconds), so a client retrying sign-in with the same token
+    skips signature verification. Only successes are cached.
     """
 
     APPLE_ISSUER = "https://appleid.apple.com"
@@ -22,26 +34,51 @@ class AppleTokenValidator:
         *,
         jwks_url: str,
         audience: str,
-        cache_ttl: int = 300,
+        cache_ttl: float = 300.0,
+        timeout_seconds: float = 10.0,
+        unknown_kid_cooldown_seconds: float = 10.0,
+        token_cache_max_entries: int = 10000,
+        token_cache_ttl_seconds: float = 600.0,
+        clock: Callable[[], float] = time.time,
     ):
         self._audience = audience
-        self._jwks_client = PyJWKClient(
-            jwks_url,
-            timeout=10,
-            cache_keys=True,
-            max_cached_keys=16,
-            lifespan=cache_ttl,
+        self._clock = clock
+        self._verified: TTLCache[bytes, str] = TTLCache(
+            max_entries=token_cache_max_entries,
+            ttl_seconds=token_cache_ttl_seconds,
+            clock=clock,
+        )
+        self._jwks = AppleJWKSManager(
+            jwks_url=jwks_url,
+            ttl_seconds=cache_ttl,
+            timeout_seconds=timeout_seconds,
+            unknown_kid_cooldown_seconds=unknown_kid_cooldown_seconds,
         )
 
-    def validate(self, identity_token: str) -> str:
+    @property
+    def jwks(self) -> AppleJWKSManager:
+        return self._jwks
+
+    @property
+    def token_cache(self) -> TTLCache[bytes, str]:
+        return self._verified
+
+    async def validate(self, identity_token: str) -> str:
         """Validate an Apple Sign In identity token and return the stable user sub.
 
         Raises AppleTokenValidationError on any validation failure, including
         expired tokens, signature mismatches, and JWKS fetch errors.
         """
+        digest = hashlib.blake2b(identity_token.encode(), digest_size=16).digest()
+        sub = self._verified.get(digest)
+        if sub is not None:
+            return sub
         try:
-            signing_key = self._jwks_client.get_signing_key_from_jwt(identity_token)
-            payload = jwt.decode(
+            kid = jwt.get_unverified_header(identity_token).get("kid")
+            signing_key = await self._jwks.get_signing_key(kid)
+            # RS256 verification is CPU-bound; keep it off the event loop.
+            payload = await run_in_threadpool(
+                jwt.decode,
                 identity_token,
                 signing_key.key,
                 algorithms=["RS256"],
@@ -51,11 +88,18 @@ class AppleTokenValidator:
             sub = payload.get("sub")
             if not isinstance(sub, str) or not sub:
                 raise AppleTokenValidationError("Missing sub claim in Apple identity token")
+            exp = payload.get("exp")
+            if isinstance(exp, int | float):
+                self._verified.set(digest, sub, ttl_seconds=exp - self._clock())
             return sub
         except jwt.ExpiredSignatureError as exc:
             raise AppleTokenValidationError("Apple identity token expired") from exc
         except jwt.InvalidTokenError as exc:
             raise AppleTokenValidationError("Invalid Apple identity token") from exc
+        except UnknownSigningKeyError as exc:
+            raise AppleTokenValidationError("Invalid Apple identity token") from exc
+        except JWKSError as exc:
+            raise AppleTokenValidationError("Apple signing keys unavailable") from exc
         except AppleTokenValidationError:
             raise
         except Exception as exc:
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import math
+import ssl
+import time
+from collections.abc import Callable
+from functools import cache
+
+import httpx
+from jwt import PyJWK, PyJWKSet
+
+logger = logging.getLogger("offload_backend")
+
+# Background refreshes run this far into the TTL, so keys are renewed
+# before they go stale under normal operation.
+REFRESH_AHEAD_FRACTION = 0.8
+
+
+class JWKSError(Exception):
+    pass
+
+
+class JWKSUnavailableError(JWKSError):
+    pass
+
+
+class UnknownSigningKeyError(JWKSError):
+    pass
+
+
+class AppleJWKSManager:
+    """Async, non-blocking cache of Apple's JWKS signing keys.
+
+    start() prefetches the key set and then refreshes it in the background at
+    REFRESH_AHEAD_FRACTION of ttl_seconds (retrying after retry_seconds when a
+    fetch fails). Lookups never wait on a refresh for a known kid: keys past
+    their TTL are still served while a refresh runs in the background.
+
+    An unknown kid (Apple rotated keys, or a cold cache) triggers a refetch
+    that all concurrent callers share. Outside of an in-flight fetch, forced
+    refetches are limited to one per unknown_kid_cooldown_seconds so forged
+    kids cannot hammer Apple.
+    """
+
+    name = "apple_jwks_refresh"
+
+    def __init__(
+        self,
+        *,
+        jwks_url: str,
+        ttl_seconds: float = 300.0,
+        timeout_seconds: float = 10.0,
+        unknown_kid_cooldown_seconds: float = 10.0,
+        retry_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._jwks_url = jwks_url
+        self._ttl_seconds = ttl_seconds
+        self._timeout_seconds = timeout_seconds
+        self._unknown_kid_cooldown_seconds = unknown_kid_cooldown_seconds
+        self._retry_seconds = retry_seconds
+        self._clock = clock
+        self._keys: dict[str, PyJWK] = {}
+        self._fetched_at: float | None = None
+        self._last_forced_fetch = -math.inf
+        self._inflight: asyncio.Task[None] | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.fetch_count = 0
+
+    @property
+    def is_stale(self) -> bool:
+        return self._fetched_at is None or self._clock() - self._fetched_at >= self._ttl_seconds
+
+    def start(self) -> bool:
+        """Prefetch now and keep refreshing in the background. False if already running."""
+        if self._task is not None:
+            return False
+        self._task = asyncio.create_task(self._run(), name=self.name)
+        return True
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        # Cancelling the refresh loop leaves a fetch it shielded running
+        # unobserved; cancel it too rather than let it fail after shutdown.
+        if self._fetch_in_flight():
+            inflight = self._inflight
+            assert inflight is not None
+            inflight.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await inflight
+
+    async def refresh(self) -> None:
+        """Fetch the key set, joining a fetch that is already in flight on this loop."""
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight
+        if inflight is None or inflight.done() or inflight.get_loop() is not loop:
+            inflight = self._inflight = loop.create_task(self._fetch())
+        # Shield so one cancelled caller does not cancel the fetch for the others.
+        await asyncio.shield(inflight)
+
+    async def get_signing_key(self, kid: str | None) -> PyJWK:
+        if not kid:
+            raise UnknownSigningKeyError("Apple identity token has no kid")
+
+        key = self._keys.get(kid)
+        if key is not None:
+            if self.is_stale:
+                self._refresh_in_background()
+            return key
+
+        now = self._clock()
+        if self._fetch_in_flight() or now - self._last_forced_fetch >= (
+            self._unknown_kid_cooldown_seconds
+        ):
+            self._last_forced_fetch = now
+            try:
+                await self.refresh()
+            except Exception as exc:
+                raise JWKSUnavailableError("Apple JWKS fetch failed") from exc
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise UnknownSigningKeyError("Unknown Apple signing key")
+        return key
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                delay = self._ttl_seconds * REFRESH_AHEAD_FRACTION
+            except Exception:
+                logger.warning("apple_jwks_refresh_failed", exc_info=True)
+                delay = self._retry_seconds
+            await asyncio.sleep(delay)
+
+    async def _fetch(self) -> None:
+        self.fetch_count += 1
+        started = time.perf_counter()
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(self._timeout_seconds),
+            verify=_ssl_context(),
+        ) as client:
+            response = await client.get(self._jwks_url)
+        response.raise_for_status()
+        key_set = PyJWKSet.from_dict(response.json())
+        self._keys = {key.key_id: key for key in key_set.keys if key.key_id}
+        self._fetched_at = self._clock()
+        logger.info(
+            "apple_jwks_refreshed",
+            extra={
+                "key_count": len(self._keys),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            },
+        )
+
+    def _fetch_in_flight(self) -> bool:
+        inflight = self._inflight
+        return (
+            inflight is not None
+            and not inflight.done()
+            and inflight.get_loop() is asyncio.get_running_loop()
+        )
+
+    def _refresh_in_background(self) -> None:
+        if self._fetch_in_flight():
+            return
+        self._inflight = asyncio.get_running_loop().create_task(self._fetch())
+        self._inflight.add_done_callback(_log_refresh_failure)
+
+
+@cache
+def _ssl_context() -> ssl.SSLContext:
+    # Loading the CA bundle dominates client construction; do it once per process.
+    return httpx.create_ssl_context()
+
+
+def _log_refresh_failure(task: asyncio.Task[None]) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("apple_jwks_refresh_failed", exc_info=task.exception())
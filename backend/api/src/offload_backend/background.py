@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Callable
+from typing import Protocol
+
+logger = logging.getLogger("offload_backend")
+
+
+class BackgroundTask(Protocol):
+    """Anything the app lifespan starts after startup and stops at shutdown."""
+
+    name: str
+
+    def start(self) -> bool: ...
+    async def stop(self) -> None: ...
+
+
+class PeriodicTask:
+    """Runs a blocking function on a fixed interval from the app's event loop.
+
+    Each run happens in a worker thread so slow storage work never blocks
+    request handling. Failures are logged and the schedule continues. The
+    optional on_stop function runs once during shutdown, after the loop has
+    been cancelled (for example to flush remaining work).
+    """
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        interval_seconds: float,
+        func: Callable[[], object],
+        on_stop: Callable[[], object] | None = None,
+    ):
+        self.name = name
+        self._interval_seconds = interval_seconds
+        self._func = func
+        self._on_stop = on_stop
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> bool:
+        """Schedule the task on the running loop. Returns False if it is already running."""
+        if self._task is not None:
+            return False
+        self._task = asyncio.create_task(self._run(), name=self.name)
+        return True
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._on_stop is not None:
+            await self._run_once(self._on_stop)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval_seconds)
+            await self._run_once(self._func)
+
+    async def _run_once(self, func: Callable[[], object]) -> None:
+        try:
+            await asyncio.to_thread(func)
+        except Exception:
+            logger.exception("background_task_failed", extra={"task": self.name})
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from threading import Lock
+from typing import Generic, TypeVar
+
+_K = TypeVar("_K", bound=Hashable)
+_V = TypeVar("_V")
+
+
+class TTLCache(Generic[_K, _V]):
+    """Thread-safe LRU cache whose entries also expire after ttl_seconds.
+
+    Reads refresh an entry's LRU position but not its expiry. Inserting past
+    max_entries evicts the least recently used entry. set() may shorten an
+    entry's lifetime below ttl_seconds but never extend it. A ttl_seconds of 0
+    disables the cache: get always misses and set is a no-op.
+
+    To cache a value computed outside the cache, take generation(key) before
+    computing it and pass it to set(). If the key was invalidated (or the
+    cache cleared) in between, set() drops the now stale value instead of
+    overwriting the invalidation.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._max_entries = max(1, max_entries)
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[_K, tuple[float, _V]] = OrderedDict()
+        # Last invalidation per key, bounded like _entries. Keys pushed out
+        # fall back to _generation_floor, which is at least their last value,
+        # so an eviction can only make set() skip, never accept a stale value.
+        self._generations: OrderedDict[_K, int] = OrderedDict()
+        self._generation_floor = 0
+        self._last_generation = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl_seconds > 0
+
+    def get(self, key: _K) -> _V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, key: _K) -> int:
+        with self._lock:
+            return self._generations.get(key, self._generation_floor)
+
+    def set(
+        self,
+        key: _K,
+        value: _V,
+        *,
+        ttl_seconds: float | None = None,
+        generation: int | None = None,
+    ) -> None:
+        if ttl_seconds is None or ttl_seconds > self._ttl_seconds:
+            ttl_seconds = self._ttl_seconds
+        if ttl_seconds <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generations.get(
+                key, self._generation_floor
+            ):
+                return
+            self._entries[key] = (self._clock() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: _K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._last_generation += 1
+            self._generations[key] = self._last_generation
+            self._generations.move_to_end(key)
+            while len(self._generations) > self._max_entries:
+                _, evicted = self._generations.popitem(last=False)
+                self._generation_floor = max(self._generation_floor, evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._last_generation += 1
+            self._generation_floor = self._last_generation
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
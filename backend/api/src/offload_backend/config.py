@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import secrets
 from functools import lru_cache
-from typing import Literal
+from typing import Annotated, Literal
 
 from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -23,16 +23,31 @@ class Settings(BaseSettings):
     build_version: str = "dev"
     session_secret: str = ""
     session_ttl_seconds: int = 3600
+    session_refresh_grace_seconds: int = Field(default=3600, ge=0)
+    session_max_age_seconds: int = Field(default=30 * 86400, ge=1)
     session_token_issuer: str = "offload-backend"
     session_token_audience: str = "offload-ios"
     session_token_active_kid: str = "v2-default"
     session_signing_keys: dict[str, str] = Field(default_factory=dict)
+    session_token_decode_cache_max_entries: int = Field(default=10000, ge=0)
+    session_token_format: Literal["v2", "v3"] = "v2"
     session_issue_limit_per_ip: int = Field(default=8, ge=1)
     session_issue_limit_per_install: int = Field(default=4, ge=1)
     session_issue_limit_window_seconds: int = Field(default=60, ge=1)
     ai_inference_limit_per_install: int = Field(default=20, ge=1)
     ai_inference_limit_per_ip: int = Field(default=120, ge=1)
     ai_inference_limit_window_seconds: int = Field(default=60, ge=1)
+    ai_token_limit_per_install: int = Field(default=20_000, ge=0)
+    ai_token_limit_global: int = Field(default=400_000, ge=0)
+    ai_token_limit_window_seconds: int = Field(default=60, ge=1)
+    ai_token_estimate_output_tokens: int = Field(default=1024, ge=0)
+    rate_limit_max_tracked_keys: int = Field(default=100_000, ge=1)
+    rate_limiter_algorithm: Literal["fixed_window", "gcra"] = "fixed_window"
+    rate_limit_shared_path: str | None = None
+    rate_limit_shared_slots: int = Field(default=65536, ge=1024)
+    rate_limit_redis_url: str | None = None
+    rate_limit_redis_pool_size: int = Field(default=16, ge=1)
+    rate_limit_redis_timeout_seconds: float = Field(default=0.1, gt=0.0)
     ai_provider: Literal["openai", "anthropic"] = "openai"
     ai_retry_max_attempts: int = Field(default=3, ge=1, le=10)
     ai_retry_base_delay_seconds: float = Field(default=0.25, ge=0.0)
@@ -50,9 +65,59 @@ class Settings(BaseSettings):
     anthropic_timeout_seconds: float = 20.0
     max_input_chars: int = Field(default=4000, ge=1)
     default_feature_quota: int = Field(default=100, ge=0)
+    storage_backend: Literal["sqlite", "postgres"] = "sqlite"
+    postgres_dsn: str | None = None
+    postgres_pool_min_size: int = Field(default=1, ge=0)
+    postgres_pool_max_size: int = Field(default=10, ge=1)
+    postgres_write_batch_size: int = Field(default=100, ge=1)
+    postgres_write_flush_interval_seconds: float = Field(default=0.05, gt=0.0)
     usage_db_path: str = ".offload-backend/usage.sqlite3"
+    usage_shard_count: int = Field(default=1, ge=1, le=64)
+    usage_event_log_enabled: bool = False
+    usage_compaction_interval_seconds: float = Field(default=5.0, gt=0.0)
+    usage_compaction_batch_size: int = Field(default=10000, ge=1)
+    usage_summary_cache_ttl_seconds: float = Field(default=2.0, ge=0.0)
+    usage_summary_cache_max_entries: int = Field(default=10000, ge=1)
+    sqlite_reader_pool_size: int = Field(default=4, ge=0, le=64)
+    sqlite_cache_size_kib: int = Field(default=8192, ge=0)
+    sqlite_mmap_size_bytes: int = Field(default=0, ge=0)
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    sqlite_maintenance_enabled: bool = True
+    sqlite_maintenance_interval_seconds: float = Field(default=10.0, gt=0.0)
+    sqlite_checkpoint_interval_seconds: float = Field(default=60.0, gt=0.0)
+    sqlite_wal_truncate_bytes: int = Field(default=64 * 1024 * 1024, ge=0)
+    sqlite_optimize_interval_seconds: float = Field(default=3600.0, gt=0.0)
+    sqlite_maintenance_idle_max_operations: int = Field(default=10, ge=0)
+    sqlite_backup_dir: str | None = None
+    sqlite_backup_interval_seconds: float = Field(default=0.0, ge=0.0)
+    sqlite_backup_retain: int = Field(default=3, ge=1)
+    sqlite_backup_pages_per_step: int = Field(default=256, ge=1)
+    sqlite_backup_step_pause_seconds: float = Field(default=0.001, ge=0.0)
+    admin_api_token: str | None = None
     apple_bundle_id: str = "wc.Offload"
     apple_jwks_url: str = "https://appleid.apple.com/auth/keys"
+    apple_jwks_cache_ttl_seconds: float = Field(default=300.0, gt=0.0)
+    apple_jwks_timeout_seconds: float = Field(default=10.0, gt=0.0)
+    apple_jwks_unknown_kid_cooldown_seconds: float = Field(default=10.0, ge=0.0)
+    apple_token_cache_max_entries: int = Field(default=10000, ge=1)
+    apple_token_cache_ttl_seconds: float = Field(default=600.0, ge=0.0)
+    log_pipeline_enabled: bool = True
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = "INFO"
+    log_queue_max_size: int = Field(default=10000, ge=1)
+    log_sample_rates: dict[str, Annotated[float, Field(ge=0.0, le=1.0)]] = Field(
+        default_factory=lambda: {
+            "request_complete": 0.01,
+            "ai_inference_throttled": 0.1,
+            "ai_token_budget_throttled": 0.1,
+            "session_issuance_throttled": 0.1,
+        }
+    )
+    # None: enabled, except in production-like environments.
+    metrics_enabled: bool | None = None
+    metrics_bearer_token: str | None = None
+    tracing_enabled: bool = True
+    trace_buffer_size: int = Field(default=256, ge=1)
+    trace_slow_threshold_ms: float = Field(default=500.0, ge=0.0)
 
     @model_validator(mode="after")
     def validate_session_secret_policy(self) -> Settings:
@@ -115,6 +180,34 @@ class Settings(BaseSettings):
         self.usage_db_path = self.usage_db_path.strip()
         if not self.usage_db_path:
             raise ValueError("OFFLOAD_USAGE_DB_PATH must be non-empty")
+        if self.storage_backend == "postgres" and not (self.postgres_dsn or "").strip():
+            raise ValueError(
+                "OFFLOAD_POSTGRES_DSN must be set when OFFLOAD_STORAGE_BACKEND=postgres",
+            )
+        if self.postgres_pool_min_size > self.postgres_pool_max_size:
+            raise ValueError(
+                "OFFLOAD_POSTGRES_POOL_MIN_SIZE must not exceed OFFLOAD_POSTGRES_POOL_MAX_SIZE",
+            )
+        self.admin_api_token = (self.admin_api_token or "").strip() or None
+        if (
+            production_like
+            and self.admin_api_token is not None
+            and not is_strong_session_secret(self.admin_api_token)
+        ):
+            raise ValueError("OFFLOAD_ADMIN_API_TOKEN is too weak for production-like environments")
+        self.metrics_bearer_token = (self.metrics_bearer_token or "").strip() or None
+        if self.metrics_enabled is None:
+            self.metrics_enabled = not production_like
+        if production_like and self.metrics_enabled:
+            if self.metrics_bearer_token is None:
+                raise ValueError(
+                    "OFFLOAD_METRICS_BEARER_TOKEN must be set to enable /metrics in "
+                    "production-like environments",
+                )
+            if not is_strong_session_secret(self.metrics_bearer_token):
+                raise ValueError(
+                    "OFFLOAD_METRICS_BEARER_TOKEN is too weak for production-like environments",
+                )
         return self
 
 
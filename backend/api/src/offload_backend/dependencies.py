@@ -1,17 +1,24 @@
 from __future__ import annotations
 
 import hashlib
+import hmac
 import logging
+from collections.abc import Generator
+from contextlib import contextmanager
+from functools import partial
 
-from fastapi import Depends, Header, Request
+from fastapi import Depends, Header, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
 
 from offload_backend.apple_auth import AppleTokenValidator
 from offload_backend.config import Settings, get_settings
 from offload_backend.errors import APIException, get_request_id
+from offload_backend.metrics import RATE_LIMIT_REJECTIONS
 from offload_backend.providers.anthropic_adapter import AnthropicProviderAdapter
 from offload_backend.providers.base import AIProvider
 from offload_backend.providers.openai_adapter import OpenAIProviderAdapter
+from offload_backend.redis_rate_limiter import RedisSessionRateLimiter
 from offload_backend.security import (
     ExpiredTokenError,
     InvalidTokenError,
@@ -19,10 +26,19 @@ from offload_backend.security import (
     TokenManager,
 )
 from offload_backend.session_rate_limiter import (
+    GCRASessionRateLimiter,
     InMemorySessionRateLimiter,
     SessionRateLimiter,
     SessionRateLimitExceeded,
 )
+from offload_backend.shared_rate_limiter import SharedGCRASessionRateLimiter
+from offload_backend.token_budget import (
+    TokenBudgetExceeded,
+    TokenBudgetLimiter,
+    TokenReservation,
+    estimate_tokens,
+)
+from offload_backend.tracing import span
 from offload_backend.usage_store import UsageStore
 from offload_backend.user_store import UserStore
 
@@ -34,25 +50,93 @@ def get_app_settings() -> Settings:
     return get_settings()
 
 
-def get_token_manager(settings: Settings = Depends(get_app_settings)) -> TokenManager:
-    return TokenManager(
-        secret=settings.session_secret,
-        issuer=settings.session_token_issuer,
-        audience=settings.session_token_audience,
-        active_kid=settings.session_token_active_kid,
-        signing_keys=settings.session_signing_keys,
+def get_token_manager(
+    request: Request,
+    settings: Settings = Depends(get_app_settings),
+) -> TokenManager:
+    """Returns the app's shared token manager (and its decode cache), creating it if needed.
+
+    When settings are reloaded (get_settings.cache_clear()) with different
+    signing keys, the shared manager is rotated onto them, which also retires
+    every decode cached under the old keys.
+    """
+    state = request.app.state
+    token_manager = getattr(state, "token_manager", None)
+    if token_manager is None:
+        token_manager = TokenManager(
+            secret=settings.session_secret,
+            issuer=settings.session_token_issuer,
+            audience=settings.session_token_audience,
+            active_kid=settings.session_token_active_kid,
+            signing_keys=settings.session_signing_keys,
+            decode_cache_max_entries=settings.session_token_decode_cache_max_entries,
+            token_format=settings.session_token_format,
+        )
+        state.token_manager = token_manager
+        state.token_manager_settings = settings
+    elif state.token_manager_settings is not settings:
+        if _signing_key_material(state.token_manager_settings) != _signing_key_material(
+            settings
+        ):
+            token_manager.rotate_signing_keys(
+                secret=settings.session_secret,
+                active_kid=settings.session_token_active_kid,
+                signing_keys=settings.session_signing_keys,
+            )
+        state.token_manager_settings = settings
+    return token_manager
+
+
+def _signing_key_material(settings: Settings) -> tuple[object, ...]:
+    return (
+        settings.session_secret,
+        settings.session_token_active_kid,
+        sorted(settings.session_signing_keys.items()),
     )
 
 
 def get_session_claims(
     credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
     token_manager: TokenManager = Depends(get_token_manager),
+) -> SessionClaims:
+    return _decode_session_token(credentials, token_manager)
+
+
+def get_refreshable_session_claims(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+    token_manager: TokenManager = Depends(get_token_manager),
+    settings: Settings = Depends(get_app_settings),
+) -> SessionClaims:
+    """Like get_session_claims, but also accepts tokens within the refresh grace window.
+
+    Token chains first issued more than session_max_age_seconds ago are
+    rejected as expired, so refreshing cannot extend a session forever.
+    """
+    return _decode_session_token(
+        credentials,
+        token_manager,
+        expired_grace_seconds=settings.session_refresh_grace_seconds,
+        max_session_age_seconds=settings.session_max_age_seconds,
+    )
+
+
+def _decode_session_token(
+    credentials: HTTPAuthorizationCredentials | None,
+    token_manager: TokenManager,
+    *,
+    expired_grace_seconds: float = 0,
+    max_session_age_seconds: float | None = None,
 ) -> SessionClaims:
     if credentials is None:
         raise APIException(status_code=401, code="unauthorized", message="Missing bearer token")
 
     try:
-        return token_manager.decode(credentials.credentials)
+        with span("auth.session_claims"):
+            return token_manager.decode(
+                credentials.credentials,
+                expired_grace_seconds=expired_grace_seconds,
+                max_session_age_seconds=max_session_age_seconds,
+            )
     except ExpiredTokenError as exc:
         raise APIException(
             status_code=401,
@@ -67,6 +151,37 @@ def get_session_claims(
         ) from exc
 
 
+def require_admin(
+    admin_token: str | None = Header(default=None, alias="X-Offload-Admin-Token"),
+    settings: Settings = Depends(get_app_settings),
+) -> None:
+    """Guard admin routes; they do not exist unless OFFLOAD_ADMIN_API_TOKEN is set."""
+    expected = settings.admin_api_token
+    if expected is None:
+        raise APIException(status_code=404, code="not_found", message="Not found")
+    if admin_token is None or not hmac.compare_digest(
+        admin_token.encode("utf-8"), expected.encode("utf-8")
+    ):
+        raise APIException(status_code=401, code="unauthorized", message="Invalid admin token")
+
+
+def require_metrics_access(
+    authorization: str | None = Header(default=None),
+    settings: Settings = Depends(get_app_settings),
+) -> None:
+    """Guard /metrics: 404 when disabled, bearer token when one is configured."""
+    if not settings.metrics_enabled:
+        raise APIException(status_code=404, code="not_found", message="Not found")
+    expected = settings.metrics_bearer_token
+    if expected is None:
+        return
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.strip().encode("utf-8"), expected.encode("utf-8")
+    ):
+        raise APIException(status_code=401, code="unauthorized", message="Invalid metrics token")
+
+
 def require_cloud_opt_in(
     opt_in_header: str | None = Header(default=None, alias="X-Offload-Cloud-Opt-In"),
 ) -> None:
@@ -100,6 +215,7 @@ def get_apple_validator(request: Request) -> AppleTokenValidator:
 def _get_or_create_rate_limiter(
     request: Request,
     state_attr: str,
+    settings: Settings,
     limit_per_ip: int,
     limit_per_install: int,
     window_seconds: int,
@@ -107,11 +223,37 @@ def _get_or_create_rate_limiter(
     """Returns a cached rate limiter from app state, creating one if needed."""
     limiter = getattr(request.app.state, state_attr, None)
     if limiter is None:
-        limiter = InMemorySessionRateLimiter(
-            limit_per_ip=limit_per_ip,
-            limit_per_install=limit_per_install,
-            window_seconds=window_seconds,
-        )
+        pool = getattr(request.app.state, "rate_limit_pool", None)
+        if pool is not None:
+            limiter = RedisSessionRateLimiter(
+                pool=pool,
+                namespace=state_attr,
+                limit_per_ip=limit_per_ip,
+                limit_per_install=limit_per_install,
+                window_seconds=window_seconds,
+            )
+        elif settings.rate_limit_shared_path:
+            limiter = SharedGCRASessionRateLimiter(
+                path=settings.rate_limit_shared_path,
+                namespace=state_attr,
+                limit_per_ip=limit_per_ip,
+                limit_per_install=limit_per_install,
+                window_seconds=window_seconds,
+                slots=settings.rate_limit_shared_slots,
+                max_tracked_keys=settings.rate_limit_max_tracked_keys,
+            )
+        else:
+            limiter_class = (
+                GCRASessionRateLimiter
+                if settings.rate_limiter_algorithm == "gcra"
+                else InMemorySessionRateLimiter
+            )
+            limiter = limiter_class(
+                limit_per_ip=limit_per_ip,
+                limit_per_install=limit_per_install,
+                window_seconds=window_seconds,
+                max_tracked_keys=settings.rate_limit_max_tracked_keys,
+            )
         setattr(request.app.state, state_attr, limiter)
     return limiter
 
@@ -123,6 +265,7 @@ def get_session_rate_limiter(
     return _get_or_create_rate_limiter(
         request,
         "session_rate_limiter",
+        settings,
         limit_per_ip=settings.session_issue_limit_per_ip,
         limit_per_install=settings.session_issue_limit_per_install,
         window_seconds=settings.session_issue_limit_window_seconds,
@@ -136,12 +279,77 @@ def get_ai_inference_rate_limiter(
     return _get_or_create_rate_limiter(
         request,
         "ai_inference_rate_limiter",
+        settings,
         limit_per_ip=settings.ai_inference_limit_per_ip,
         limit_per_install=settings.ai_inference_limit_per_install,
         window_seconds=settings.ai_inference_limit_window_seconds,
     )
 
 
+def get_ai_token_budget(
+    request: Request,
+    settings: Settings = Depends(get_app_settings),
+) -> TokenBudgetLimiter:
+    """Returns the app's shared tokens-per-window limiter, creating it if needed."""
+    budget = getattr(request.app.state, "ai_token_budget", None)
+    if budget is None:
+        budget = TokenBudgetLimiter(
+            limit_per_install=settings.ai_token_limit_per_install,
+            global_limit=settings.ai_token_limit_global,
+            window_seconds=settings.ai_token_limit_window_seconds,
+            max_tracked_keys=settings.rate_limit_max_tracked_keys,
+        )
+        request.app.state.ai_token_budget = budget
+    return budget
+
+
+@contextmanager
+def reserve_ai_tokens(
+    budget: TokenBudgetLimiter,
+    *,
+    install_id: str,
+    request: Request,
+    input_chars: int,
+    settings: Settings,
+) -> Generator[TokenReservation]:
+    """Reserve an estimated token cost around an AI call; 429 if over budget.
+
+    The caller sets reservation.actual_tokens from the provider's usage; the
+    reservation is reconciled to it on exit, or refunded if the block raises.
+    """
+    estimated = estimate_tokens(
+        input_chars=input_chars, output_tokens=settings.ai_token_estimate_output_tokens
+    )
+    try:
+        with span("token_budget.reserve", estimated_tokens=estimated):
+            reservation = budget.reserve(install_id=install_id, estimated_tokens=estimated)
+    except TokenBudgetExceeded as exc:
+        RATE_LIMIT_REJECTIONS.inc(("ai_token_budget", exc.scope))
+        logger.info(
+            "ai_token_budget_throttled",
+            extra={
+                "request_id": get_request_id(request),
+                "path": request.url.path,
+                "scope": exc.scope,
+                "estimated_tokens": estimated,
+                "retry_after_seconds": exc.retry_after_seconds,
+                "install_id_hash": _install_id_hash(install_id),
+            },
+        )
+        raise APIException(
+            status_code=429,
+            code="token_budget_exceeded",
+            message="Too many AI tokens requested; retry later",
+            headers={"Retry-After": str(exc.retry_after_seconds)},
+        ) from exc
+    try:
+        yield reservation
+    except BaseException:
+        budget.release(reservation)
+        raise
+    budget.reconcile(reservation)
+
+
 def _client_ip(request: Request) -> str:
     forwarded = request.headers.get("X-Forwarded-For")
     if forwarded:
@@ -162,15 +370,36 @@ def enforce_ai_quota(
     claims: SessionClaims = Depends(get_session_claims),
     usage_store: UsageStore = Depends(get_usage_store),
     settings: Settings = Depends(get_app_settings),
-) -> None:
-    """Raise 429 quota_exceeded when the install has used all free AI actions this month."""
-    total = usage_store.get_total_count(install_id=claims.install_id, features=list(AI_FEATURES))
+) -> int:
+    """Raise 429 quota_exceeded when the install has used all free AI actions this month.
+
+    Returns the AI actions remaining before this request is counted.
+    """
+    with span("quota.check"):
+        total = usage_store.get_total_count(
+            install_id=claims.install_id, features=list(AI_FEATURES)
+        )
     if total >= settings.default_feature_quota:
         raise APIException(
             status_code=429,
             code="quota_exceeded",
             message="Monthly AI action limit reached.",
         )
+    return settings.default_feature_quota - total
+
+
+def set_ai_pacing_headers(
+    response: Response, *, feature: str, rate_limit_remaining: int, quota_remaining: int
+) -> None:
+    """Tell the client how much headroom it has left after a successful AI call.
+
+    quota_remaining is enforce_ai_quota's value, which predates this call; it
+    drops by one only for features that count toward the quota.
+    """
+    if feature in AI_FEATURES:
+        quota_remaining -= 1
+    response.headers["X-RateLimit-Remaining"] = str(max(0, rate_limit_remaining))
+    response.headers["X-Quota-Remaining"] = str(max(0, quota_remaining))
 
 
 def _enforce_rate_limit(
@@ -178,15 +407,22 @@ def _enforce_rate_limit(
     install_id: str,
     request: Request,
     limiter: SessionRateLimiter,
+    limiter_name: str,
     log_event: str,
     error_code: str,
     error_message: str,
-) -> None:
-    """Shared rate-limit enforcement for session issuance and AI inference."""
+) -> int:
+    """Shared rate-limit enforcement for session issuance and AI inference.
+
+    Returns the requests remaining in the tighter dimension; rejections carry
+    the limiter's Retry-After.
+    """
     client_ip = _client_ip(request)
     try:
-        limiter.check(client_ip=client_ip, install_id=install_id)
+        with span("rate_limit.check", limiter=limiter_name):
+            return limiter.check(client_ip=client_ip, install_id=install_id)
     except SessionRateLimitExceeded as exc:
+        RATE_LIMIT_REJECTIONS.inc((limiter_name, exc.dimension))
         logger.info(
             log_event,
             extra={
@@ -201,23 +437,31 @@ def _enforce_rate_limit(
             status_code=429,
             code=error_code,
             message=error_message,
+            headers={"Retry-After": str(exc.retry_after_seconds)},
         ) from exc
 
 
-def enforce_ai_inference_rate_limit(
+async def enforce_ai_inference_rate_limit(
     *,
     install_id: str,
     request: Request,
     limiter: SessionRateLimiter,
-) -> None:
-    _enforce_rate_limit(
+) -> int:
+    enforce = partial(
+        _enforce_rate_limit,
         install_id=install_id,
         request=request,
         limiter=limiter,
+        limiter_name="ai_inference",
         log_event="ai_inference_throttled",
         error_code="inference_rate_limited",
         error_message="Too many AI requests; retry later",
     )
+    # The AI routes are async; a limiter that talks to Redis would otherwise
+    # stall the event loop for a network round trip on every request.
+    if limiter.blocking:
+        return await run_in_threadpool(enforce)
+    return enforce()
 
 
 def enforce_session_issuance_rate_limit(
@@ -230,6 +474,7 @@ def enforce_session_issuance_rate_limit(
         install_id=install_id,
         request=request,
         limiter=limiter,
+        limiter_name="session_issuance",
         log_event="session_issuance_throttled",
         error_code="session_rate_limited",
         error_message="Too many session requests; retry later",
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from collections.abc import Awaitable, Callable
+from collections.abc import Awaitable, Callable, Mapping
 from typing import TypeVar
 
 from fastapi import Request
@@ -13,13 +13,24 @@ from offload_backend.providers.base import (
     ProviderUnavailable,
 )
 from offload_backend.schemas import ErrorBody, ErrorEnvelope
+from offload_backend.tracing import span
+
+# Retry-After sent with provider_unavailable; providers report no reset time.
+PROVIDER_UNAVAILABLE_RETRY_AFTER_SECONDS = 5
 
 
 class APIException(Exception):
-    def __init__(self, status_code: int, code: str, message: str):
+    def __init__(
+        self,
+        status_code: int,
+        code: str,
+        message: str,
+        headers: Mapping[str, str] | None = None,
+    ):
         self.status_code = status_code
         self.code = code
         self.message = message
+        self.headers = headers
         super().__init__(message)
 
 
@@ -28,9 +39,16 @@ def get_request_id(request: Request) -> str:
     return getattr(request.state, "request_id", "unknown")
 
 
-def error_response(*, status_code: int, code: str, message: str, request_id: str) -> JSONResponse:
+def error_response(
+    *,
+    status_code: int,
+    code: str,
+    message: str,
+    request_id: str,
+    headers: Mapping[str, str] | None = None,
+) -> JSONResponse:
     envelope = ErrorEnvelope(error=ErrorBody(code=code, message=message, request_id=request_id))
-    return JSONResponse(status_code=status_code, content=envelope.model_dump())
+    return JSONResponse(status_code=status_code, content=envelope.model_dump(), headers=headers)
 
 
 def api_exception_response(request: Request, exc: APIException) -> JSONResponse:
@@ -39,6 +57,7 @@ def api_exception_response(request: Request, exc: APIException) -> JSONResponse:
         code=exc.code,
         message=exc.message,
         request_id=get_request_id(request),
+        headers=exc.headers,
     )
 
 
@@ -51,7 +70,8 @@ async def call_provider(coro: Callable[[], Awaitable[_T]]) -> _T:
     Eliminates the identical try/except blocks repeated across AI routers.
     """
     try:
-        return await coro()
+        with span("provider.call"):
+            return await coro()
     except ProviderTimeout as exc:
         raise APIException(
             status_code=504,
@@ -63,6 +83,7 @@ async def call_provider(coro: Callable[[], Awaitable[_T]]) -> _T:
             status_code=503,
             code="provider_unavailable",
             message="Provider unavailable",
+            headers={"Retry-After": str(PROVIDER_UNAVAILABLE_RETRY_AFTER_SECONDS)},
         ) from exc
     except ProviderResponseError as exc:
         raise APIException(
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from collections.abc import Callable, Mapping
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+from typing import TextIO
+
+# Attributes every LogRecord has; anything else on a record came from `extra`.
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", logging.INFO, "", 0, "", None, None).__dict__
+) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event and the record's extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, object] = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _SamplingQueueHandler(QueueHandler):
+    """Samples and enqueues records without ever blocking the logging thread."""
+
+    def __init__(
+        self,
+        log_queue: queue.Queue[logging.LogRecord | None],
+        *,
+        sample_rates: Mapping[str, float],
+        rng: Callable[[], float],
+    ):
+        super().__init__(log_queue)
+        self._sample_rates = dict(sample_rates)
+        self._rng = rng
+        self._lock = Lock()
+        self.enqueued = 0
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno < logging.WARNING:
+            rate = self._sample_rates.get(record.msg) if isinstance(record.msg, str) else None
+            if rate is not None and rate < 1.0:
+                if self._rng() >= rate:
+                    with self._lock:
+                        self.sampled_out += 1
+                    return
+                record = copy.copy(record)
+                record.sample_rate = rate
+        try:
+            self.enqueue(self.prepare(record))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        with self._lock:
+            self.enqueued += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so unlike the stock prepare() we
+        # keep exc_info and extras intact and leave formatting to the writer
+        # thread. Only the message is resolved now, while its args are current.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _DrainingQueueListener(QueueListener):
+    def __init__(self, log_queue: queue.Queue[logging.LogRecord | None], handler: logging.Handler):
+        super().__init__(log_queue, handler, respect_handler_level=True)
+        self._log_queue = log_queue
+
+    def enqueue_sentinel(self) -> None:
+        # Block instead of raising queue.Full so shutdown always drains the
+        # queue. None is QueueListener's sentinel.
+        self._log_queue.put(None)
+
+
+class LogPipeline:
+    """Non-blocking JSON-lines logging for the `offload_backend` logger.
+
+    While started, records go through a bounded queue to a background writer
+    thread that formats them as JSON and writes them to `stream` (stderr by
+    default), so request handlers never wait on log I/O. The logger stops
+    propagating to the root logger, so no other handler writes synchronously.
+
+    Records below WARNING whose event name is in sample_rates are kept with
+    that probability and tagged with `sample_rate`, so counts can be scaled
+    back up. WARNING and above are never sampled. When the queue is full,
+    records are dropped rather than waiting. metrics() reports the enqueued,
+    dropped and sampled-out counts.
+    """
+
+    name = "log_pipeline"
+
+    def __init__(
+        self,
+        *,
+        logger_name: str = "offload_backend",
+        level: str = "INFO",
+        queue_max_size: int = 10000,
+        sample_rates: Mapping[str, float] | None = None,
+        stream: TextIO | None = None,
+        rng: Callable[[], float] = random.random,
+    ):
+        for event, rate in (sample_rates or {}).items():
+            if not 0.0 <= rate <= 1.0:
+                raise ValueError(f"Log sample rate for {event!r} must be between 0 and 1")
+        self._logger = logging.getLogger(logger_name)
+        self._level = level.upper()
+        self._queue: queue.Queue[logging.LogRecord | None] = queue.Queue(
+            maxsize=max(1, queue_max_size)
+        )
+        self._handler = _SamplingQueueHandler(
+            self._queue, sample_rates=sample_rates or {}, rng=rng
+        )
+        writer = logging.StreamHandler(stream or sys.stderr)
+        writer.setFormatter(JSONFormatter())
+        self._listener = _DrainingQueueListener(self._queue, writer)
+        self._running = False
+        self._saved_logger_state: tuple[int, bool] | None = None
+
+    def start(self) -> bool:
+        """Attach to the logger and start the writer thread. False if already running."""
+        if self._running:
+            return False
+        self._listener.start()
+        self._saved_logger_state = (self._logger.level, self._logger.propagate)
+        self._logger.addHandler(self._handler)
+        self._logger.setLevel(self._level)
+        self._logger.propagate = False
+        self._running = True
+        return True
+
+    async def stop(self) -> None:
+        """Detach from the logger, then wait for the writer to flush the queue."""
+        if not self._running:
+            return
+        self._logger.removeHandler(self._handler)
+        if self._saved_logger_state is not None:
+            level, propagate = self._saved_logger_state
+            self._logger.setLevel(level)
+            self._logger.propagate = propagate
+        self._running = False
+        await asyncio.to_thread(self._listener.stop)
+
+    def metrics(self) -> dict[str, int]:
+        return {
+            "enqueued": self._handler.enqueued,
+            "dropped": self._handler.dropped,
+            "sampled_out": self._handler.sampled_out,
+            "queue_depth": self._queue.qsize(),
+        }
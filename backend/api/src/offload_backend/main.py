@@ -1,16 +1,19 @@
 from __future__ import annotations
 
 import logging
-import time
-import uuid
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 
 from offload_backend.apple_auth import AppleTokenValidator
+from offload_backend.background import BackgroundTask, PeriodicTask
 from offload_backend.config import get_settings
 from offload_backend.errors import APIException, api_exception_response, error_response
+from offload_backend.log_pipeline import LogPipeline
+from offload_backend.middleware import RequestContextMiddleware
+from offload_backend.redis_rate_limiter import RESPConnectionPool
+from offload_backend.routers.admin import router as admin_router
 from offload_backend.routers.auth import router as auth_router
 from offload_backend.routers.braindump import router as braindump_router
 from offload_backend.routers.breakdown import router as breakdown_router
@@ -18,10 +21,11 @@ from offload_backend.routers.decide import router as decide_router
 from offload_backend.routers.draft import router as draft_router
 from offload_backend.routers.execfunction import router as execfunction_router
 from offload_backend.routers.health import router as health_router
+from offload_backend.routers.metrics import router as metrics_router
 from offload_backend.routers.sessions import router as sessions_router
 from offload_backend.routers.usage import router as usage_router
-from offload_backend.usage_store import SQLiteUsageStore
-from offload_backend.user_store import SQLiteUserStore
+from offload_backend.storage import build_stores
+from offload_backend.tracing import RingBufferExporter, Tracer
 
 logger = logging.getLogger("offload_backend")
 
@@ -29,44 +33,87 @@ logger = logging.getLogger("offload_backend")
 def create_app() -> FastAPI:
     @asynccontextmanager
     async def lifespan(app: FastAPI):
+        # Only stop what this lifespan started, so nested lifespans over the
+        # same app (e.g. two test clients) leave the outer one's tasks alone.
+        started = [task for task in app.state.background_tasks if task.start()]
         yield
-        usage_store = getattr(app.state, "usage_store", None)
-        if usage_store is not None:
-            usage_store.close()
-        user_store = getattr(app.state, "user_store", None)
-        if user_store is not None:
-            user_store.close()
+        for task in reversed(started):
+            await task.stop()
+        stores = getattr(app.state, "stores", None)
+        if stores is not None:
+            stores.close()
+        if app.state.rate_limit_pool is not None:
+            app.state.rate_limit_pool.close()
 
     app = FastAPI(title="Offload Backend API", version="0.1.0", lifespan=lifespan)
     settings = get_settings()
-    app.state.usage_store = SQLiteUsageStore(db_path=settings.usage_db_path)
-    app.state.user_store = SQLiteUserStore(db_path=settings.usage_db_path)
+    app.state.stores = build_stores(settings)
+    app.state.usage_store = app.state.stores.usage_store
+    app.state.user_store = app.state.stores.user_store
+    background_tasks: list[BackgroundTask] = []
+    app.state.background_tasks = background_tasks
+    app.state.log_pipeline = None
+    if settings.log_pipeline_enabled:
+        # First to start and, as tasks stop in reverse, last to stop.
+        app.state.log_pipeline = LogPipeline(
+            level=settings.log_level,
+            queue_max_size=settings.log_queue_max_size,
+            sample_rates=settings.log_sample_rates,
+        )
+        background_tasks.append(app.state.log_pipeline)
+    if app.state.stores.compact_usage is not None:
+        app.state.background_tasks.append(
+            PeriodicTask(
+                name="usage_compaction",
+                interval_seconds=settings.usage_compaction_interval_seconds,
+                func=app.state.stores.compact_usage,
+                on_stop=app.state.stores.drain_usage,
+            )
+        )
+    if app.state.stores.sqlite_maintenance is not None:
+        app.state.background_tasks.append(
+            PeriodicTask(
+                name="sqlite_maintenance",
+                interval_seconds=settings.sqlite_maintenance_interval_seconds,
+                func=app.state.stores.sqlite_maintenance.run_once,
+            )
+        )
+    backup = app.state.stores.sqlite_backup
+    if backup is not None and settings.sqlite_backup_interval_seconds > 0:
+        app.state.background_tasks.append(
+            PeriodicTask(
+                name="sqlite_backup",
+                interval_seconds=settings.sqlite_backup_interval_seconds,
+                func=backup.run,
+            )
+        )
     app.state.apple_validator = AppleTokenValidator(
         jwks_url=settings.apple_jwks_url,
         audience=settings.apple_bundle_id,
+        cache_ttl=settings.apple_jwks_cache_ttl_seconds,
+        timeout_seconds=settings.apple_jwks_timeout_seconds,
+        unknown_kid_cooldown_seconds=settings.apple_jwks_unknown_kid_cooldown_seconds,
+        token_cache_max_entries=settings.apple_token_cache_max_entries,
+        token_cache_ttl_seconds=settings.apple_token_cache_ttl_seconds,
     )
+    app.state.background_tasks.append(app.state.apple_validator.jwks)
+    app.state.rate_limit_pool = None
+    if settings.rate_limit_redis_url:
+        app.state.rate_limit_pool = RESPConnectionPool(
+            url=settings.rate_limit_redis_url,
+            max_connections=settings.rate_limit_redis_pool_size,
+            timeout_seconds=settings.rate_limit_redis_timeout_seconds,
+        )
 
-    @app.middleware("http")
-    async def request_context_middleware(request: Request, call_next):
-        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-        request.state.request_id = request_id
-
-        started_at = time.perf_counter()
-        response = await call_next(request)
-        elapsed_ms = int((time.perf_counter() - started_at) * 1000)
-
-        logger.info(
-            "request_complete",
-            extra={
-                "request_id": request_id,
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "latency_ms": elapsed_ms,
-            },
+    app.state.tracer = None
+    if settings.tracing_enabled:
+        app.state.tracer = Tracer(
+            RingBufferExporter(
+                max_traces=settings.trace_buffer_size,
+                min_duration_seconds=settings.trace_slow_threshold_ms / 1000,
+            )
         )
-        response.headers["X-Request-ID"] = request_id
-        return response
+    app.add_middleware(RequestContextMiddleware, tracer=app.state.tracer)
 
     @app.exception_handler(APIException)
     async def api_exception_handler(request: Request, exc: APIException):
@@ -103,6 +150,9 @@ def create_app() -> FastAPI:
     app.include_router(execfunction_router, prefix="/v1")
     app.include_router(usage_router, prefix="/v1")
     app.include_router(draft_router, prefix="/v1")
+    app.include_router(admin_router, prefix="/v1")
+    # Unversioned, where Prometheus scrapers look by default.
+    app.include_router(metrics_router)
 
     return app
 
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from threading import Lock
+from typing import Generic, Literal, TypeVar
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQLITE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+# A TRUNCATE checkpoint can wait out the whole busy timeout.
+CHECKPOINT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = tuple[str, ...]
+_V = TypeVar("_V")
+
+
+class _ThreadShards(Generic[_V]):
+    """One dict per thread; each thread only writes its own, so updates take no lock.
+
+    The lock is taken once per thread (to register its shard) and per scrape.
+    Scrapes copy each shard's items, which is atomic under the GIL, and may
+    see a concurrent update or not.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: list[dict[Labels, _V]] = []
+        self._lock = Lock()
+
+    def local(self) -> dict[Labels, _V]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: dict[Labels, _V] = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def snapshot(self) -> list[list[tuple[Labels, _V]]]:
+        with self._lock:
+            shards = list(self._shards)
+        return [list(shard.items()) for shard in shards]
+
+
+class Counter:
+    """Monotonic counter with fixed label names."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._shards: _ThreadShards[float] = _ThreadShards()
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        shard = self._shards.local()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self.samples().get(labels, 0.0)
+
+    def samples(self) -> dict[Labels, float]:
+        totals: dict[Labels, float] = {}
+        for items in self._shards.snapshot():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def render(self) -> list[str]:
+        lines = _header(self.name, self.documentation, "counter")
+        for labels, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with fixed label names and upper bounds."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._upper_bounds = tuple(sorted(buckets))
+        # Per label set: one count per bucket plus +Inf (not cumulative), then the sum.
+        self._shards: _ThreadShards[list[float]] = _ThreadShards()
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        shard = self._shards.local()
+        state = shard.get(labels)
+        if state is None:
+            state = shard[labels] = [0.0] * (len(self._upper_bounds) + 2)
+        state[bisect_left(self._upper_bounds, value)] += 1
+        state[-1] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        state = self._merged().get(labels)
+        return 0 if state is None else int(sum(state[:-1]))
+
+    def render(self) -> list[str]:
+        lines = _header(self.name, self.documentation, "histogram")
+        bounds = [*self._upper_bounds, math.inf]
+        for labels, state in sorted(self._merged().items()):
+            cumulative = 0.0
+            for bound, count in zip(bounds, state, strict=False):
+                cumulative += count
+                bucket_labels = _labels((*self.labelnames, "le"), (*labels, _number(bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {_number(cumulative)}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_number(state[-1])}")
+            lines.append(f"{self.name}_count{label_text} {_number(cumulative)}")
+        return lines
+
+    def _merged(self) -> dict[Labels, list[float]]:
+        merged: dict[Labels, list[float]] = {}
+        for items in self._shards.snapshot():
+            for labels, state in items:
+                total = merged.setdefault(labels, [0.0] * len(state))
+                for index, value in enumerate(list(state)):
+                    total[index] += value
+        return merged
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Histogram] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets=buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, extra_lines: Iterable[str] = ()) -> str:
+        lines = [line for metric in self._metrics for line in metric.render()]
+        lines.extend(extra_lines)
+        return "\n".join(lines) + "\n"
+
+
+def render_samples(
+    name: str,
+    documentation: str,
+    kind: Literal["counter", "gauge"],
+    samples: Iterable[tuple[Labels, float]],
+    labelnames: Sequence[str] = (),
+) -> list[str]:
+    """Text exposition for values read from another component at scrape time."""
+    lines = _header(name, documentation, kind)
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+    return lines
+
+
+def _header(name: str, documentation: str, kind: str) -> list[str]:
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "offload_http_request_duration_seconds",
+    "HTTP request latency by method, route template and status code.",
+    ("method", "route", "status"),
+)
+PROVIDER_ATTEMPT_DURATION = REGISTRY.histogram(
+    "offload_provider_attempt_duration_seconds",
+    "Latency of each AI provider HTTP attempt by provider, feature and outcome.",
+    ("provider", "feature", "outcome"),
+)
+PROVIDER_RETRIES = REGISTRY.counter(
+    "offload_provider_retries_total",
+    "AI provider attempts retried after a retryable failure.",
+    ("provider", "feature"),
+)
+SQLITE_LOCK_WAIT = REGISTRY.histogram(
+    "offload_sqlite_lock_wait_seconds",
+    "Time spent waiting for a SQLite writer or reader connection.",
+    ("database", "role"),
+    buckets=SQLITE_BUCKETS,
+)
+SQLITE_QUERY = REGISTRY.histogram(
+    "offload_sqlite_query_seconds",
+    "Time a SQLite writer or reader connection was held.",
+    ("database", "role"),
+    buckets=SQLITE_BUCKETS,
+)
+SQLITE_CHECKPOINT = REGISTRY.histogram(
+    "offload_sqlite_checkpoint_seconds",
+    "Duration of WAL checkpoints run by SQLite maintenance, by database file and mode.",
+    ("database", "mode"),
+    buckets=CHECKPOINT_BUCKETS,
+)
+RATE_LIMIT_REJECTIONS = REGISTRY.counter(
+    "offload_rate_limit_rejections_total",
+    "Requests rejected by a rate limiter, by limiter and dimension.",
+    ("limiter", "dimension"),
+)
+AI_TOKENS = REGISTRY.counter(
+    "offload_ai_tokens_total",
+    "AI provider tokens consumed by feature and kind (input/output).",
+    ("feature", "kind"),
+)
+
+
+def record_ai_tokens(*, feature: str, input_tokens: int, output_tokens: int) -> None:
+    AI_TOKENS.inc((feature, "input"), input_tokens)
+    AI_TOKENS.inc((feature, "output"), output_tokens)
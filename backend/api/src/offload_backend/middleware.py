@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+import time
+import uuid
+from contextlib import AbstractContextManager, nullcontext
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from offload_backend.metrics import HTTP_REQUEST_DURATION
+from offload_backend.tracing import Span, Tracer
+
+logger = logging.getLogger("offload_backend")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+UNMATCHED_ROUTE = "<unmatched>"
+_REQUEST_ID_HEADER_KEY = REQUEST_ID_HEADER.lower().encode("latin-1")
+
+
+class RequestContextMiddleware:
+    """Assigns each HTTP request an ID, echoes it as X-Request-ID and logs latency.
+
+    The ID is taken from the client's X-Request-ID header when present and is
+    exposed to handlers as request.state.request_id. This is a pure ASGI
+    middleware: unlike @app.middleware("http") it does not run the app in a
+    separate task or re-stream the response body through a memory channel.
+    It only rewrites the headers of http.response.start, so streaming
+    responses pass through unbuffered.
+
+    latency_ms covers the whole exchange, including sending the body. The same
+    duration feeds the HTTP request latency histogram in metrics. With a
+    tracer, the exchange is also the root span of a trace keyed by the ID.
+    """
+
+    def __init__(self, app: ASGIApp, *, tracer: Tracer | None = None) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _client_request_id(scope) or str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        status_code = 500
+        started_at = time.perf_counter()
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        with self._trace(scope, request_id) as root:
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                elapsed = time.perf_counter() - started_at
+                route = _route_template(scope)
+                if root is not None:
+                    root.set_attribute("route", route)
+                    root.set_attribute("status_code", status_code)
+                HTTP_REQUEST_DURATION.observe(elapsed, (scope["method"], route, str(status_code)))
+                # 5xx completions are logged at WARNING so log sampling never drops them.
+                logger.log(
+                    logging.WARNING if status_code >= 500 else logging.INFO,
+                    "request_complete",
+                    extra={
+                        "request_id": request_id,
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status_code": status_code,
+                        "latency_ms": int(elapsed * 1000),
+                    },
+                )
+
+    def _trace(self, scope: Scope, request_id: str) -> AbstractContextManager[Span | None]:
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.trace(
+            "http.request", trace_id=request_id, method=scope["method"], path=scope["path"]
+        )
+
+
+def _client_request_id(scope: Scope) -> str | None:
+    for key, value in scope["headers"]:
+        if key == _REQUEST_ID_HEADER_KEY:
+            return value.decode("latin-1")
+    return None
+
+
+def _route_template(scope: Scope) -> str:
+    # The router records the matched route in the scope. Label by its template,
+    # not the raw path, so path parameters cannot blow up label cardinality.
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    path_regex = getattr(route, "path_regex", None)
+    if not isinstance(template, str) or path_regex is None:
+        return UNMATCHED_ROUTE
+    # Routes of an included router keep paths relative to the include prefix;
+    # the prefix is whatever of the request path precedes the route's match.
+    path = scope["path"]
+    for index, char in enumerate(path):
+        if char == "/" and path_regex.match(path[index:]):
+            return path[:index] + template
+    return template
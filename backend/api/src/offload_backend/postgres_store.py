@@ -0,0 +1,499 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import threading
+import uuid
+from collections.abc import Awaitable, Callable, Coroutine, Iterator, Mapping
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime
+from typing import Any, Protocol, TypeVar
+
+from offload_backend.usage_store import (
+    DEFAULT_EXPORT_PAGE_SIZE,
+    UsageKey,
+    UsageRecord,
+    UsageSummary,
+    build_usage_summary,
+    iter_keyset_pages,
+    omit_client_counts,
+)
+from offload_backend.user_store import UserRecord
+
+_T = TypeVar("_T")
+
+# Reads racing a flush retry this many times before accepting an overcount.
+_BUFFERED_READ_ATTEMPTS = 3
+
+
+class AsyncConnection(Protocol):
+    """The subset of an asyncpg connection the PostgreSQL stores rely on."""
+
+    async def execute(self, query: str, *args: Any) -> Any: ...
+    async def executemany(self, query: str, args: list[tuple[Any, ...]]) -> Any: ...
+    async def fetch(self, query: str, *args: Any) -> list[Any]: ...
+    async def fetchrow(self, query: str, *args: Any) -> Any | None: ...
+    async def fetchval(self, query: str, *args: Any) -> Any: ...
+    def transaction(self) -> AbstractAsyncContextManager[Any]: ...
+
+
+class AsyncConnectionPool(Protocol):
+    """The subset of an asyncpg pool the PostgreSQL stores rely on."""
+
+    def acquire(self) -> AbstractAsyncContextManager[AsyncConnection]: ...
+    async def close(self) -> None: ...
+
+
+PoolFactory = Callable[[], Awaitable[AsyncConnectionPool]]
+
+
+def asyncpg_pool_factory(*, dsn: str, min_size: int, max_size: int) -> PoolFactory:
+    """Return a factory creating an asyncpg pool; asyncpg is an optional dependency."""
+
+    async def _create() -> AsyncConnectionPool:
+        try:
+            asyncpg = importlib.import_module("asyncpg")
+        except ImportError as exc:
+            raise RuntimeError(
+                "The postgres storage backend requires asyncpg; "
+                "install offload-backend-api[postgres]",
+            ) from exc
+        return await asyncpg.create_pool(dsn=dsn, min_size=min_size, max_size=max_size)
+
+    return _create
+
+
+class PostgresStorage:
+    """Runs an async connection pool on a dedicated event loop thread.
+
+    UsageStore and UserStore are synchronous protocols called from both request
+    threads and the app's event loop, so the stores submit their coroutines to
+    this loop and wait on the result. Both stores share the one pool.
+    """
+
+    def __init__(self, pool_factory: PoolFactory):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="offload-postgres-loop",
+            daemon=True,
+        )
+        self._thread.start()
+        self._closed = False
+        try:
+            self.pool: AsyncConnectionPool = self.run(pool_factory())
+        except Exception:
+            self._stop_loop()
+            raise
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, _T] | Awaitable[_T]) -> _T:
+        return asyncio.run_coroutine_threadsafe(_as_coroutine(coro), self._loop).result()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> None:
+        asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.run(self.pool.close())
+        self._stop_loop()
+
+    def _stop_loop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+
+async def _as_coroutine(awaitable: Awaitable[_T]) -> _T:
+    return await awaitable
+
+
+_USAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_counts (
+    install_id TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT (now()),
+    PRIMARY KEY (install_id, feature)
+)
+"""
+
+# Only a raised counter bumps updated_at, matching SQLiteUsageStore.
+_RECONCILE_UPSERT = """
+INSERT INTO usage_counts (install_id, feature, count)
+VALUES ($1, $2, $3)
+ON CONFLICT (install_id, feature)
+DO UPDATE SET
+    count = GREATEST(usage_counts.count, excluded.count),
+    updated_at = CASE
+        WHEN excluded.count > usage_counts.count THEN now()
+        ELSE usage_counts.updated_at
+    END
+"""
+
+_USERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    apple_user_id TEXT UNIQUE NOT NULL,
+    install_id TEXT NOT NULL,
+    display_name TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT (now())
+)
+"""
+
+
+class PostgresUsageStore:
+    """UsageStore backed by a PostgreSQL-compatible server.
+
+    Reconcile uses the same server-side upsert as SQLiteUsageStore. Increments
+    are buffered in-process and written in batches with one executemany per
+    flush; a flush is triggered when write_batch_size increments are pending
+    and otherwise every flush_interval_seconds. Reads add this process's
+    buffered increments for the install, so its own quota checks never
+    undercount; other processes and hosts only see them once they are
+    flushed. Increments still in the buffer when the process is killed are
+    lost, bounded by the flush interval.
+    """
+
+    def __init__(
+        self,
+        *,
+        storage: PostgresStorage,
+        write_batch_size: int = 100,
+        flush_interval_seconds: float = 0.05,
+    ):
+        self._storage = storage
+        self._write_batch_size = max(1, write_batch_size)
+        self._flush_interval_seconds = flush_interval_seconds
+        self._pending: dict[tuple[str, str], int] = {}
+        # The batch being written by aflush, and a count of committed flushes.
+        self._in_flight: dict[tuple[str, str], int] = {}
+        self._flushes = 0
+        self._pending_lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._closed = False
+        self._storage.run(self._bootstrap_schema())
+        self._flusher = asyncio.run_coroutine_threadsafe(self._flush_periodically(), storage.loop)
+
+    async def _bootstrap_schema(self) -> None:
+        async with self._storage.pool.acquire() as connection:
+            await connection.execute(_USAGE_SCHEMA)
+
+    async def areconcile(self, *, install_id: str, feature: str, local_count: int) -> int:
+        await self.aflush()
+        async with self._storage.pool.acquire() as connection:
+            value = await connection.fetchval(
+                f"{_RECONCILE_UPSERT} RETURNING count",
+                install_id,
+                feature,
+                local_count,
+            )
+        if value is None:
+            raise RuntimeError("failed to reconcile usage count")
+        return int(value)
+
+    async def areconcile_many(
+        self,
+        *,
+        install_id: str,
+        local_counts: Mapping[str, int],
+        since: datetime | None = None,
+    ) -> list[UsageRecord]:
+        await self.aflush()
+        async with self._storage.pool.acquire() as connection:
+            async with connection.transaction():
+                if local_counts:
+                    await connection.executemany(
+                        _RECONCILE_UPSERT,
+                        [(install_id, feature, count) for feature, count in local_counts.items()],
+                    )
+                if since is not None:
+                    rows = await connection.fetch(
+                        "SELECT feature, count, updated_at FROM usage_counts"
+                        " WHERE install_id = $1 AND updated_at >= $2 ORDER BY feature",
+                        install_id,
+                        since,
+                    )
+                elif local_counts:
+                    placeholders = ",".join(
+                        f"${index}" for index in range(2, len(local_counts) + 2)
+                    )
+                    rows = await connection.fetch(
+                        "SELECT feature, count, updated_at FROM usage_counts"
+                        f" WHERE install_id = $1 AND feature IN ({placeholders})"  # noqa: S608
+                        " ORDER BY feature",
+                        install_id,
+                        *local_counts,
+                    )
+                else:
+                    rows = []
+        records = [
+            UsageRecord(install_id, str(row[0]), int(row[1]), _format_timestamp(row[2]))
+            for row in rows
+        ]
+        return records if since is None else omit_client_counts(records, local_counts)
+
+    async def aget_total_count(self, *, install_id: str, features: list[str]) -> int:
+        if not features:
+            return 0
+        placeholders = ",".join(f"${index}" for index in range(2, len(features) + 2))
+        rows, buffered = await self._read_with_buffered(
+            install_id,
+            "SELECT COALESCE(SUM(count), 0) FROM usage_counts"
+            f" WHERE install_id = $1 AND feature IN ({placeholders})",  # noqa: S608
+            install_id,
+            *features,
+        )
+        value = rows[0][0] if rows else 0
+        return int(value or 0) + sum(buffered.get(feature, 0) for feature in features)
+
+    async def aget_summary(self, *, install_id: str) -> UsageSummary:
+        rows, pending = await self._read_with_buffered(
+            install_id,
+            "SELECT feature, count, updated_at FROM usage_counts WHERE install_id = $1",
+            install_id,
+        )
+        records = [
+            UsageRecord(
+                install_id,
+                str(row[0]),
+                int(row[1]) + pending.pop(str(row[0]), 0),
+                _format_timestamp(row[2]),
+            )
+            for row in rows
+        ]
+        records.extend(
+            UsageRecord(install_id, feature, delta) for feature, delta in pending.items()
+        )
+        return build_usage_summary(install_id, records)
+
+    async def ausage_page(self, after: UsageKey | None, page_size: int) -> list[UsageRecord]:
+        async with self._storage.pool.acquire() as connection:
+            if after is None:
+                rows = await connection.fetch(
+                    "SELECT install_id, feature, count, updated_at FROM usage_counts"
+                    " ORDER BY install_id, feature LIMIT $1",
+                    page_size,
+                )
+            else:
+                rows = await connection.fetch(
+                    "SELECT install_id, feature, count, updated_at FROM usage_counts"
+                    " WHERE (install_id, feature) > ($1, $2)"
+                    " ORDER BY install_id, feature LIMIT $3",
+                    *after,
+                    page_size,
+                )
+        return [
+            UsageRecord(str(row[0]), str(row[1]), int(row[2]), _format_timestamp(row[3]))
+            for row in rows
+        ]
+
+    async def adump(self) -> dict[tuple[str, str], int]:
+        await self.aflush()
+        async with self._storage.pool.acquire() as connection:
+            rows = await connection.fetch("SELECT install_id, feature, count FROM usage_counts")
+        return {(str(row[0]), str(row[1])): int(row[2]) for row in rows}
+
+    async def aflush(self) -> None:
+        """Write all buffered increments in a single batched transaction."""
+        async with self._flush_lock:
+            with self._pending_lock:
+                batch = list(self._pending.items())
+                self._in_flight, self._pending = self._pending, {}
+            if not batch:
+                return
+            try:
+                async with self._storage.pool.acquire() as connection:
+                    async with connection.transaction():
+                        await connection.executemany(
+                            """
+                            INSERT INTO usage_counts (install_id, feature, count)
+                            VALUES ($1, $2, $3)
+                            ON CONFLICT (install_id, feature)
+                            DO UPDATE SET
+                                count = usage_counts.count + excluded.count,
+                                updated_at = now()
+                            """,
+                            [(*key, delta) for key, delta in batch],
+                        )
+            except Exception:
+                # Put the batch back so the next flush retries it.
+                with self._pending_lock:
+                    self._in_flight = {}
+                    for key, delta in batch:
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                raise
+            with self._pending_lock:
+                self._in_flight = {}
+                self._flushes += 1
+
+    def reconcile(self, *, install_id: str, feature: str, local_count: int) -> int:
+        return self._storage.run(
+            self.areconcile(install_id=install_id, feature=feature, local_count=local_count)
+        )
+
+    def reconcile_many(
+        self,
+        *,
+        install_id: str,
+        local_counts: Mapping[str, int],
+        since: datetime | None = None,
+    ) -> list[UsageRecord]:
+        return self._storage.run(
+            self.areconcile_many(install_id=install_id, local_counts=local_counts, since=since)
+        )
+
+    def get_total_count(self, *, install_id: str, features: list[str]) -> int:
+        return self._storage.run(self.aget_total_count(install_id=install_id, features=features))
+
+    def get_summary(self, *, install_id: str) -> UsageSummary:
+        return self._storage.run(self.aget_summary(install_id=install_id))
+
+    def increment(self, *, install_id: str, feature: str, tokens: int = 0) -> None:
+        del tokens  # No token rollup in PostgreSQL; see UsageStore.increment.
+        key = (install_id, feature)
+        with self._pending_lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            pending = len(self._pending)
+        if pending >= self._write_batch_size:
+            self._storage.submit(self.aflush())
+
+    def iter_usage(self, *, page_size: int = DEFAULT_EXPORT_PAGE_SIZE) -> Iterator[UsageRecord]:
+        self._storage.run(self.aflush())
+        return iter_keyset_pages(
+            lambda after, size: self._storage.run(self.ausage_page(after, size)),
+            page_size=page_size,
+        )
+
+    def dump(self) -> dict[tuple[str, str], int]:
+        return self._storage.run(self.adump())
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._flusher.cancel()
+        self._storage.run(self.aflush())
+
+    async def _read_with_buffered(
+        self, install_id: str, query: str, *args: object
+    ) -> tuple[list[Any], dict[str, int]]:
+        """Run query and return its rows with the install's buffered increments by feature.
+
+        The buffer is snapshotted first and the query runs without the flush
+        lock, so reads never wait on a flush. If a flush committed in between,
+        the snapshot may double count its batch, so the read is retried; after
+        _BUFFERED_READ_ATTEMPTS it overcounts by that batch rather than
+        undercount.
+        """
+        for _ in range(_BUFFERED_READ_ATTEMPTS):
+            with self._pending_lock:
+                flushes = self._flushes
+                buffered: dict[str, int] = {}
+                for batch in (self._in_flight, self._pending):
+                    for (owner, feature), delta in batch.items():
+                        if owner == install_id:
+                            buffered[feature] = buffered.get(feature, 0) + delta
+            async with self._storage.pool.acquire() as connection:
+                rows = await connection.fetch(query, *args)
+            with self._pending_lock:
+                if self._flushes == flushes:
+                    break
+        return rows, buffered
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval_seconds)
+            try:
+                await self.aflush()
+            except Exception:
+                # The batch was re-queued; retry on the next tick.
+                continue
+
+
+class PostgresUserStore:
+    """UserStore backed by a PostgreSQL-compatible server."""
+
+    def __init__(self, *, storage: PostgresStorage):
+        self._storage = storage
+        self._storage.run(self._bootstrap_schema())
+
+    async def _bootstrap_schema(self) -> None:
+        async with self._storage.pool.acquire() as connection:
+            await connection.execute(_USERS_SCHEMA)
+
+    async def aupsert_by_apple_id(
+        self,
+        *,
+        apple_user_id: str,
+        install_id: str,
+        display_name: str | None,
+    ) -> UserRecord:
+        async with self._storage.pool.acquire() as connection:
+            row = await connection.fetchrow(
+                """
+                INSERT INTO users (user_id, apple_user_id, install_id, display_name)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (apple_user_id) DO UPDATE SET
+                    install_id = excluded.install_id,
+                    display_name = COALESCE(excluded.display_name, users.display_name)
+                RETURNING user_id, apple_user_id, install_id, display_name
+                """,
+                str(uuid.uuid4()),
+                apple_user_id,
+                install_id,
+                display_name,
+            )
+        if row is None:
+            raise RuntimeError("failed to upsert user record")
+        return _parse_user_row(row)
+
+    async def aget_by_apple_id(self, apple_user_id: str) -> UserRecord | None:
+        async with self._storage.pool.acquire() as connection:
+            row = await connection.fetchrow(
+                "SELECT user_id, apple_user_id, install_id, display_name FROM users"
+                " WHERE apple_user_id = $1",
+                apple_user_id,
+            )
+        return _parse_user_row(row) if row is not None else None
+
+    def upsert_by_apple_id(
+        self,
+        *,
+        apple_user_id: str,
+        install_id: str,
+        display_name: str | None,
+    ) -> UserRecord:
+        return self._storage.run(
+            self.aupsert_by_apple_id(
+                apple_user_id=apple_user_id,
+                install_id=install_id,
+                display_name=display_name,
+            )
+        )
+
+    def get_by_apple_id(self, apple_user_id: str) -> UserRecord | None:
+        return self._storage.run(self.aget_by_apple_id(apple_user_id))
+
+    def close(self) -> None:
+        return None
+
+
+def _format_timestamp(value: Any) -> str | None:
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _parse_user_row(row: Any) -> UserRecord:
+    return UserRecord(
+        user_id=str(row[0]),
+        apple_user_id=str(row[1]),
+        install_id=str(row[2]),
+        display_name=str(row[3]) if row[3] is not None else None,
+    )
@@ -8,6 +8,7 @@ import asyncio
 import json
 import logging
 import random
+import time
 from collections.abc import Callable
 
 import httpx
@@ -25,7 +26,10 @@ from offload_backend.providers.base import (
     ProviderUnavailable,
     RequestExecutor,
     SleepFunction,
+    attempt_outcome,
     compute_retry_delay,
+    record_provider_attempt,
+    record_provider_retry,
 )
 
 logger = logging.getLogger("offload_backend")
@@ -108,7 +112,7 @@ class AnthropicProviderAdapter:
                 }
             ],
         }
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="breakdown")
         return self._parse_breakdown_response(response)
 
     async def compile_brain_dump(
@@ -150,10 +154,10 @@ class AnthropicProviderAdapter:
                 }
             ],
         }
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="braindump")
         return self._parse_brain_dump_response(response)
 
-    async def _execute_with_retry(self, *, payload: dict) -> httpx.Response:
+    async def _execute_with_retry(self, *, payload: dict, feature: str) -> httpx.Response:
         """Execute an Anthropic API request with exponential backoff retry.
 
         Retries on timeouts, network errors, 429, and 5xx responses.
@@ -172,13 +176,18 @@ class AnthropicProviderAdapter:
         last_retryable_error: Exception | None = None
 
         for attempt in range(1, max_attempts + 1):
+            started_at = time.perf_counter()
             try:
                 response = await self._request_executor(url, payload, headers, timeout)
             except httpx.TimeoutException:
+                self._record_attempt(feature, attempt, "timeout", started_at)
                 last_retryable_error = ProviderTimeout("Anthropic request timed out")
             except httpx.HTTPError:
+                self._record_attempt(feature, attempt, "network_error", started_at)
                 last_retryable_error = ProviderRequestError("Anthropic request failed")
             else:
+                outcome = attempt_outcome(response.status_code)
+                self._record_attempt(feature, attempt, outcome, started_at)
                 if response.status_code == 529 or response.status_code >= 500:
                     last_retryable_error = ProviderUnavailable("Anthropic service unavailable")
                 elif response.status_code == 429:
@@ -197,6 +206,7 @@ class AnthropicProviderAdapter:
                 raise RuntimeError("retry loop invariant violated")
             if attempt >= max_attempts:
                 break
+            record_provider_retry(provider=self.provider_name, feature=feature)
             delay = compute_retry_delay(
                 attempt=attempt,
                 total_delay_slept=total_delay_slept,
@@ -222,6 +232,15 @@ class AnthropicProviderAdapter:
         )
         raise last_retryable_error
 
+    def _record_attempt(self, feature: str, attempt: int, outcome: str, started_at: float) -> None:
+        record_provider_attempt(
+            provider=self.provider_name,
+            feature=feature,
+            attempt=attempt,
+            outcome=outcome,
+            started_at=started_at,
+        )
+
     def _parse_breakdown_response(self, response: httpx.Response) -> ProviderBreakdownResult:
         try:
             body = response.json()
@@ -309,7 +328,7 @@ class AnthropicProviderAdapter:
                 }
             ],
         }
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="decide")
         return self._parse_decision_response(response)
 
     def _parse_decision_response(self, response: httpx.Response) -> ProviderDecisionResult:
@@ -384,7 +403,7 @@ class AnthropicProviderAdapter:
                 }
             ],
         }
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="execfunction")
         return self._parse_exec_function_response(response)
 
     def _parse_exec_function_response(
@@ -465,7 +484,7 @@ class AnthropicProviderAdapter:
                 }
             ],
         }
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="draft")
         return self._parse_draft_response(response)
 
     def _parse_draft_response(self, response: httpx.Response) -> ProviderDraftResult:
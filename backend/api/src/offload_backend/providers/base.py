@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import time
 from collections.abc import Awaitable, Callable
 from typing import Protocol
 
 import httpx
 from pydantic import BaseModel, ConfigDict, Field
 
+from offload_backend.metrics import PROVIDER_ATTEMPT_DURATION, PROVIDER_RETRIES
+from offload_backend.tracing import record_span
+
 RequestExecutor = Callable[[str, dict, dict, httpx.Timeout], Awaitable[httpx.Response]]
 SleepFunction = Callable[[float], Awaitable[None]]
 
@@ -27,6 +31,37 @@ def compute_retry_delay(
     return min(candidate, budget_left)
 
 
+def attempt_outcome(status_code: int) -> str:
+    if status_code >= 500:
+        return "server_error"
+    if status_code == 429:
+        return "rate_limited"
+    if status_code >= 400:
+        return "rejected"
+    return "ok"
+
+
+def record_provider_attempt(
+    *, provider: str, feature: str, attempt: int, outcome: str, started_at: float
+) -> None:
+    """Record one HTTP attempt in metrics and as a child span of the current trace."""
+    PROVIDER_ATTEMPT_DURATION.observe(
+        time.perf_counter() - started_at, (provider, feature, outcome)
+    )
+    record_span(
+        "provider.attempt",
+        started_at=started_at,
+        provider=provider,
+        feature=feature,
+        attempt=attempt,
+        outcome=outcome,
+    )
+
+
+def record_provider_retry(*, provider: str, feature: str) -> None:
+    PROVIDER_RETRIES.inc((provider, feature))
+
+
 class ProviderError(Exception):
     pass
 
@@ -4,6 +4,7 @@ import asyncio
 import json
 import logging
 import random
+import time
 from collections.abc import Callable
 
 import httpx
@@ -21,7 +22,10 @@ from offload_backend.providers.base import (
     ProviderUnavailable,
     RequestExecutor,
     SleepFunction,
+    attempt_outcome,
     compute_retry_delay,
+    record_provider_attempt,
+    record_provider_retry,
 )
 
 logger = logging.getLogger("offload_backend")
@@ -60,7 +64,7 @@ class OpenAIProviderAdapter:
             context_hints=context_hints,
             template_ids=template_ids,
         )
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="breakdown")
         return self._parse_success_response(response)
 
     def _request_payload(
@@ -97,7 +101,7 @@ class OpenAIProviderAdapter:
             "response_format": {"type": "json_object"},
         }
 
-    async def _execute_with_retry(self, *, payload: dict) -> httpx.Response:
+    async def _execute_with_retry(self, *, payload: dict, feature: str) -> httpx.Response:
         """Execute an OpenAI API request with exponential backoff retry.
 
         Retries on timeouts, network errors, 429, and 5xx responses.
@@ -115,13 +119,18 @@ class OpenAIProviderAdapter:
         last_retryable_error: Exception | None = None
 
         for attempt in range(1, max_attempts + 1):
+            started_at = time.perf_counter()
             try:
                 response = await self._request_executor(url, payload, headers, timeout)
             except httpx.TimeoutException:
+                self._record_attempt(feature, attempt, "timeout", started_at)
                 last_retryable_error = ProviderTimeout("OpenAI request timed out")
             except httpx.HTTPError:
+                self._record_attempt(feature, attempt, "network_error", started_at)
                 last_retryable_error = ProviderRequestError("OpenAI request failed")
             else:
+                outcome = attempt_outcome(response.status_code)
+                self._record_attempt(feature, attempt, outcome, started_at)
                 if response.status_code >= 500:
                     last_retryable_error = ProviderRequestError("OpenAI server error")
                 elif response.status_code == 429:
@@ -140,6 +149,7 @@ class OpenAIProviderAdapter:
                 raise RuntimeError("retry loop invariant violated")
             if attempt >= max_attempts:
                 break
+            record_provider_retry(provider=self.provider_name, feature=feature)
             delay = compute_retry_delay(
                 attempt=attempt,
                 total_delay_slept=total_delay_slept,
@@ -165,6 +175,15 @@ class OpenAIProviderAdapter:
         )
         raise last_retryable_error
 
+    def _record_attempt(self, feature: str, attempt: int, outcome: str, started_at: float) -> None:
+        record_provider_attempt(
+            provider=self.provider_name,
+            feature=feature,
+            attempt=attempt,
+            outcome=outcome,
+            started_at=started_at,
+        )
+
     async def _default_request_executor(
         self,
         url: str,
@@ -210,7 +229,7 @@ class OpenAIProviderAdapter:
             input_text=input_text,
             context_hints=context_hints,
         )
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="braindump")
         return self._parse_brain_dump_response(response)
 
     def _brain_dump_request_payload(
@@ -284,7 +303,7 @@ class OpenAIProviderAdapter:
             context_hints=context_hints,
             clarifying_answers=clarifying_answers,
         )
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="decide")
         return self._parse_decision_response(response)
 
     def _decision_request_payload(
@@ -367,7 +386,7 @@ class OpenAIProviderAdapter:
             context_hints=context_hints,
             strategy_history=strategy_history,
         )
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="execfunction")
         return self._parse_exec_function_response(response)
 
     def _exec_function_request_payload(
@@ -469,7 +488,7 @@ class OpenAIProviderAdapter:
             contact_name=contact_name,
             context_hints=context_hints,
         )
-        response = await self._execute_with_retry(payload=payload)
+        response = await self._execute_with_retry(payload=payload, feature="draft")
         return self._parse_draft_response(response)
 
     def _draft_request_payload(
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import socket
+import time
+from collections.abc import Callable
+from threading import Condition, Lock
+from urllib.parse import unquote, urlsplit
+
+from offload_backend.session_rate_limiter import (
+    GCRASessionRateLimiter,
+    SessionRateLimiter,
+    SessionRateLimitExceeded,
+)
+
+logger = logging.getLogger("offload_backend")
+
+# How long to limit locally after the store failed before trying it again.
+RETRY_REMOTE_SECONDS = 5.0
+
+# KEYS: ip window, install window. ARGV: ip limit, install limit, window seconds.
+# Checks both windows first and counts the request only if both have room,
+# so a rejection consumes nothing. Returns {0, ip count, install count} on
+# success or {rejecting key index, count, PTTL} on rejection.
+CHECK_AND_INCREMENT_SCRIPT = """
+for i = 1, 2 do
+  local count = tonumber(redis.call('GET', KEYS[i]) or '0')
+  if count >= tonumber(ARGV[i]) then
+    return {i, count, redis.call('PTTL', KEYS[i])}
+  end
+end
+local counts = {}
+for i = 1, 2 do
+  redis.call('SET', KEYS[i], 0, 'EX', ARGV[3], 'NX')
+  counts[i] = redis.call('INCR', KEYS[i])
+end
+return {0, counts[1], counts[2]}
+"""
+CHECK_AND_INCREMENT_SHA = hashlib.sha1(CHECK_AND_INCREMENT_SCRIPT.encode()).hexdigest()
+
+
+class RESPError(Exception):
+    """An error reply from the server (a `-ERR ...` line)."""
+
+
+RESPValue = bytes | int | list["RESPValue"] | RESPError | None
+
+
+class RESPUnavailableError(Exception):
+    """The server could not be reached or the pool had no free connection in time."""
+
+
+class RESPConnection:
+    """One blocking connection speaking the Redis serialization protocol (RESP2)."""
+
+    def __init__(self, *, host: str, port: int, timeout_seconds: float):
+        self._sock = socket.create_connection((host, port), timeout=timeout_seconds)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+
+    def pipeline(self, *commands: tuple[str | bytes | int, ...]) -> list[RESPValue]:
+        """Send every command in one write and read the replies in order.
+
+        Error replies are returned as RESPError instances, not raised, so
+        callers can tell which command failed.
+        """
+        self._sock.sendall(b"".join(_encode(command) for command in commands))
+        return [self._read() for _ in commands]
+
+    def execute(self, *command: str | bytes | int) -> RESPValue:
+        (reply,) = self.pipeline(command)
+        if isinstance(reply, RESPError):
+            raise reply
+        return reply
+
+    def close(self) -> None:
+        self._reader.close()
+        self._sock.close()
+
+    def _read(self) -> RESPValue:
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            return RESPError(payload.decode(errors="replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("connection closed by server")
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [self._read() for _ in range(count)]
+        raise ConnectionError(f"unexpected RESP reply type {kind!r}")
+
+
+class RESPConnectionPool:
+    """Thread-safe pool of RESPConnections to the server named by a redis:// URL.
+
+    Idle connections are reused most-recently-used first. At most
+    max_connections are open at once. A caller that finds none free waits up
+    to timeout_seconds, then gets RESPUnavailableError. A connection that
+    fails mid-command is closed, not returned to the pool.
+    """
+
+    def __init__(self, *, url: str, max_connections: int = 16, timeout_seconds: float = 0.1):
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError("rate limit store URL must use the redis:// scheme")
+        self._host = parts.hostname or "127.0.0.1"
+        self._port = parts.port or 6379
+        self._password = unquote(parts.password) if parts.password else None
+        self._username = unquote(parts.username) if parts.username else None
+        self._db = int(parts.path.lstrip("/") or 0)
+        self._max_connections = max(1, max_connections)
+        self._timeout_seconds = timeout_seconds
+        self._idle: list[RESPConnection] = []
+        self._open = 0
+        self._available = Condition(Lock())
+
+    def pipeline(self, *commands: tuple[str | bytes | int, ...]) -> list[RESPValue]:
+        connection = self._acquire()
+        try:
+            replies = connection.pipeline(*commands)
+        except (OSError, ValueError):
+            self._discard(connection)
+            raise
+        self._release(connection)
+        return replies
+
+    def execute(self, *command: str | bytes | int) -> RESPValue:
+        (reply,) = self.pipeline(command)
+        if isinstance(reply, RESPError):
+            raise reply
+        return reply
+
+    def close(self) -> None:
+        with self._available:
+            for connection in self._idle:
+                connection.close()
+            self._open -= len(self._idle)
+            self._idle.clear()
+
+    def _acquire(self) -> RESPConnection:
+        deadline = time.monotonic() + self._timeout_seconds
+        with self._available:
+            while not self._idle and self._open >= self._max_connections:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._available.wait(remaining):
+                    raise RESPUnavailableError("no free rate limit store connection")
+            if self._idle:
+                return self._idle.pop()
+            self._open += 1
+        try:
+            return self._connect()
+        except BaseException:
+            with self._available:
+                self._open -= 1
+                self._available.notify()
+            raise
+
+    def _connect(self) -> RESPConnection:
+        connection = RESPConnection(
+            host=self._host, port=self._port, timeout_seconds=self._timeout_seconds
+        )
+        try:
+            if self._password is not None:
+                auth = (self._username, self._password) if self._username else (self._password,)
+                connection.execute("AUTH", *auth)
+            if self._db:
+                connection.execute("SELECT", self._db)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def _release(self, connection: RESPConnection) -> None:
+        with self._available:
+            self._idle.append(connection)
+            self._available.notify()
+
+    def _discard(self, connection: RESPConnection) -> None:
+        connection.close()
+        with self._available:
+            self._open -= 1
+            self._available.notify()
+
+
+class RedisSessionRateLimiter:
+    """Fixed-window limits enforced across every node through a Redis-protocol store.
+
+    Each check is one EVALSHA round trip of CHECK_AND_INCREMENT_SCRIPT, which
+    runs atomically on the server: it checks both dimensions and only then
+    opens (`SET key 0 EX window NX`) and counts (INCR) each window, so, as
+    with the local limiters, rejected requests consume nothing. PTTL of the
+    rejecting window gives the exact retry_after. The script is sent (SCRIPT
+    LOAD) only when the server answers NOSCRIPT, i.e. on first use and after
+    a restart or failover.
+
+    Keys are `<key_prefix>:{<namespace>}:<dimension>:<value>`. The hash tag
+    keeps both keys of a check in one Redis Cluster slot, which the script
+    requires.
+
+    check() blocks on a socket round trip (blocking = True), so async
+    callers run it in the threadpool.
+
+    If the store is unreachable, slow (timeout_seconds) or returns an error,
+    the limiter fails open to `fallback` (a local GCRASessionRateLimiter by
+    default) and retries the store after RETRY_REMOTE_SECONDS.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        *,
+        pool: RESPConnectionPool,
+        namespace: str,
+        limit_per_ip: int,
+        limit_per_install: int,
+        window_seconds: int,
+        key_prefix: str = "offload:ratelimit",
+        fallback: SessionRateLimiter | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._pool = pool
+        self._key_prefix = f"{key_prefix}:{{{namespace}}}"
+        self._limit_per_ip = limit_per_ip
+        self._limit_per_install = limit_per_install
+        self._window_seconds = window_seconds
+        self._fallback = fallback or GCRASessionRateLimiter(
+            limit_per_ip=limit_per_ip,
+            limit_per_install=limit_per_install,
+            window_seconds=window_seconds,
+        )
+        self._clock = clock
+        self._retry_remote_at = 0.0
+        self.fallback_checks = 0
+
+    @property
+    def fallback_active(self) -> bool:
+        return self._clock() < self._retry_remote_at
+
+    def check(self, *, client_ip: str, install_id: str) -> int:
+        if not self.fallback_active:
+            try:
+                rejected, first, second = self._check_and_increment(
+                    client_ip=client_ip, install_id=install_id
+                )
+            except (OSError, ValueError, RESPError, RESPUnavailableError) as exc:
+                self._retry_remote_at = self._clock() + RETRY_REMOTE_SECONDS
+                logger.warning(
+                    "rate_limit_store_unavailable",
+                    extra={"error": repr(exc), "retry_in_seconds": RETRY_REMOTE_SECONDS},
+                )
+            else:
+                if rejected:
+                    # first is the rejecting window's count, second its PTTL.
+                    raise SessionRateLimitExceeded(
+                        dimension="ip" if rejected == 1 else "install_id",
+                        retry_after_seconds=self._retry_after(second),
+                    )
+                # first and second are the IP and install counts after this request.
+                return min(self._limit_per_ip - first, self._limit_per_install - second)
+        self.fallback_checks += 1
+        return self._fallback.check(client_ip=client_ip, install_id=install_id)
+
+    def _check_and_increment(self, *, client_ip: str, install_id: str) -> tuple[int, int, int]:
+        evalsha = (
+            "EVALSHA",
+            CHECK_AND_INCREMENT_SHA,
+            2,
+            f"{self._key_prefix}:ip:{client_ip}",
+            f"{self._key_prefix}:install:{install_id}",
+            self._limit_per_ip,
+            self._limit_per_install,
+            self._window_seconds,
+        )
+        (reply,) = self._pool.pipeline(evalsha)
+        if isinstance(reply, RESPError) and str(reply).startswith("NOSCRIPT"):
+            _, reply = self._pool.pipeline(
+                ("SCRIPT", "LOAD", CHECK_AND_INCREMENT_SCRIPT), evalsha
+            )
+        match reply:
+            case [int() as rejected, int() as first, int() as second]:
+                return rejected, first, second
+            case RESPError():
+                raise reply
+        raise RESPError("unexpected EVALSHA reply")
+
+    def _retry_after(self, ttl_ms: int) -> int:
+        # PTTL is -1 without an expiry (should not happen) and -2 for a missing key.
+        if ttl_ms < 0:
+            return self._window_seconds
+        return max(1, math.ceil(ttl_ms / 1000))
+
+
+def _encode(command: tuple[str | bytes | int, ...]) -> bytes:
+    parts = [b"*%d\r\n" % len(command)]
+    for arg in command:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, int):
+            data = b"%d" % arg
+        else:
+            data = arg.encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from fastapi import APIRouter, Depends, Query, Request
+
+from offload_backend.dependencies import require_admin
+from offload_backend.errors import APIException
+from offload_backend.schemas import (
+    AdminBackupResponse,
+    AdminTracesResponse,
+    BackupFileReport,
+    TraceReport,
+    TraceSpanReport,
+)
+from offload_backend.sqlite_backup import BackupInProgressError
+from offload_backend.tracing import RingBufferExporter, Trace
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/admin/backups", response_model=AdminBackupResponse)
+def create_backup(request: Request) -> AdminBackupResponse:
+    """Run an online backup of every SQLite database now (blocks until done)."""
+    runner = request.app.state.stores.sqlite_backup
+    if runner is None:
+        raise APIException(
+            status_code=409,
+            code="backup_not_configured",
+            message="Backups require SQLite storage and OFFLOAD_SQLITE_BACKUP_DIR",
+        )
+    try:
+        reports = runner.run()
+    except BackupInProgressError as exc:
+        raise APIException(
+            status_code=409,
+            code="backup_in_progress",
+            message="A backup is already running",
+        ) from exc
+
+    return AdminBackupResponse(
+        backups=[
+            BackupFileReport(
+                source=report.source,
+                destination=report.destination,
+                pages=report.pages,
+                size_bytes=report.size_bytes,
+                duration_ms=int(report.seconds * 1000),
+                pages_per_second=round(report.pages_per_second, 1),
+            )
+            for report in reports
+        ]
+    )
+
+
+@router.get("/admin/traces", response_model=AdminTracesResponse)
+def list_slow_traces(
+    request: Request,
+    limit: int = Query(default=20, ge=1, le=256),
+    min_duration_ms: float = Query(default=0.0, ge=0.0),
+) -> AdminTracesResponse:
+    """Dump the slowest recent traces kept by the in-memory trace buffer, slowest first."""
+    tracer = request.app.state.tracer
+    exporter = None if tracer is None else tracer.exporter
+    if not isinstance(exporter, RingBufferExporter):
+        raise APIException(
+            status_code=409,
+            code="tracing_not_configured",
+            message="Trace dumps require OFFLOAD_TRACING_ENABLED and the in-memory exporter",
+        )
+    traces = exporter.slowest(limit=limit, min_duration_seconds=min_duration_ms / 1000)
+    return AdminTracesResponse(traces=[_trace_report(trace) for trace in traces])
+
+
+def _trace_report(trace: Trace) -> TraceReport:
+    root_started_at = trace.root.started_at
+    # Copy: a task that outlives its request can still append spans.
+    spans = list(trace.spans)
+    return TraceReport(
+        trace_id=trace.trace_id,
+        started_at=datetime.fromtimestamp(trace.started_at_epoch, tz=UTC),
+        duration_ms=round(trace.duration_seconds * 1000, 3),
+        spans=[
+            TraceSpanReport(
+                span_id=span.span_id,
+                parent_id=span.parent_id,
+                name=span.name,
+                start_offset_ms=round(max(0.0, span.started_at - root_started_at) * 1000, 3),
+                duration_ms=round(max(0.0, span.duration_seconds) * 1000, 3),
+                status=span.status,
+                attributes=span.attributes,
+            )
+            for span in spans
+        ],
+    )
@@ -3,6 +3,7 @@ from __future__ import annotations
 import logging
 
 from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
 
 from offload_backend.apple_auth import AppleTokenValidationError, AppleTokenValidator
 from offload_backend.config import Settings
@@ -23,7 +24,7 @@ router = APIRouter()
 
 
 @router.post("/auth/apple", response_model=AppleAuthResponse)
-def sign_in_with_apple(
+async def sign_in_with_apple(
     body: AppleAuthRequest,
     token_manager: TokenManager = Depends(get_token_manager),
     user_store: UserStore = Depends(get_user_store),
@@ -31,7 +32,7 @@ def sign_in_with_apple(
     settings: Settings = Depends(get_app_settings),
 ) -> AppleAuthResponse:
     try:
-        apple_sub = apple_validator.validate(body.apple_identity_token)
+        apple_sub = await apple_validator.validate(body.apple_identity_token)
     except AppleTokenValidationError as exc:
         logger.warning("apple_token_validation_failed", extra={"error": str(exc)})
         raise APIException(
@@ -40,7 +41,10 @@ def sign_in_with_apple(
             message="Apple identity token validation failed",
         ) from exc
 
-    user = user_store.upsert_by_apple_id(
+    # The upsert blocks (SQLite BEGIN IMMEDIATE, or a Postgres round trip), so
+    # run it in the threadpool like a sync route would.
+    user = await run_in_threadpool(
+        user_store.upsert_by_apple_id,
         apple_user_id=apple_sub,
         install_id=body.install_id,
         display_name=body.display_name,
@@ -2,20 +2,24 @@ from __future__ import annotations
 
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
 
 from offload_backend.config import Settings
 from offload_backend.dependencies import (
     enforce_ai_inference_rate_limit,
     enforce_ai_quota,
     get_ai_inference_rate_limiter,
+    get_ai_token_budget,
     get_app_settings,
     get_provider,
     get_session_claims,
     get_usage_store,
     require_cloud_opt_in,
+    reserve_ai_tokens,
+    set_ai_pacing_headers,
 )
 from offload_backend.errors import APIException, call_provider
+from offload_backend.metrics import record_ai_tokens
 from offload_backend.providers.base import AIProvider
 from offload_backend.schemas import (
     BrainDumpCompileRequest,
@@ -25,6 +29,8 @@ from offload_backend.schemas import (
 )
 from offload_backend.security import SessionClaims
 from offload_backend.session_rate_limiter import SessionRateLimiter
+from offload_backend.token_budget import TokenBudgetLimiter
+from offload_backend.tracing import span
 from offload_backend.usage_store import UsageStore
 
 router = APIRouter()
@@ -38,18 +44,21 @@ def _request_content_size_chars(request: BrainDumpCompileRequest) -> int:
 async def compile_brain_dump(
     request: BrainDumpCompileRequest,
     http_request: Request,
+    http_response: Response,
     claims: SessionClaims = Depends(get_session_claims),
     _: None = Depends(require_cloud_opt_in),
-    _quota: None = Depends(enforce_ai_quota),
+    quota_remaining: int = Depends(enforce_ai_quota),
     provider: AIProvider = Depends(get_provider),
     settings: Settings = Depends(get_app_settings),
     limiter: SessionRateLimiter = Depends(get_ai_inference_rate_limiter),
+    token_budget: TokenBudgetLimiter = Depends(get_ai_token_budget),
     usage_store: UsageStore = Depends(get_usage_store),
 ) -> BrainDumpCompileResponse:
-    enforce_ai_inference_rate_limit(
+    rate_limit_remaining = await enforce_ai_inference_rate_limit(
         install_id=claims.install_id, request=http_request, limiter=limiter
     )
-    if _request_content_size_chars(request) > settings.max_input_chars:
+    input_chars = _request_content_size_chars(request)
+    if input_chars > settings.max_input_chars:
         raise APIException(
             status_code=413,
             code="request_too_large",
@@ -58,15 +67,37 @@ async def compile_brain_dump(
 
     started_at = datetime.now(UTC)
 
-    result = await call_provider(
-        lambda: provider.compile_brain_dump(
-            input_text=request.input_text,
-            context_hints=request.context_hints,
+    with reserve_ai_tokens(
+        token_budget,
+        install_id=claims.install_id,
+        request=http_request,
+        input_chars=input_chars,
+        settings=settings,
+    ) as reservation:
+        result = await call_provider(
+            lambda: provider.compile_brain_dump(
+                input_text=request.input_text,
+                context_hints=request.context_hints,
+            )
         )
-    )
+        reservation.actual_tokens = result.input_tokens + result.output_tokens
 
     latency_ms = max(0, int((datetime.now(UTC) - started_at).total_seconds() * 1000))
-    usage_store.increment(install_id=claims.install_id, feature="braindump")
+    with span("usage_store.increment"):
+        usage_store.increment(
+            install_id=claims.install_id,
+            feature="braindump",
+            tokens=result.input_tokens + result.output_tokens,
+        )
+    record_ai_tokens(
+        feature="braindump", input_tokens=result.input_tokens, output_tokens=result.output_tokens
+    )
+    set_ai_pacing_headers(
+        http_response,
+        feature="braindump",
+        rate_limit_remaining=rate_limit_remaining,
+        quota_remaining=quota_remaining,
+    )
 
     return BrainDumpCompileResponse(
         items=[BrainDumpItem.model_validate(item) for item in result.items],
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Request, Response
+from starlette.datastructures import State
+
+from offload_backend.dependencies import require_metrics_access
+from offload_backend.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, render_samples
+
+router = APIRouter(dependencies=[Depends(require_metrics_access)])
+
+# app.state attribute -> limiter label used by offload_rate_limit_rejections_total.
+_RATE_LIMITERS = {
+    "session_rate_limiter": "session_issuance",
+    "ai_inference_rate_limiter": "ai_inference",
+}
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request) -> Response:
+    """Prometheus text exposition of the process's metrics."""
+    return Response(
+        content=REGISTRY.render(_app_state_samples(request.app.state)),
+        media_type=PROMETHEUS_CONTENT_TYPE,
+    )
+
+
+def _app_state_samples(state: State) -> list[str]:
+    lines: list[str] = []
+    pipeline = getattr(state, "log_pipeline", None)
+    if pipeline is not None:
+        pipeline_metrics = pipeline.metrics()
+        lines += render_samples(
+            "offload_log_pipeline_records_total",
+            "Log records by what the pipeline did with them.",
+            "counter",
+            [
+                ((outcome,), pipeline_metrics[outcome])
+                for outcome in ("enqueued", "dropped", "sampled_out")
+            ],
+            ("outcome",),
+        )
+        lines += render_samples(
+            "offload_log_pipeline_queue_depth",
+            "Log records waiting for the writer thread.",
+            "gauge",
+            [((), pipeline_metrics["queue_depth"])],
+        )
+
+    # Only limiters that have served a request exist, and the Redis limiter
+    # keeps no local state to report.
+    limiters = [
+        (label, limiter)
+        for attr, label in _RATE_LIMITERS.items()
+        if hasattr(limiter := getattr(state, attr, None), "tracked_keys")
+    ]
+    if limiters:
+        lines += render_samples(
+            "offload_rate_limiter_tracked_keys",
+            "Keys a rate limiter currently holds in memory.",
+            "gauge",
+            [((label,), limiter.tracked_keys) for label, limiter in limiters],
+            ("limiter",),
+        )
+        lines += render_samples(
+            "offload_rate_limiter_evictions_total",
+            "Keys dropped early because a rate limiter hit its key cap.",
+            "counter",
+            [((label,), limiter.evictions) for label, limiter in limiters],
+            ("limiter",),
+        )
+
+    stores = getattr(state, "stores", None)
+    maintenance = getattr(stores, "sqlite_maintenance", None)
+    if maintenance is not None:
+        maintenance_metrics = maintenance.metrics()
+        lines += render_samples(
+            "offload_sqlite_wal_size_bytes",
+            "Total size of the -wal files after the last SQLite maintenance run.",
+            "gauge",
+            [((), maintenance_metrics.wal_size_bytes)],
+        )
+        lines += render_samples(
+            "offload_sqlite_checkpoints_total",
+            "WAL checkpoints run by SQLite maintenance, by mode.",
+            "counter",
+            [
+                (("PASSIVE",), maintenance_metrics.passive_checkpoints),
+                (("TRUNCATE",), maintenance_metrics.truncate_checkpoints),
+            ],
+            ("mode",),
+        )
+        lines += render_samples(
+            "offload_sqlite_checkpoints_busy_total",
+            "WAL checkpoints that could not finish because the database was busy.",
+            "counter",
+            [((), maintenance_metrics.busy_checkpoints)],
+        )
+        lines += render_samples(
+            "offload_sqlite_incremental_vacuums_total",
+            "incremental_vacuum and PRAGMA optimize passes run by SQLite maintenance.",
+            "counter",
+            [((), maintenance_metrics.incremental_vacuums)],
+        )
+    return lines
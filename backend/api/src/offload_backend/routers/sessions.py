@@ -6,11 +6,16 @@ from offload_backend.config import Settings
 from offload_backend.dependencies import (
     enforce_session_issuance_rate_limit,
     get_app_settings,
+    get_refreshable_session_claims,
     get_session_rate_limiter,
     get_token_manager,
 )
-from offload_backend.schemas import AnonymousSessionRequest, AnonymousSessionResponse
-from offload_backend.security import TokenManager
+from offload_backend.schemas import (
+    AnonymousSessionRequest,
+    AnonymousSessionResponse,
+    SessionRefreshResponse,
+)
+from offload_backend.security import SessionClaims, TokenManager
 from offload_backend.session_rate_limiter import SessionRateLimiter
 
 router = APIRouter()
@@ -38,3 +43,24 @@ def create_anonymous_session(
         session_token=token_manager.encode(claims),
         expires_at=claims.expires_at,
     )
+
+
+@router.post("/sessions/refresh", response_model=SessionRefreshResponse)
+def refresh_session(
+    claims: SessionClaims = Depends(get_refreshable_session_claims),
+    token_manager: TokenManager = Depends(get_token_manager),
+    settings: Settings = Depends(get_app_settings),
+) -> SessionRefreshResponse:
+    # Refresh skips the issuance limiter; auth_time and session_max_age_seconds
+    # bound how long a leaked token can keep a chain alive.
+    refreshed = token_manager.issue_session(
+        install_id=claims.install_id,
+        ttl_seconds=settings.session_ttl_seconds,
+        user_id=claims.user_id,
+        auth_time=claims.auth_time,
+    )
+    return SessionRefreshResponse(
+        session_token=token_manager.encode(refreshed),
+        expires_at=refreshed.expires_at,
+        user_id=refreshed.user_id,
+    )
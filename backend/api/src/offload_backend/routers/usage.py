@@ -2,18 +2,55 @@ from __future__ import annotations
 
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 
 from offload_backend.config import Settings
-from offload_backend.dependencies import get_app_settings, get_session_claims, get_usage_store
+from offload_backend.dependencies import (
+    AI_FEATURES,
+    get_app_settings,
+    get_session_claims,
+    get_usage_store,
+)
 from offload_backend.errors import APIException
-from offload_backend.schemas import UsageReconcileRequest, UsageReconcileResponse
+from offload_backend.schemas import (
+    UsageBatchReconcileRequest,
+    UsageBatchReconcileResponse,
+    UsageCounterState,
+    UsageFeatureCount,
+    UsageReconcileRequest,
+    UsageReconcileResponse,
+    UsageSummaryResponse,
+)
 from offload_backend.security import SessionClaims
 from offload_backend.usage_store import UsageStore
 
 router = APIRouter()
 
 
+def _ensure_install_matches(claims: SessionClaims, install_id: str) -> None:
+    if claims.install_id != install_id:
+        raise APIException(
+            status_code=403,
+            code="install_id_mismatch",
+            message="Session install_id does not match request install_id",
+        )
+
+
+def _parse_updated_at(value: str | None) -> datetime | None:
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=UTC)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix still matches."""
+    if if_none_match is None:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
 @router.post("/usage/reconcile", response_model=UsageReconcileResponse)
 def reconcile_usage(
     request: UsageReconcileRequest,
@@ -21,12 +58,7 @@ def reconcile_usage(
     usage_store: UsageStore = Depends(get_usage_store),
     settings: Settings = Depends(get_app_settings),
 ) -> UsageReconcileResponse:
-    if claims.install_id != request.install_id:
-        raise APIException(
-            status_code=403,
-            code="install_id_mismatch",
-            message="Session install_id does not match request install_id",
-        )
+    _ensure_install_matches(claims, request.install_id)
 
     server_count = usage_store.reconcile(
         install_id=request.install_id,
@@ -40,3 +72,81 @@ def reconcile_usage(
         effective_remaining=effective_remaining,
         reconciled_at=datetime.now(UTC),
     )
+
+
+@router.post("/usage/reconcile/batch", response_model=UsageBatchReconcileResponse)
+def reconcile_usage_batch(
+    request: UsageBatchReconcileRequest,
+    claims: SessionClaims = Depends(get_session_claims),
+    usage_store: UsageStore = Depends(get_usage_store),
+    settings: Settings = Depends(get_app_settings),
+) -> UsageBatchReconcileResponse:
+    """Reconcile every local counter in one transaction.
+
+    With since, only counters that changed server-side at or after that time
+    are returned (possibly including features the client did not send);
+    counters now equal to the submitted local_count are omitted.
+    """
+    _ensure_install_matches(claims, request.install_id)
+
+    local_counts: dict[str, int] = {}
+    for counter in request.counters:
+        local_counts[counter.feature] = max(
+            local_counts.get(counter.feature, 0), counter.local_count
+        )
+    records = usage_store.reconcile_many(
+        install_id=request.install_id,
+        local_counts=local_counts,
+        since=request.since,
+    )
+
+    return UsageBatchReconcileResponse(
+        counters=[
+            UsageCounterState(
+                feature=record.feature,
+                server_count=record.count,
+                effective_remaining=max(0, settings.default_feature_quota - record.count),
+                updated_at=_parse_updated_at(record.updated_at),
+            )
+            for record in records
+        ],
+        reconciled_at=datetime.now(UTC),
+    )
+
+
+@router.get(
+    "/usage/summary",
+    response_model=UsageSummaryResponse,
+    responses={304: {"description": "Summary unchanged since the supplied ETag"}},
+)
+def get_usage_summary(
+    request: Request,
+    response: Response,
+    claims: SessionClaims = Depends(get_session_claims),
+    usage_store: UsageStore = Depends(get_usage_store),
+    settings: Settings = Depends(get_app_settings),
+) -> UsageSummaryResponse | Response:
+    """Read-only quota state for the session's install, validated with a strong ETag."""
+    summary = usage_store.get_summary(install_id=claims.install_id)
+    # The quota is part of the body, so a quota change must change the ETag too.
+    etag = f'"{summary.etag}-{settings.default_feature_quota}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    used = sum(record.count for record in summary.records if record.feature in AI_FEATURES)
+    return UsageSummaryResponse(
+        features=[
+            UsageFeatureCount(
+                feature=record.feature,
+                count=record.count,
+                updated_at=_parse_updated_at(record.updated_at),
+            )
+            for record in summary.records
+        ],
+        quota=settings.default_feature_quota,
+        used=used,
+        remaining=max(0, settings.default_feature_quota - used),
+        updated_at=_parse_updated_at(summary.updated_at),
+    )
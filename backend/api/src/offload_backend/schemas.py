@@ -24,6 +24,12 @@ class AnonymousSessionResponse(BaseModel):
     expires_at: datetime
 
 
+class SessionRefreshResponse(BaseModel):
+    session_token: str
+    expires_at: datetime
+    user_id: str | None = None
+
+
 class BreakdownGenerateRequest(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
@@ -89,6 +95,77 @@ class UsageReconcileResponse(BaseModel):
     reconciled_at: datetime
 
 
+class UsageCounterReconcile(BaseModel):
+    feature: str = Field(min_length=1, max_length=64)
+    local_count: int = Field(ge=0)
+
+
+class UsageBatchReconcileRequest(BaseModel):
+    install_id: str = Field(min_length=8, max_length=128)
+    counters: list[UsageCounterReconcile] = Field(default_factory=list, max_length=64)
+    since: datetime | None = None
+
+
+class UsageCounterState(BaseModel):
+    feature: str
+    server_count: int = Field(ge=0)
+    effective_remaining: int = Field(ge=0)
+    updated_at: datetime | None = None
+
+
+class UsageBatchReconcileResponse(BaseModel):
+    counters: list[UsageCounterState]
+    reconciled_at: datetime
+
+
+class BackupFileReport(BaseModel):
+    source: str
+    destination: str
+    pages: int = Field(ge=0)
+    size_bytes: int = Field(ge=0)
+    duration_ms: int = Field(ge=0)
+    pages_per_second: float = Field(ge=0)
+
+
+class AdminBackupResponse(BaseModel):
+    backups: list[BackupFileReport]
+
+
+class TraceSpanReport(BaseModel):
+    span_id: int
+    parent_id: int | None = None
+    name: str
+    start_offset_ms: float = Field(ge=0)
+    duration_ms: float = Field(ge=0)
+    status: str
+    attributes: dict[str, str | int | float | bool] = Field(default_factory=dict)
+
+
+class TraceReport(BaseModel):
+    trace_id: str
+    started_at: datetime
+    duration_ms: float = Field(ge=0)
+    spans: list[TraceSpanReport]
+
+
+class AdminTracesResponse(BaseModel):
+    traces: list[TraceReport]
+
+
+class UsageFeatureCount(BaseModel):
+    feature: str
+    count: int = Field(ge=0)
+    updated_at: datetime | None = None
+
+
+class UsageSummaryResponse(BaseModel):
+    features: list[UsageFeatureCount]
+    quota: int = Field(ge=0)
+    used: int = Field(ge=0)
+    remaining: int = Field(ge=0)
+    updated_at: datetime | None = None
+
+
 class AppleAuthRequest(BaseModel):
     apple_identity_token: str = Field(min_length=1)
     install_id: str = Field(min_length=8, max_length=128)
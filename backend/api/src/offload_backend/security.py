@@ -5,11 +5,16 @@ import binascii
 import hashlib
 import hmac
 import json
+import math
+import struct
 from collections.abc import Callable, Mapping
 from datetime import UTC, datetime, timedelta
+from typing import Literal
 
 from pydantic import BaseModel, ConfigDict
 
+from offload_backend.cache import TTLCache
+
 # ---------------------------------------------------------------------------
 # Session secret validation helpers (merged from session_security.py)
 # ---------------------------------------------------------------------------
@@ -54,6 +59,19 @@ def is_strong_session_secret(secret: str) -> bool:
 TOKEN_VERSION = 2
 REQUIRED_V2_CLAIMS = frozenset({"v", "kid", "iat", "nbf", "iss", "aud", "exp", "install_id"})
 
+# v3 ("compact") tokens are one base64url segment of packed binary:
+#   version (u8) | kid id (u16) | iat (u32) | exp (u32)
+#   | install_id length (u8) + UTF-8 | user_id length (u8, 0 = none) + UTF-8
+#   | auth_time (u32, only when it differs from iat)
+#   | HMAC-SHA256 truncated to V3_MAC_BYTES
+# nbf is always iat, and iss/aud are bound into the MAC instead of carried.
+COMPACT_TOKEN_VERSION = 3
+V3_MAC_BYTES = 16
+_V3_HEADER = struct.Struct("<BHII")
+_V3_AUTH_TIME = struct.Struct("<I")
+_V3_MIN_LENGTH = _V3_HEADER.size + 2 + V3_MAC_BYTES
+TokenFormat = Literal["v2", "v3"]
+
 
 class TokenError(Exception):
     pass
@@ -68,14 +86,36 @@ class ExpiredTokenError(TokenError):
 
 
 class SessionClaims(BaseModel):
+    """Verified session claims.
+
+    auth_time is when the install first authenticated; refreshes carry it
+    forward, so it bounds the age of the whole token chain. None means the
+    token being issued starts a new chain. Decoded claims always have it.
+    """
+
     model_config = ConfigDict(frozen=True)
 
     install_id: str
     expires_at: datetime
     user_id: str | None = None
+    auth_time: datetime | None = None
 
 
 class TokenManager:
+    """Issues and verifies HMAC-signed session tokens.
+
+    encode() issues token_format tokens; decode() accepts both v2 and v3, so
+    the format can be switched without logging clients out.
+
+    Verified tokens are kept in a bounded LRU (decode_cache_max_entries; 0
+    disables it) mapping the token string to its claims until the token
+    expires. A cache hit skips parsing and signature verification and only
+    re-checks expiry. Entries are tagged with the signing key set they were
+    verified under; rotate_signing_keys() starts a new key set, and entries
+    from older ones are treated as misses, even if a decode that raced the
+    rotation stores one afterwards.
+    """
+
     def __init__(
         self,
         secret: str,
@@ -85,6 +125,8 @@ class TokenManager:
         active_kid: str = "v2-default",
         signing_keys: Mapping[str, str] | None = None,
         now_provider: Callable[[], datetime] | None = None,
+        decode_cache_max_entries: int = 10000,
+        token_format: TokenFormat = "v2",
     ):
         self._issuer = issuer.strip()
         self._audience = audience.strip()
@@ -93,28 +135,69 @@ class TokenManager:
             raise ValueError("Token issuer, audience, and active_kid must be non-empty")
 
         self._now_provider = now_provider or (lambda: datetime.now(UTC))
-        self._signing_keys = _build_signing_keys(
-            secret=secret,
-            active_kid=self._active_kid,
-            signing_keys=signing_keys,
+        self._token_format = token_format
+        self._key_generation = 0
+        self._set_signing_keys(
+            _build_signing_keys(
+                secret=secret,
+                active_kid=self._active_kid,
+                signing_keys=signing_keys,
+            )
+        )
+        # Entry lifetimes come from each token's exp, so the cache-wide TTL
+        # is only an on/off switch.
+        self._decode_cache: TTLCache[str, tuple[int, SessionClaims]] = TTLCache(
+            max_entries=decode_cache_max_entries,
+            ttl_seconds=math.inf if decode_cache_max_entries > 0 else 0,
         )
 
+    @property
+    def decode_cache(self) -> TTLCache[str, tuple[int, SessionClaims]]:
+        return self._decode_cache
+
+    def rotate_signing_keys(
+        self, *, secret: str, active_kid: str, signing_keys: Mapping[str, str] | None = None
+    ) -> None:
+        """Replace the signing keys and drop every cached verification."""
+        active_kid = active_kid.strip()
+        if not active_kid:
+            raise ValueError("Token active_kid must be non-empty")
+        self._set_signing_keys(
+            _build_signing_keys(
+                secret=secret,
+                active_kid=active_kid,
+                signing_keys=signing_keys,
+            )
+        )
+        self._active_kid = active_kid
+        # Bumped only after the new keys are in place, so a decode tagged
+        # with the new generation was verified with the new keys.
+        self._key_generation += 1
+        self._decode_cache.clear()
+
     def issue_session(
         self,
         install_id: str,
         ttl_seconds: int,
         user_id: str | None = None,
         now: datetime | None = None,
+        auth_time: datetime | None = None,
     ) -> SessionClaims:
+        """Claims for a new token; pass the old token's auth_time when refreshing."""
         now = now or self._now_provider()
         return SessionClaims(
             install_id=install_id,
             expires_at=now + timedelta(seconds=ttl_seconds),
             user_id=user_id,
+            auth_time=auth_time or now,
         )
 
     def encode(self, claims: SessionClaims) -> str:
         issued_at = int(self._now_provider().timestamp())
+        if self._token_format == "v3":
+            token = self._encode_v3(claims, issued_at=issued_at)
+            if token is not None:
+                return token
         payload: dict[str, object] = {
             "v": TOKEN_VERSION,
             "kid": self._active_kid,
@@ -127,6 +210,9 @@ class TokenManager:
         }
         if claims.user_id is not None:
             payload["user_id"] = claims.user_id
+        auth_time = _auth_timestamp(claims, issued_at=issued_at)
+        if auth_time != issued_at:
+            payload["auth_time"] = auth_time
         payload_b64 = _encode_payload(payload)
         signature = hmac.new(
             self._signing_keys[self._active_kid],
@@ -136,7 +222,53 @@ class TokenManager:
         signature_b64 = base64.urlsafe_b64encode(signature).decode("utf-8").rstrip("=")
         return f"{payload_b64}.{signature_b64}"
 
-    def decode(self, token: str) -> SessionClaims:
+    def decode(
+        self,
+        token: str,
+        *,
+        expired_grace_seconds: float = 0,
+        max_session_age_seconds: float | None = None,
+    ) -> SessionClaims:
+        """Verify token and return its claims.
+
+        Tokens that expired less than expired_grace_seconds ago are still
+        accepted (for session refresh); they are never cached. With
+        max_session_age_seconds, a token whose chain started (auth_time)
+        longer ago than that is rejected as expired.
+        """
+        now = self._now_provider()
+        # Read before verifying: if keys rotate mid-decode, the entry is
+        # tagged with the old generation and never served.
+        key_generation = self._key_generation
+        claims = None
+        if self._decode_cache.enabled:
+            cached = self._decode_cache.get(token)
+            if cached is not None and cached[0] == key_generation:
+                claims = cached[1]
+        if claims is None:
+            if "." not in token:
+                claims = self._decode_v3(token, now=now)
+            else:
+                claims = self._decode_v2(token, now=now)
+            if self._decode_cache.enabled:
+                remaining = (claims.expires_at - now).total_seconds()
+                self._decode_cache.set(
+                    token, (key_generation, claims), ttl_seconds=remaining
+                )
+
+        if claims.expires_at <= now:
+            self._decode_cache.invalidate(token)
+            if claims.expires_at <= now - timedelta(seconds=expired_grace_seconds):
+                raise ExpiredTokenError("Token expired")
+        if (
+            max_session_age_seconds is not None
+            and claims.auth_time is not None
+            and claims.auth_time <= now - timedelta(seconds=max_session_age_seconds)
+        ):
+            raise ExpiredTokenError("Session exceeded its maximum age")
+        return claims
+
+    def _decode_v2(self, token: str, *, now: datetime) -> SessionClaims:
         payload_b64, signature_b64 = _split_token(token)
         payload = _decode_payload(payload_b64)
         kid = _parse_key_id(payload)
@@ -154,9 +286,90 @@ class TokenManager:
         if not hmac.compare_digest(expected_signature, provided_signature):
             raise InvalidTokenError("Token signature mismatch")
 
-        return self._parse_v2_claims(payload)
+        return self._parse_v2_claims(payload, now=now)
+
+    def _encode_v3(self, claims: SessionClaims, *, issued_at: int) -> str | None:
+        """Pack claims as a v3 token, or None if they do not fit the layout."""
+        install_id = claims.install_id.encode("utf-8")
+        user_id = (claims.user_id or "").encode("utf-8")
+        expires_at = int(claims.expires_at.timestamp())
+        auth_time = _auth_timestamp(claims, issued_at=issued_at)
+        if len(install_id) > 0xFF or len(user_id) > 0xFF:
+            return None
+        if not all(0 <= value <= 0xFFFFFFFF for value in (issued_at, expires_at, auth_time)):
+            return None
+        compact_kid = _compact_key_id(self._active_kid)
+        body = b"".join(
+            (
+                _V3_HEADER.pack(COMPACT_TOKEN_VERSION, compact_kid, issued_at, expires_at),
+                bytes((len(install_id),)),
+                install_id,
+                bytes((len(user_id),)),
+                user_id,
+                _V3_AUTH_TIME.pack(auth_time) if auth_time != issued_at else b"",
+            )
+        )
+        mac = self._v3_macs[compact_kid][1].copy()
+        mac.update(body)
+        return base64.urlsafe_b64encode(body + mac.digest()[:V3_MAC_BYTES]).decode().rstrip("=")
+
+    def _decode_v3(self, token: str, *, now: datetime) -> SessionClaims:
+        raw = _urlsafe_b64decode(token)
+        if len(raw) < _V3_MIN_LENGTH:
+            raise InvalidTokenError("Malformed session token")
+        body = raw[:-V3_MAC_BYTES]
+        version, compact_kid, issued_at, expires_at = _V3_HEADER.unpack_from(body)
+        if version != COMPACT_TOKEN_VERSION:
+            raise InvalidTokenError("Unsupported token version")
+        entry = self._v3_macs.get(compact_kid)
+        if entry is None:
+            raise InvalidTokenError("Unknown token key id")
+        mac = entry[1].copy()
+        mac.update(body)
+        if not hmac.compare_digest(mac.digest()[:V3_MAC_BYTES], raw[-V3_MAC_BYTES:]):
+            raise InvalidTokenError("Token signature mismatch")
+
+        offset = _V3_HEADER.size
+        install_end = offset + 1 + body[offset]
+        user_end = install_end + 1 + body[install_end] if install_end < len(body) else -1
+        if install_end == offset + 1 or len(body) not in (user_end, user_end + 4):
+            raise InvalidTokenError("Invalid token payload")
+        if len(body) == user_end:
+            auth_time = issued_at
+        else:
+            (auth_time,) = _V3_AUTH_TIME.unpack_from(body, user_end)
+        try:
+            install_id = body[offset + 1 : install_end].decode("utf-8")
+            user_id = body[install_end + 1 : user_end].decode("utf-8") or None
+        except UnicodeDecodeError as exc:
+            raise InvalidTokenError("Invalid token payload") from exc
+
+        if now.timestamp() < issued_at:
+            raise InvalidTokenError("Token not active yet")
+        return SessionClaims(
+            install_id=install_id,
+            expires_at=datetime.fromtimestamp(expires_at, tz=UTC),
+            user_id=user_id,
+            auth_time=datetime.fromtimestamp(auth_time, tz=UTC),
+        )
 
-    def _parse_v2_claims(self, payload: dict[str, object]) -> SessionClaims:
+    def _set_signing_keys(self, signing_keys: dict[str, bytes]) -> None:
+        # Per compact kid id: the kid and an HMAC already keyed and fed the
+        # iss/aud binding, copied for each token.
+        v3_macs: dict[int, tuple[str, hmac.HMAC]] = {}
+        context = f"{self._issuer}\0{self._audience}\0".encode()
+        for kid, key in signing_keys.items():
+            compact_kid = _compact_key_id(kid)
+            if compact_kid in v3_macs:
+                raise ValueError(
+                    f"Token key IDs {v3_macs[compact_kid][0]!r} and {kid!r} collide in the "
+                    "v3 token format; rename one"
+                )
+            v3_macs[compact_kid] = (kid, hmac.new(key, context, hashlib.sha256))
+        self._signing_keys = signing_keys
+        self._v3_macs = v3_macs
+
+    def _parse_v2_claims(self, payload: dict[str, object], *, now: datetime) -> SessionClaims:
         missing_claims = REQUIRED_V2_CLAIMS.difference(payload.keys())
         if missing_claims:
             raise InvalidTokenError("Missing token claims")
@@ -181,16 +394,21 @@ class TokenManager:
         if not_before < issued_at:
             raise InvalidTokenError("Invalid token timing claims")
 
-        now = self._now_provider()
         if now < not_before:
             raise InvalidTokenError("Token not active yet")
-        if expires_at <= now:
-            raise ExpiredTokenError("Token expired")
 
         user_id_raw = payload.get("user_id")
         user_id = str(user_id_raw) if isinstance(user_id_raw, str) and user_id_raw else None
+        # Tokens that start their chain omit auth_time; it is then iat.
+        auth_time = (
+            datetime.fromtimestamp(_require_int(payload, "auth_time"), tz=UTC)
+            if "auth_time" in payload
+            else issued_at
+        )
 
-        return SessionClaims(install_id=install_id, expires_at=expires_at, user_id=user_id)
+        return SessionClaims(
+            install_id=install_id, expires_at=expires_at, user_id=user_id, auth_time=auth_time
+        )
 
 
 def _build_signing_keys(
@@ -217,6 +435,16 @@ def _build_signing_keys(
     return normalized
 
 
+def _auth_timestamp(claims: SessionClaims, *, issued_at: int) -> int:
+    if claims.auth_time is None:
+        return issued_at
+    return int(claims.auth_time.timestamp())
+
+
+def _compact_key_id(kid: str) -> int:
+    return int.from_bytes(hashlib.blake2b(kid.encode("utf-8"), digest_size=2).digest(), "little")
+
+
 def _encode_payload(payload: dict[str, object]) -> str:
     payload_bytes = json.dumps(payload, separators=(",", ":")).encode("utf-8")
     return base64.urlsafe_b64encode(payload_bytes).decode("utf-8").rstrip("=")
@@ -1,10 +1,21 @@
 from __future__ import annotations
 
+import math
+import time
+from collections import OrderedDict
 from collections.abc import Callable
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from threading import Lock
-from typing import Protocol
+from typing import Generic, Protocol, TypeVar
+
+_V = TypeVar("_V")
+
+# GCRA arrival times are floats that accumulate one interval per request, so
+# a burst of exactly `limit` can land a rounding error past the window (more
+# so on the wall clock, where one ulp is ~2e-7 s). Admit requests that miss
+# by less than this.
+GCRA_TOLERANCE_SECONDS = 1e-3
 
 
 @dataclass(frozen=True)
@@ -21,41 +32,142 @@ class SessionRateLimitExceeded(Exception):
 
 
 class SessionRateLimiter(Protocol):
-    def check(self, *, client_ip: str, install_id: str) -> None: ...
+    @property
+    def blocking(self) -> bool:
+        """True if check() waits on network I/O, so async callers must run it off the loop."""
+        ...
+
+    def check(self, *, client_ip: str, install_id: str) -> int:
+        """Count one request, or raise SessionRateLimitExceeded.
+
+        Returns how many more requests are allowed right now in the tighter
+        of the two dimensions.
+        """
+        ...
+
+
+class ExpiringWindows(Generic[_V]):
+    """Rate-limit state keyed by IP or install ID, forgotten once it expires.
+
+    Keys live in two generations, each spanning window_seconds. When the
+    current generation is a full window old it becomes the previous one and
+    the old previous generation is dropped wholesale, so expiry costs
+    amortized O(1) per insert with no per-key timers or scans. State set
+    during a generation must expire within window_seconds of being set, so a
+    dropped generation only ever holds expired state. Touching a key moves it
+    to the current generation. Times are seconds on the caller's clock.
+
+    At most max_keys keys are tracked. Inserting a new key past the cap
+    evicts the oldest-inserted key, from the previous generation first. An
+    evicted key simply starts a fresh window on its next request.
+    """
+
+    def __init__(self, *, window_seconds: float, max_keys: int, started_at: float):
+        self._window = window_seconds
+        self._max_keys = max(1, max_keys)
+        self._generation_started_at = started_at
+        self._current: OrderedDict[str, _V] = OrderedDict()
+        self._previous: OrderedDict[str, _V] = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def get(self, key: str, *, now: float) -> _V | None:
+        self._rotate(now)
+        state = self._current.get(key)
+        if state is None:
+            state = self._previous.get(key)
+        return state
+
+    def set(self, key: str, state: _V) -> None:
+        if key in self._current:
+            self._current[key] = state
+            return
+        if self._previous.pop(key, None) is None and len(self) >= self._max_keys:
+            oldest = self._previous if self._previous else self._current
+            oldest.popitem(last=False)
+            self.evictions += 1
+        self._current[key] = state
+
+    def _rotate(self, now: float) -> None:
+        elapsed = now - self._generation_started_at
+        if elapsed < self._window:
+            return
+        if elapsed < 2 * self._window:
+            self._previous = self._current
+            self._generation_started_at += self._window
+        else:
+            self._previous = OrderedDict()
+            self._generation_started_at = now
+        self._current = OrderedDict()
 
 
 class InMemorySessionRateLimiter:
+    """Fixed-window limits per client IP and per install ID, held in process memory.
+
+    Memory is bounded: windows are dropped once they expire, and each
+    dimension tracks at most max_tracked_keys keys (see ExpiringWindows).
+    """
+
+    blocking = False
+
     def __init__(
         self,
         *,
         limit_per_ip: int,
         limit_per_install: int,
         window_seconds: int,
+        max_tracked_keys: int = 100_000,
         now_provider: Callable[[], datetime] | None = None,
     ):
         self._limit_per_ip = limit_per_ip
         self._limit_per_install = limit_per_install
         self._window_seconds = window_seconds
         self._now_provider = now_provider or (lambda: datetime.now(UTC))
-        self._ip_windows: dict[str, SessionRateLimitState] = {}
-        self._install_windows: dict[str, SessionRateLimitState] = {}
+        started_at = self._now_provider().timestamp()
+        self._ip_windows: ExpiringWindows[SessionRateLimitState] = ExpiringWindows(
+            window_seconds=window_seconds, max_keys=max_tracked_keys, started_at=started_at
+        )
+        self._install_windows: ExpiringWindows[SessionRateLimitState] = ExpiringWindows(
+            window_seconds=window_seconds, max_keys=max_tracked_keys, started_at=started_at
+        )
         self._lock = Lock()
 
-    def check(self, *, client_ip: str, install_id: str) -> None:
+    @property
+    def tracked_keys(self) -> int:
+        """Gauge: IP and install ID windows currently held in memory."""
+        with self._lock:
+            return len(self._ip_windows) + len(self._install_windows)
+
+    @property
+    def evictions(self) -> int:
+        """Keys dropped early because a dimension hit max_tracked_keys."""
+        with self._lock:
+            return self._ip_windows.evictions + self._install_windows.evictions
+
+    def check(self, *, client_ip: str, install_id: str) -> int:
         now = self._now_provider()
+        timestamp = now.timestamp()
         with self._lock:
-            self._ip_windows[client_ip] = self._consume(
-                state=self._ip_windows.get(client_ip),
+            ip_state = self._consume(
+                state=self._ip_windows.get(client_ip, now=timestamp),
                 limit=self._limit_per_ip,
                 now=now,
                 dimension="ip",
             )
-            self._install_windows[install_id] = self._consume(
-                state=self._install_windows.get(install_id),
+            self._ip_windows.set(client_ip, ip_state)
+            install_state = self._consume(
+                state=self._install_windows.get(install_id, now=timestamp),
                 limit=self._limit_per_install,
                 now=now,
                 dimension="install_id",
             )
+            self._install_windows.set(install_id, install_state)
+        return min(
+            self._limit_per_ip - ip_state.count,
+            self._limit_per_install - install_state.count,
+        )
 
     def _consume(
         self,
@@ -83,3 +195,97 @@ class InMemorySessionRateLimiter:
             count=state.count + 1,
             window_started_at=state.window_started_at,
         )
+
+
+class GCRASessionRateLimiter:
+    """Per-IP and per-install limits using the generic cell rate algorithm.
+
+    Each key stores one float, its theoretical arrival time (TAT), on a
+    monotonic clock. Requests are spaced window_seconds / limit apart, with a
+    burst tolerance of a full window. A key can make `limit` requests at once,
+    then one per interval. Unlike fixed windows, a client cannot get 2x the
+    limit by straddling a window boundary. A rejected request consumes
+    nothing in either dimension. retry_after_seconds is the exact wait until
+    the request would conform, rounded up to whole seconds.
+
+    Memory is bounded the same way as InMemorySessionRateLimiter.
+    """
+
+    blocking = False
+
+    def __init__(
+        self,
+        *,
+        limit_per_ip: int,
+        limit_per_install: int,
+        window_seconds: int,
+        max_tracked_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._window_seconds = float(window_seconds)
+        self._ip_interval = window_seconds / limit_per_ip
+        self._install_interval = window_seconds / limit_per_install
+        self._clock = clock
+        started_at = clock()
+        self._ip_tats: ExpiringWindows[float] = ExpiringWindows(
+            window_seconds=window_seconds, max_keys=max_tracked_keys, started_at=started_at
+        )
+        self._install_tats: ExpiringWindows[float] = ExpiringWindows(
+            window_seconds=window_seconds, max_keys=max_tracked_keys, started_at=started_at
+        )
+        self._lock = Lock()
+
+    @property
+    def tracked_keys(self) -> int:
+        """Gauge: IP and install ID arrival times currently held in memory."""
+        with self._lock:
+            return len(self._ip_tats) + len(self._install_tats)
+
+    @property
+    def evictions(self) -> int:
+        """Keys dropped early because a dimension hit max_tracked_keys."""
+        with self._lock:
+            return self._ip_tats.evictions + self._install_tats.evictions
+
+    def check(self, *, client_ip: str, install_id: str) -> int:
+        now = self._clock()
+        window = self._window_seconds
+        with self._lock:
+            ip_tat = self._ip_tats.get(client_ip, now=now)
+            ip_tat = now if ip_tat is None or ip_tat < now else ip_tat
+            ip_next = ip_tat + self._ip_interval
+            if not gcra_conforms(ip_next - now, window=window):
+                raise SessionRateLimitExceeded(
+                    dimension="ip", retry_after_seconds=retry_after(ip_next - window - now)
+                )
+
+            install_tat = self._install_tats.get(install_id, now=now)
+            install_tat = now if install_tat is None or install_tat < now else install_tat
+            install_next = install_tat + self._install_interval
+            if not gcra_conforms(install_next - now, window=window):
+                raise SessionRateLimitExceeded(
+                    dimension="install_id",
+                    retry_after_seconds=retry_after(install_next - window - now),
+                )
+
+            self._ip_tats.set(client_ip, ip_next)
+            self._install_tats.set(install_id, install_next)
+        return min(
+            gcra_remaining(ip_next - now, window=window, interval=self._ip_interval),
+            gcra_remaining(install_next - now, window=window, interval=self._install_interval),
+        )
+
+
+def gcra_conforms(backlog_seconds: float, *, window: float) -> bool:
+    """True if a request whose TAT would end backlog_seconds ahead of now is allowed."""
+    return backlog_seconds <= window + GCRA_TOLERANCE_SECONDS
+
+
+def gcra_remaining(backlog_seconds: float, *, window: float, interval: float) -> int:
+    """Requests a GCRA key can still make now, given how far its TAT is ahead of now."""
+    return max(0, int((window + GCRA_TOLERANCE_SECONDS - backlog_seconds) / interval))
+
+
+def retry_after(seconds: float) -> int:
+    """Whole seconds (at least 1) for a Retry-After covering seconds."""
+    return max(1, math.ceil(seconds))
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+from collections.abc import Callable
+from pathlib import Path
+from threading import Lock
+
+from offload_backend.session_rate_limiter import (
+    GCRASessionRateLimiter,
+    SessionRateLimitExceeded,
+    gcra_conforms,
+    gcra_remaining,
+    retry_after,
+)
+
+logger = logging.getLogger("offload_backend")
+
+_MAGIC = b"OFLRL001"
+_HEADER = struct.Struct("<8sQ")
+_SLOT = struct.Struct("<Qd")
+# Slots examined per lookup. Bounds check() cost; a full probe window
+# evicts the entry with the oldest arrival time.
+PROBE_SLOTS = 8
+# How long to limit locally before retrying a shared table that failed.
+RETRY_SHARED_SECONDS = 30.0
+
+
+class SharedGCRASessionRateLimiter:
+    """GCRA limits shared by every worker process on a host.
+
+    Arrival times live in an mmap'd, fixed-size open-addressing hash table
+    at `path` (8-byte key digest + 8-byte float per slot). Each check takes
+    an exclusive flock on the file, so updates from all workers are atomic
+    and limits no longer multiply by the worker count. Lookups probe at most
+    PROBE_SLOTS slots. Expired slots are reused in place, and a full probe
+    window evicts its oldest entry, so the table never grows.
+
+    Times are wall-clock seconds so the table stays meaningful across
+    processes and restarts. Stored times more than a window ahead (a clock
+    step backwards) are clamped.
+
+    A new, empty file is sized and initialized under the flock. A file of
+    another size or slot count is never resized, since other workers may
+    have it mapped and would fault on the lost pages; it is reported and
+    treated as unavailable.
+
+    If the table cannot be opened or used, checks fall back to a local
+    GCRASessionRateLimiter. The shared table is retried every
+    RETRY_SHARED_SECONDS.
+    """
+
+    blocking = False
+
+    def __init__(
+        self,
+        *,
+        path: str,
+        namespace: str,
+        limit_per_ip: int,
+        limit_per_install: int,
+        window_seconds: int,
+        slots: int = 65536,
+        max_tracked_keys: int = 100_000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._path = path
+        self._namespace = namespace
+        self._window_seconds = float(window_seconds)
+        self._ip_interval = window_seconds / limit_per_ip
+        self._install_interval = window_seconds / limit_per_install
+        self._slots = max(PROBE_SLOTS, slots)
+        self._clock = clock
+        self._local = GCRASessionRateLimiter(
+            limit_per_ip=limit_per_ip,
+            limit_per_install=limit_per_install,
+            window_seconds=window_seconds,
+            max_tracked_keys=max_tracked_keys,
+        )
+        self._lock = Lock()
+        self._fd: int | None = None
+        self._table: mmap.mmap | None = None
+        self._retry_shared_at = 0.0
+        self.evictions = 0
+        self._open()
+
+    @property
+    def fallback_active(self) -> bool:
+        return self._table is None
+
+    @property
+    def tracked_keys(self) -> int:
+        """Gauge: live entries in the shared table (a full scan; for metrics only)."""
+        with self._lock:
+            table = self._table
+            if table is None:
+                return self._local.tracked_keys
+            now = self._clock()
+            return sum(
+                1
+                for key, tat in _SLOT.iter_unpack(table[_HEADER.size :])
+                if key and tat > now
+            )
+
+    def check(self, *, client_ip: str, install_id: str) -> int:
+        with self._lock:
+            if self._table is None and time.monotonic() >= self._retry_shared_at:
+                self._open()
+            table = self._table
+            if table is not None:
+                try:
+                    return self._check_shared(
+                        table, client_ip=client_ip, install_id=install_id
+                    )
+                except (OSError, ValueError, struct.error):
+                    logger.warning(
+                        "shared_rate_limiter_unavailable",
+                        extra={"path": self._path},
+                        exc_info=True,
+                    )
+                    self._close_table()
+        return self._local.check(client_ip=client_ip, install_id=install_id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_table()
+
+    def _check_shared(self, table: mmap.mmap, *, client_ip: str, install_id: str) -> int:
+        assert self._fd is not None
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            now = self._clock()
+            window = self._window_seconds
+            ip_key = self._digest("ip", client_ip)
+            ip_offset, ip_tat = self._find(table, ip_key, now)
+            ip_next = min(max(ip_tat, now), now + window) + self._ip_interval
+            if not gcra_conforms(ip_next - now, window=window):
+                raise SessionRateLimitExceeded(
+                    dimension="ip",
+                    retry_after_seconds=retry_after(ip_next - window - now),
+                )
+
+            install_key = self._digest("install_id", install_id)
+            install_offset, install_tat = self._find(
+                table, install_key, now, reserved=ip_offset
+            )
+            install_next = (
+                min(max(install_tat, now), now + window) + self._install_interval
+            )
+            if not gcra_conforms(install_next - now, window=window):
+                raise SessionRateLimitExceeded(
+                    dimension="install_id",
+                    retry_after_seconds=retry_after(install_next - window - now),
+                )
+
+            _SLOT.pack_into(table, ip_offset, ip_key, ip_next)
+            _SLOT.pack_into(table, install_offset, install_key, install_next)
+            return min(
+                gcra_remaining(ip_next - now, window=window, interval=self._ip_interval),
+                gcra_remaining(
+                    install_next - now, window=window, interval=self._install_interval
+                ),
+            )
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _find(
+        self, table: mmap.mmap, key: int, now: float, *, reserved: int = -1
+    ) -> tuple[int, float]:
+        """Return (slot offset, stored arrival time) for key, claiming a slot if absent.
+
+        A claimed slot is never `reserved`, the slot already claimed for the
+        other dimension of the same check.
+        """
+        start = key % self._slots
+        free_offset = -1
+        oldest_offset = -1
+        oldest_tat = float("inf")
+        for probe in range(PROBE_SLOTS):
+            offset = _HEADER.size + ((start + probe) % self._slots) * _SLOT.size
+            slot_key, tat = _SLOT.unpack_from(table, offset)
+            if slot_key == key:
+                return offset, tat
+            if offset == reserved:
+                continue
+            if free_offset < 0 and (slot_key == 0 or tat <= now):
+                free_offset = offset
+            if tat < oldest_tat:
+                oldest_offset, oldest_tat = offset, tat
+        if free_offset >= 0:
+            return free_offset, 0.0
+        self.evictions += 1
+        return oldest_offset, 0.0
+
+    def _digest(self, dimension: str, value: str) -> int:
+        # hash() is salted per process; workers need the same slot for a key.
+        digest = hashlib.blake2b(
+            f"{self._namespace}\0{dimension}\0{value}".encode(), digest_size=8
+        ).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def _open(self) -> None:
+        size = _HEADER.size + self._slots * _SLOT.size
+        fd = None
+        try:
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                file_size = os.fstat(fd).st_size
+                if file_size == 0:
+                    # Nobody can map an empty file, so growing it is safe.
+                    os.ftruncate(fd, size)
+                elif file_size != size:
+                    raise ValueError(f"rate limit table is {file_size} bytes, expected {size}")
+                header = os.pread(fd, _HEADER.size, 0)
+                if header == bytes(_HEADER.size):
+                    # Sized but never initialized (a worker died in between).
+                    os.pwrite(fd, _HEADER.pack(_MAGIC, self._slots), 0)
+                elif _HEADER.unpack(header) != (_MAGIC, self._slots):
+                    raise ValueError("rate limit table has a different format or slot count")
+                table = mmap.mmap(fd, size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        except (OSError, ValueError):
+            if fd is not None:
+                os.close(fd)
+            logger.warning(
+                "shared_rate_limiter_unavailable",
+                extra={"path": self._path},
+                exc_info=True,
+            )
+            self._retry_shared_at = time.monotonic() + RETRY_SHARED_SECONDS
+            return
+        self._fd = fd
+        self._table = table
+
+    def _close_table(self) -> None:
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._retry_shared_at = time.monotonic() + RETRY_SHARED_SECONDS
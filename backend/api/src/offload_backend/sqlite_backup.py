@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from threading import Lock
+
+from offload_backend.sqlite_connections import SQLiteConnectionManager
+
+logger = logging.getLogger("offload_backend")
+
+_PROGRESS_LOG_INTERVAL_SECONDS = 1.0
+
+
+class BackupInProgressError(RuntimeError):
+    """Raised when a backup is requested while another one is still running."""
+
+
+@dataclass(frozen=True)
+class BackupReport:
+    source: str
+    destination: str
+    pages: int
+    size_bytes: int
+    seconds: float
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds > 0 else float(self.pages)
+
+
+def backup_database(
+    manager: SQLiteConnectionManager,
+    destination: str,
+    *,
+    pages_per_step: int = 256,
+    pause_seconds: float = 0.0,
+) -> BackupReport:
+    """Online-copy one database to destination and report throughput.
+
+    The copy is written to a .partial file and renamed into place when
+    complete, so destination is always either absent or a consistent snapshot.
+    """
+    partial = f"{destination}.partial"
+    Path(partial).unlink(missing_ok=True)
+    started = time.perf_counter()
+    last_logged = started
+    pages = 0
+
+    def _progress(copied: int, total: int) -> None:
+        nonlocal last_logged, pages
+        pages = total
+        now = time.perf_counter()
+        if now - last_logged >= _PROGRESS_LOG_INTERVAL_SECONDS:
+            last_logged = now
+            logger.info(
+                "sqlite_backup_progress",
+                extra={
+                    "db_path": manager.db_path,
+                    "copied_pages": copied,
+                    "total_pages": total,
+                    "pages_per_second": round(copied / (now - started), 1),
+                },
+            )
+
+    target = sqlite3.connect(partial)
+    try:
+        manager.backup(
+            target,
+            pages_per_step=pages_per_step,
+            pause_seconds=pause_seconds,
+            progress=_progress,
+        )
+    finally:
+        target.close()
+    os.replace(partial, destination)
+
+    report = BackupReport(
+        source=manager.db_path,
+        destination=destination,
+        pages=pages,
+        size_bytes=os.path.getsize(destination),
+        seconds=time.perf_counter() - started,
+    )
+    logger.info(
+        "sqlite_backup_completed",
+        extra={
+            "db_path": report.source,
+            "destination": report.destination,
+            "pages": report.pages,
+            "size_bytes": report.size_bytes,
+            "duration_ms": round(report.seconds * 1000, 3),
+            "pages_per_second": round(report.pages_per_second, 1),
+        },
+    )
+    return report
+
+
+class SQLiteBackupRunner:
+    """Backs up a set of SQLite databases into a directory with simple retention.
+
+    Each run writes <stem>.<UTC timestamp>.sqlite3 per database and keeps the
+    newest `retain` snapshots per database. Timestamps have microsecond
+    resolution, so back-to-back runs never overwrite each other. Only one run executes at a time;
+    a concurrent request raises BackupInProgressError instead of queueing.
+    """
+
+    def __init__(
+        self,
+        managers: Sequence[SQLiteConnectionManager],
+        *,
+        directory: str,
+        retain: int = 3,
+        pages_per_step: int = 256,
+        pause_seconds: float = 0.001,
+    ):
+        self._managers = [m for m in managers if m.db_path != ":memory:"]
+        self._directory = Path(directory).expanduser()
+        self._retain = max(1, retain)
+        self._pages_per_step = pages_per_step
+        self._pause_seconds = pause_seconds
+        self._running = Lock()
+        self.last_reports: list[BackupReport] = []
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def run(self) -> list[BackupReport]:
+        if not self._running.acquire(blocking=False):
+            raise BackupInProgressError("a backup is already running")
+        try:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%fZ")
+            reports = []
+            for manager in self._managers:
+                stem = Path(manager.db_path).stem
+                destination = self._directory / f"{stem}.{stamp}.sqlite3"
+                reports.append(
+                    backup_database(
+                        manager,
+                        str(destination),
+                        pages_per_step=self._pages_per_step,
+                        pause_seconds=self._pause_seconds,
+                    )
+                )
+                self._prune(stem)
+            self.last_reports = reports
+            return reports
+        finally:
+            self._running.release()
+
+    def _prune(self, stem: str) -> None:
+        # Also matches the second-resolution names of earlier versions.
+        pattern = re.compile(rf"^{re.escape(stem)}\.\d{{8}}T\d{{6}}(\d{{6}})?Z\.sqlite3$")
+        snapshots = sorted(p for p in self._directory.iterdir() if pattern.match(p.name))
+        for stale in snapshots[: -self._retain]:
+            stale.unlink(missing_ok=True)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from threading import BoundedSemaphore, Lock
+from typing import Literal
+
+from offload_backend.metrics import SQLITE_LOCK_WAIT, SQLITE_QUERY
+
+SynchronousMode = Literal["OFF", "NORMAL", "FULL"]
+
+
+@dataclass(frozen=True)
+class SQLitePragmas:
+    """Per-connection tuning applied to every writer and reader connection."""
+
+    cache_size_kib: int = 8192
+    mmap_size_bytes: int = 0
+    synchronous: SynchronousMode = "NORMAL"
+
+
+@dataclass(frozen=True)
+class SQLiteConnectionMetrics:
+    """Point-in-time snapshot of connection manager lock-wait and query timings."""
+
+    writer_acquisitions: int = 0
+    writer_lock_wait_seconds: float = 0.0
+    writer_query_seconds: float = 0.0
+    reader_acquisitions: int = 0
+    reader_lock_wait_seconds: float = 0.0
+    reader_query_seconds: float = 0.0
+
+
+def _open_sqlite_connection(
+    db_path: str,
+    *,
+    pragmas: SQLitePragmas | None = None,
+) -> sqlite3.Connection:
+    """Open a SQLite connection with WAL mode and a busy timeout.
+
+    Creates the parent directory for file-based databases if it does not exist.
+    Passing ':memory:' opens an in-process, in-memory database.
+    """
+    if db_path != ":memory:":
+        Path(db_path).expanduser().resolve().parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path, check_same_thread=False)
+    # Only takes effect on a new (empty) database; lets maintenance reclaim
+    # free pages with incremental_vacuum instead of a full VACUUM.
+    connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA busy_timeout=5000")
+    if pragmas is not None:
+        _apply_pragmas(connection, pragmas)
+    return connection
+
+
+def _open_sqlite_reader_connection(db_path: str, *, pragmas: SQLitePragmas) -> sqlite3.Connection:
+    uri = f"{Path(db_path).expanduser().resolve().as_uri()}?mode=ro"
+    connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    connection.execute("PRAGMA busy_timeout=5000")
+    _apply_pragmas(connection, pragmas)
+    return connection
+
+
+def _apply_pragmas(connection: sqlite3.Connection, pragmas: SQLitePragmas) -> None:
+    # Negative cache_size is interpreted by SQLite as KiB rather than pages.
+    connection.execute(f"PRAGMA cache_size=-{int(pragmas.cache_size_kib)}")
+    connection.execute(f"PRAGMA mmap_size={int(pragmas.mmap_size_bytes)}")
+    connection.execute(f"PRAGMA synchronous={pragmas.synchronous}")
+
+
+class SQLiteConnectionManager:
+    """Owns one writer connection and a bounded pool of read-only reader connections.
+
+    WAL mode lets readers proceed while the writer holds its transaction, so
+    reads no longer queue behind writes on a single shared lock. Stores that
+    point at the same db_path should share one manager so their writes are
+    serialized in-process instead of contending on SQLite's busy handler.
+
+    In-memory databases cannot be opened by a second connection, so ':memory:'
+    (or reader_pool_size=0) routes reads through the writer connection.
+    """
+
+    def __init__(
+        self,
+        *,
+        db_path: str,
+        reader_pool_size: int = 4,
+        pragmas: SQLitePragmas | None = None,
+    ):
+        self._db_path = db_path
+        self._metrics_label = Path(db_path).name
+        self._pragmas = pragmas or SQLitePragmas()
+        self._writer_lock = Lock()
+        self._writer = _open_sqlite_connection(db_path, pragmas=self._pragmas)
+        self._reader_pool_size = 0 if db_path == ":memory:" else max(0, reader_pool_size)
+        self._reader_slots = BoundedSemaphore(max(1, self._reader_pool_size))
+        self._idle_readers: list[sqlite3.Connection] = []
+        self._all_readers: list[sqlite3.Connection] = []
+        self._pool_lock = Lock()
+        self._metrics_lock = Lock()
+        # [acquisitions, lock_wait_seconds, query_seconds] per role.
+        self._writer_counters: list[float] = [0, 0.0, 0.0]
+        self._reader_counters: list[float] = [0, 0.0, 0.0]
+        self._closed = False
+
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
+    @contextmanager
+    def writer(self) -> Generator[sqlite3.Connection]:
+        """Hold the writer connection exclusively for the duration of the block."""
+        wait_started = time.perf_counter()
+        with self._writer_lock:
+            acquired_at = time.perf_counter()
+            try:
+                yield self._writer
+            finally:
+                self._record(
+                    role="writer",
+                    wait_seconds=acquired_at - wait_started,
+                    query_seconds=time.perf_counter() - acquired_at,
+                )
+
+    @contextmanager
+    def reader(self) -> Generator[sqlite3.Connection]:
+        """Check out a read-only connection, falling back to the writer when pooling is off."""
+        if self._reader_pool_size == 0:
+            with self.writer() as connection:
+                yield connection
+            return
+
+        wait_started = time.perf_counter()
+        with self._reader_slots:
+            connection = self._checkout_reader()
+            acquired_at = time.perf_counter()
+            try:
+                yield connection
+            finally:
+                self._checkin_reader(connection)
+                self._record(
+                    role="reader",
+                    wait_seconds=acquired_at - wait_started,
+                    query_seconds=time.perf_counter() - acquired_at,
+                )
+
+    def backup(
+        self,
+        destination: sqlite3.Connection,
+        *,
+        pages_per_step: int = 256,
+        pause_seconds: float = 0.0,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None:
+        """Copy the database online into destination, pages_per_step pages at a time.
+
+        The writer connection is the backup source, so writes made through this
+        manager while the copy runs are applied to it rather than restarting
+        it. The writer lock is released between steps (for pause_seconds, or
+        just long enough to switch threads), so requests keep writing while a
+        large database is copied. progress receives (copied_pages, total_pages)
+        after every step.
+        """
+
+        def _between_steps(_status: int, remaining: int, total: int) -> None:
+            self._writer_lock.release()
+            try:
+                if progress is not None:
+                    progress(total - remaining, total)
+                time.sleep(pause_seconds)
+            finally:
+                self._writer_lock.acquire()
+
+        with self._writer_lock:
+            self._writer.backup(destination, pages=max(1, pages_per_step), progress=_between_steps)
+
+    def metrics(self) -> SQLiteConnectionMetrics:
+        with self._metrics_lock:
+            return SQLiteConnectionMetrics(
+                writer_acquisitions=int(self._writer_counters[0]),
+                writer_lock_wait_seconds=self._writer_counters[1],
+                writer_query_seconds=self._writer_counters[2],
+                reader_acquisitions=int(self._reader_counters[0]),
+                reader_lock_wait_seconds=self._reader_counters[1],
+                reader_query_seconds=self._reader_counters[2],
+            )
+
+    def close(self) -> None:
+        with self._writer_lock, self._pool_lock:
+            if self._closed:
+                return
+            self._closed = True
+            for connection in self._all_readers:
+                connection.close()
+            self._all_readers.clear()
+            self._idle_readers.clear()
+            self._writer.close()
+
+    def _checkout_reader(self) -> sqlite3.Connection:
+        with self._pool_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed connection manager")
+            if self._idle_readers:
+                return self._idle_readers.pop()
+        connection = _open_sqlite_reader_connection(self._db_path, pragmas=self._pragmas)
+        with self._pool_lock:
+            self._all_readers.append(connection)
+        return connection
+
+    def _checkin_reader(self, connection: sqlite3.Connection) -> None:
+        with self._pool_lock:
+            if not self._closed:
+                self._idle_readers.append(connection)
+
+    def _record(self, *, role: str, wait_seconds: float, query_seconds: float) -> None:
+        with self._metrics_lock:
+            counters = self._writer_counters if role == "writer" else self._reader_counters
+            counters[0] += 1
+            counters[1] += wait_seconds
+            counters[2] += query_seconds
+        SQLITE_LOCK_WAIT.observe(wait_seconds, (self._metrics_label, role))
+        SQLITE_QUERY.observe(query_seconds, (self._metrics_label, role))
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, replace
+from pathlib import Path
+from threading import Lock
+from typing import Literal
+
+from offload_backend.metrics import SQLITE_CHECKPOINT
+from offload_backend.sqlite_connections import SQLiteConnectionManager
+
+logger = logging.getLogger("offload_backend")
+
+CheckpointMode = Literal["PASSIVE", "TRUNCATE"]
+
+# Pages released per incremental_vacuum pass; bounds how long one pass holds
+# the writer connection.
+INCREMENTAL_VACUUM_PAGES = 1000
+
+
+@dataclass(frozen=True)
+class SQLiteMaintenanceMetrics:
+    """Point-in-time snapshot of WAL size and maintenance work performed."""
+
+    wal_size_bytes: int = 0
+    passive_checkpoints: int = 0
+    truncate_checkpoints: int = 0
+    # Checkpoints that could not finish because readers or a writer were active.
+    busy_checkpoints: int = 0
+    checkpoint_seconds: float = 0.0
+    last_checkpoint_seconds: float = 0.0
+    incremental_vacuums: int = 0
+    optimizes: int = 0
+
+
+class SQLiteMaintenance:
+    """Keeps WAL files short and database files compact for a set of SQLite databases.
+
+    run_once() is meant to be called on a short fixed interval (see
+    PeriodicTask). On each call, per database:
+
+    - a TRUNCATE checkpoint runs when the -wal file is at least
+      wal_truncate_bytes, resetting it to zero length;
+    - otherwise a PASSIVE checkpoint runs every checkpoint_interval_seconds;
+    - when no more than idle_max_operations reads and writes happened since
+      the previous call and optimize_interval_seconds have elapsed,
+      incremental_vacuum and PRAGMA optimize run as well.
+
+    All work goes through the manager's writer connection, so it is
+    serialized with application writes rather than contending on SQLite's
+    busy handler. A TRUNCATE checkpoint waits for open readers to finish,
+    through the busy handler, before it resets the WAL. The writer is held
+    all that time, so application writes can stall for up to the
+    connection's busy_timeout. PASSIVE checkpoints never wait. Raise
+    wal_truncate_bytes if those stalls matter more than WAL size.
+    """
+
+    def __init__(
+        self,
+        managers: Sequence[SQLiteConnectionManager],
+        *,
+        checkpoint_interval_seconds: float = 60.0,
+        wal_truncate_bytes: int = 64 * 1024 * 1024,
+        optimize_interval_seconds: float = 3600.0,
+        idle_max_operations: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._managers = [m for m in managers if m.db_path != ":memory:"]
+        self._checkpoint_interval_seconds = checkpoint_interval_seconds
+        self._wal_truncate_bytes = wal_truncate_bytes
+        self._optimize_interval_seconds = optimize_interval_seconds
+        self._idle_max_operations = idle_max_operations
+        self._clock = clock
+        started = clock()
+        self._last_checkpoint = [started] * len(self._managers)
+        self._last_optimize = [started] * len(self._managers)
+        self._last_operations = [_operation_count(m) for m in self._managers]
+        self._metrics = SQLiteMaintenanceMetrics()
+        self._metrics_lock = Lock()
+
+    def run_once(self) -> SQLiteMaintenanceMetrics:
+        wal_size_bytes = 0
+        for index, manager in enumerate(self._managers):
+            now = self._clock()
+            operations = _operation_count(manager)
+            idle = operations - self._last_operations[index] <= self._idle_max_operations
+
+            wal_size = wal_size_bytes_for(manager.db_path)
+            if wal_size >= self._wal_truncate_bytes:
+                self._checkpoint(manager, "TRUNCATE")
+                self._last_checkpoint[index] = now
+            elif now - self._last_checkpoint[index] >= self._checkpoint_interval_seconds:
+                self._checkpoint(manager, "PASSIVE")
+                self._last_checkpoint[index] = now
+
+            if idle and now - self._last_optimize[index] >= self._optimize_interval_seconds:
+                self._vacuum_and_optimize(manager)
+                self._last_optimize[index] = now
+
+            wal_size_bytes += wal_size_bytes_for(manager.db_path)
+            # Snapshot after our own work so it is not counted as traffic next time.
+            self._last_operations[index] = _operation_count(manager)
+
+        with self._metrics_lock:
+            self._metrics = replace(self._metrics, wal_size_bytes=wal_size_bytes)
+            return self._metrics
+
+    def metrics(self) -> SQLiteMaintenanceMetrics:
+        with self._metrics_lock:
+            return self._metrics
+
+    def _checkpoint(self, manager: SQLiteConnectionManager, mode: CheckpointMode) -> None:
+        started = time.perf_counter()
+        with manager.writer() as connection:
+            busy, log_frames, checkpointed = connection.execute(
+                f"PRAGMA wal_checkpoint({mode})"
+            ).fetchone()
+        elapsed = time.perf_counter() - started
+        SQLITE_CHECKPOINT.observe(elapsed, (Path(manager.db_path).name, mode))
+        with self._metrics_lock:
+            metrics = self._metrics
+            self._metrics = replace(
+                metrics,
+                passive_checkpoints=metrics.passive_checkpoints + int(mode == "PASSIVE"),
+                truncate_checkpoints=metrics.truncate_checkpoints + int(mode == "TRUNCATE"),
+                busy_checkpoints=metrics.busy_checkpoints + int(bool(busy)),
+                checkpoint_seconds=metrics.checkpoint_seconds + elapsed,
+                last_checkpoint_seconds=elapsed,
+            )
+        logger.info(
+            "sqlite_wal_checkpoint",
+            extra={
+                "db_path": manager.db_path,
+                "mode": mode,
+                "busy": bool(busy),
+                "log_frames": log_frames,
+                "checkpointed_frames": checkpointed,
+                "duration_ms": round(elapsed * 1000, 3),
+            },
+        )
+
+    def _vacuum_and_optimize(self, manager: SQLiteConnectionManager) -> None:
+        with manager.writer() as connection:
+            # incremental_vacuum only frees pages when auto_vacuum=INCREMENTAL,
+            # which new databases get from _open_sqlite_connection. It frees one
+            # page per step, and execute() steps only once for statements that
+            # return no rows, so run it through executescript to completion.
+            connection.commit()
+            connection.executescript(
+                f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES}); PRAGMA optimize;"
+            )
+        with self._metrics_lock:
+            self._metrics = replace(
+                self._metrics,
+                incremental_vacuums=self._metrics.incremental_vacuums + 1,
+                optimizes=self._metrics.optimizes + 1,
+            )
+
+
+def wal_size_bytes_for(db_path: str) -> int:
+    try:
+        return os.path.getsize(f"{db_path}-wal")
+    except OSError:
+        return 0
+
+
+def _operation_count(manager: SQLiteConnectionManager) -> int:
+    metrics = manager.metrics()
+    return metrics.writer_acquisitions + metrics.reader_acquisitions
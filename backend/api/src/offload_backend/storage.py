@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from offload_backend.config import Settings
+from offload_backend.postgres_store import (
+    PostgresStorage,
+    PostgresUsageStore,
+    PostgresUserStore,
+    asyncpg_pool_factory,
+)
+from offload_backend.sqlite_backup import SQLiteBackupRunner
+from offload_backend.sqlite_connections import SQLiteConnectionManager, SQLitePragmas
+from offload_backend.sqlite_maintenance import SQLiteMaintenance
+from offload_backend.usage_store import ShardedSQLiteUsageStore, SQLiteUsageStore, UsageStore
+from offload_backend.user_store import SQLiteUserStore, UserStore
+
+
+@dataclass
+class Stores:
+    """The usage and user stores for the configured backend, plus what they share."""
+
+    usage_store: UsageStore
+    user_store: UserStore
+    sqlite_connections: SQLiteConnectionManager | None = None
+    postgres_storage: PostgresStorage | None = None
+    compact_usage: Callable[[], int] | None = None
+    drain_usage: Callable[[], int] | None = None
+    sqlite_managers: list[SQLiteConnectionManager] = field(default_factory=list)
+    sqlite_maintenance: SQLiteMaintenance | None = None
+    sqlite_backup: SQLiteBackupRunner | None = None
+
+    def close(self) -> None:
+        self.usage_store.close()
+        self.user_store.close()
+        if self.sqlite_connections is not None:
+            self.sqlite_connections.close()
+        if self.postgres_storage is not None:
+            self.postgres_storage.close()
+
+
+def sqlite_pragmas(settings: Settings) -> SQLitePragmas:
+    return SQLitePragmas(
+        cache_size_kib=settings.sqlite_cache_size_kib,
+        mmap_size_bytes=settings.sqlite_mmap_size_bytes,
+        synchronous=settings.sqlite_synchronous,
+    )
+
+
+def sqlite_backup_runner(
+    settings: Settings,
+    managers: list[SQLiteConnectionManager],
+    *,
+    directory: str,
+) -> SQLiteBackupRunner:
+    return SQLiteBackupRunner(
+        managers,
+        directory=directory,
+        retain=settings.sqlite_backup_retain,
+        pages_per_step=settings.sqlite_backup_pages_per_step,
+        pause_seconds=settings.sqlite_backup_step_pause_seconds,
+    )
+
+
+def build_stores(settings: Settings) -> Stores:
+    """Build the usage and user stores selected by settings.storage_backend."""
+    if settings.storage_backend == "postgres":
+        storage = PostgresStorage(
+            asyncpg_pool_factory(
+                dsn=settings.postgres_dsn or "",
+                min_size=settings.postgres_pool_min_size,
+                max_size=settings.postgres_pool_max_size,
+            )
+        )
+        return Stores(
+            usage_store=PostgresUsageStore(
+                storage=storage,
+                write_batch_size=settings.postgres_write_batch_size,
+                flush_interval_seconds=settings.postgres_write_flush_interval_seconds,
+            ),
+            user_store=PostgresUserStore(storage=storage),
+            postgres_storage=storage,
+        )
+
+    pragmas = sqlite_pragmas(settings)
+    connections = SQLiteConnectionManager(
+        db_path=settings.usage_db_path,
+        reader_pool_size=settings.sqlite_reader_pool_size,
+        pragmas=pragmas,
+    )
+    usage_store: SQLiteUsageStore | ShardedSQLiteUsageStore
+    if settings.usage_shard_count > 1:
+        usage_store = ShardedSQLiteUsageStore(
+            db_path=settings.usage_db_path,
+            shard_count=settings.usage_shard_count,
+            reader_pool_size=settings.sqlite_reader_pool_size,
+            pragmas=pragmas,
+            event_log=settings.usage_event_log_enabled,
+            summary_cache_ttl_seconds=settings.usage_summary_cache_ttl_seconds,
+            summary_cache_max_entries=settings.usage_summary_cache_max_entries,
+        )
+    else:
+        usage_store = SQLiteUsageStore(
+            db_path=settings.usage_db_path,
+            connection_manager=connections,
+            event_log=settings.usage_event_log_enabled,
+            summary_cache_ttl_seconds=settings.usage_summary_cache_ttl_seconds,
+            summary_cache_max_entries=settings.usage_summary_cache_max_entries,
+        )
+
+    managers = [connections]
+    if isinstance(usage_store, ShardedSQLiteUsageStore):
+        managers.extend(shard.connection_manager for shard in usage_store.shards)
+
+    maintenance = None
+    if settings.sqlite_maintenance_enabled:
+        maintenance = SQLiteMaintenance(
+            managers,
+            checkpoint_interval_seconds=settings.sqlite_checkpoint_interval_seconds,
+            wal_truncate_bytes=settings.sqlite_wal_truncate_bytes,
+            optimize_interval_seconds=settings.sqlite_optimize_interval_seconds,
+            idle_max_operations=settings.sqlite_maintenance_idle_max_operations,
+        )
+
+    backup = None
+    if settings.sqlite_backup_dir:
+        backup = sqlite_backup_runner(settings, managers, directory=settings.sqlite_backup_dir)
+
+    compact_usage = drain_usage = None
+    if settings.usage_event_log_enabled:
+        batch_size = settings.usage_compaction_batch_size
+
+        def compact_usage() -> int:
+            return usage_store.compact(batch_size=batch_size)
+
+        def drain_usage() -> int:
+            # Fold every remaining event, still one batch per transaction.
+            total = 0
+            while folded := usage_store.compact(batch_size=batch_size):
+                total += folded
+            return total
+
+    return Stores(
+        usage_store=usage_store,
+        user_store=SQLiteUserStore(
+            db_path=settings.usage_db_path,
+            connection_manager=connections,
+        ),
+        sqlite_connections=connections,
+        compact_usage=compact_usage,
+        drain_usage=drain_usage,
+        sqlite_managers=managers,
+        sqlite_maintenance=maintenance,
+        sqlite_backup=backup,
+    )
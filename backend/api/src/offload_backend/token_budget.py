@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from threading import Lock
+
+from offload_backend.session_rate_limiter import ExpiringWindows, retry_after
+
+# Rough characters per token for English prompts; only used for the up-front
+# estimate, which is corrected to the provider's reported usage afterwards.
+CHARS_PER_TOKEN = 4
+
+
+class TokenBudgetExceeded(Exception):
+    def __init__(self, *, scope: str, retry_after_seconds: int):
+        self.scope = scope
+        self.retry_after_seconds = retry_after_seconds
+        super().__init__(f"Token budget exceeded for {scope}")
+
+
+@dataclass
+class TokenReservation:
+    install_id: str
+    reserved_tokens: int
+    actual_tokens: int | None = None
+
+
+def estimate_tokens(*, input_chars: int, output_tokens: int) -> int:
+    return math.ceil(input_chars / CHARS_PER_TOKEN) + output_tokens
+
+
+class TokenBudgetLimiter:
+    """Tokens-per-window limits per install and across all installs.
+
+    Callers reserve an estimate before an AI call and reconcile it with the
+    provider's reported usage afterwards (or release it if the call failed).
+    Budgets refill continuously, like GCRA over tokens: each key stores the
+    time at which its spent tokens will have fully drained. A reservation is
+    admitted if it fits in the remaining budget. One reservation is capped at
+    a full window's budget, so an oversized request waits for an empty bucket
+    instead of being rejected forever. Reconciling can push a key past its
+    budget by at most one window, which then delays its next reservation.
+
+    A limit of 0 disables that scope.
+    """
+
+    def __init__(
+        self,
+        *,
+        limit_per_install: int,
+        global_limit: int,
+        window_seconds: int,
+        max_tracked_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._window_seconds = float(window_seconds)
+        self._limit_per_install = limit_per_install
+        self._global_limit = global_limit
+        self._install_interval = window_seconds / limit_per_install if limit_per_install else 0.0
+        self._global_interval = window_seconds / global_limit if global_limit else 0.0
+        self._clock = clock
+        self._install_tats: ExpiringWindows[float] = ExpiringWindows(
+            window_seconds=window_seconds, max_keys=max_tracked_keys, started_at=clock()
+        )
+        self._global_tat = 0.0
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._limit_per_install or self._global_limit)
+
+    def reserve(self, *, install_id: str, estimated_tokens: int) -> TokenReservation:
+        """Reserve estimated_tokens or raise TokenBudgetExceeded without reserving anything."""
+        now = self._clock()
+        window = self._window_seconds
+        tokens = min(
+            estimated_tokens,
+            self._limit_per_install or estimated_tokens,
+            self._global_limit or estimated_tokens,
+        )
+        with self._lock:
+            install_next = None
+            if self._limit_per_install:
+                cost = tokens * self._install_interval
+                install_tat = self._install_tats.get(install_id, now=now)
+                install_next = (now if install_tat is None else max(install_tat, now)) + cost
+                if install_next - now > window:
+                    raise TokenBudgetExceeded(
+                        scope="install_id",
+                        retry_after_seconds=retry_after(install_next - window - now),
+                    )
+
+            global_next = None
+            if self._global_limit:
+                cost = tokens * self._global_interval
+                global_next = max(self._global_tat, now) + cost
+                if global_next - now > window:
+                    raise TokenBudgetExceeded(
+                        scope="global",
+                        retry_after_seconds=retry_after(global_next - window - now),
+                    )
+
+            if install_next is not None:
+                self._install_tats.set(install_id, install_next)
+            if global_next is not None:
+                self._global_tat = global_next
+        return TokenReservation(install_id=install_id, reserved_tokens=tokens)
+
+    def reconcile(self, reservation: TokenReservation) -> None:
+        """Charge actual_tokens instead of the estimate (a no-op if actual_tokens is unset)."""
+        if reservation.actual_tokens is None:
+            return
+        self._adjust(reservation, reservation.actual_tokens - reservation.reserved_tokens)
+
+    def release(self, reservation: TokenReservation) -> None:
+        """Refund a reservation whose AI call failed."""
+        self._adjust(reservation, -reservation.reserved_tokens)
+
+    def _adjust(self, reservation: TokenReservation, delta_tokens: int) -> None:
+        if not delta_tokens:
+            return
+        now = self._clock()
+        # Keep state within one window of now; ExpiringWindows relies on it.
+        ceiling = now + self._window_seconds
+        with self._lock:
+            if self._limit_per_install:
+                install_id = reservation.install_id
+                tat = self._install_tats.get(install_id, now=now)
+                tat = now if tat is None else max(tat, now)
+                self._install_tats.set(
+                    install_id, min(tat + delta_tokens * self._install_interval, ceiling)
+                )
+            if self._global_limit:
+                self._global_tat = min(
+                    max(self._global_tat, now) + delta_tokens * self._global_interval, ceiling
+                )
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import time
+from collections import deque
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Protocol
+
+logger = logging.getLogger("offload_backend")
+
+AttributeValue = str | int | float | bool
+
+_span_ids = itertools.count(1)
+_current_span: ContextVar[Span | None] = ContextVar("offload_current_span", default=None)
+
+
+@dataclass(slots=True, eq=False)
+class Span:
+    """One timed operation. started_at and ended_at are time.perf_counter() values."""
+
+    name: str
+    trace: Trace = field(repr=False)
+    span_id: int
+    parent_id: int | None
+    started_at: float
+    ended_at: float | None = None
+    status: str = "ok"
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+
+    @property
+    def duration_seconds(self) -> float:
+        ended_at = self.ended_at if self.ended_at is not None else time.perf_counter()
+        return ended_at - self.started_at
+
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        self.attributes[key] = value
+
+
+@dataclass(slots=True)
+class Trace:
+    """The spans recorded for one request, root first; trace_id is the request ID."""
+
+    trace_id: str
+    started_at_epoch: float
+    spans: list[Span] = field(default_factory=list)
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.root.duration_seconds
+
+
+class SpanExporter(Protocol):
+    def export(self, trace: Trace) -> None: ...
+
+
+class RingBufferExporter:
+    """Keeps the most recent traces at least min_duration_seconds long, in memory."""
+
+    def __init__(self, *, max_traces: int = 256, min_duration_seconds: float = 0.0):
+        self._traces: deque[Trace] = deque(maxlen=max(1, max_traces))
+        self._min_duration_seconds = min_duration_seconds
+        self._lock = Lock()
+
+    def export(self, trace: Trace) -> None:
+        if trace.duration_seconds < self._min_duration_seconds:
+            return
+        with self._lock:
+            self._traces.append(trace)
+
+    def slowest(self, *, limit: int = 20, min_duration_seconds: float = 0.0) -> list[Trace]:
+        with self._lock:
+            traces = list(self._traces)
+        matching = [trace for trace in traces if trace.duration_seconds >= min_duration_seconds]
+        matching.sort(key=lambda trace: trace.duration_seconds, reverse=True)
+        return matching[:limit]
+
+
+class Tracer:
+    """Starts request traces and hands each finished trace to the exporter."""
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    @contextmanager
+    def trace(self, name: str, *, trace_id: str, **attributes: AttributeValue) -> Generator[Span]:
+        trace = Trace(trace_id=trace_id, started_at_epoch=time.time())
+        root = _open_span(name, trace=trace, parent_id=None, attributes=attributes)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as exc:
+            _mark_error(root, exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.ended_at = time.perf_counter()
+            try:
+                self.exporter.export(trace)
+            except Exception:
+                logger.warning("trace_export_failed", exc_info=True)
+
+
+@contextmanager
+def span(name: str, **attributes: AttributeValue) -> Generator[Span | None]:
+    """Time the block as a child of the current span; a no-op outside a trace.
+
+    The current span lives in a context variable, so nesting follows the
+    code's call structure across awaits and into threadpool dependencies.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = _open_span(name, trace=parent.trace, parent_id=parent.span_id, attributes=attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        _mark_error(child, exc)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.ended_at = time.perf_counter()
+
+
+def record_span(name: str, *, started_at: float, **attributes: AttributeValue) -> None:
+    """Record a child span of the current span that started at started_at and ends now."""
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = _open_span(name, trace=parent.trace, parent_id=parent.span_id, attributes=attributes)
+    child.started_at = started_at
+    child.ended_at = time.perf_counter()
+
+
+def _open_span(
+    name: str,
+    *,
+    trace: Trace,
+    parent_id: int | None,
+    attributes: dict[str, AttributeValue],
+) -> Span:
+    opened = Span(
+        name=name,
+        trace=trace,
+        span_id=next(_span_ids),
+        parent_id=parent_id,
+        started_at=time.perf_counter(),
+        attributes=attributes,
+    )
+    # list.append is atomic, so spans from threadpool dependencies are safe.
+    trace.spans.append(opened)
+    return opened
+
+
+def _mark_error(target: Span, exc: BaseException) -> None:
+    target.status = "error"
+    target.attributes["error"] = exc.__class__.__name__
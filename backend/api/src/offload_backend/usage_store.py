@@ -1,54 +1,189 @@
 from __future__ import annotations
 
+import bisect
+import hashlib
 import sqlite3
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
 from pathlib import Path
 from threading import Lock
 from typing import Protocol
 
+from offload_backend.cache import TTLCache
+from offload_backend.sqlite_connections import SQLiteConnectionManager, SQLitePragmas
+
+DEFAULT_EXPORT_PAGE_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class UsageRecord:
+    install_id: str
+    feature: str
+    count: int
+    updated_at: str | None = None
+
+
+@dataclass(frozen=True)
+class DailyUsage:
+    day: str
+    feature: str
+    count: int
+    tokens: int
+
+
+@dataclass(frozen=True)
+class UsageSummary:
+    """Every counter for one install plus a validator that changes with them."""
+
+    install_id: str
+    records: tuple[UsageRecord, ...]
+    etag: str
+
+    @property
+    def updated_at(self) -> str | None:
+        return max((r.updated_at for r in self.records if r.updated_at), default=None)
+
+
+def build_usage_summary(install_id: str, records: Sequence[UsageRecord]) -> UsageSummary:
+    """Derive the summary ETag from the latest updated_at and every feature count."""
+    ordered = tuple(sorted(records, key=lambda r: r.feature))
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(max((r.updated_at or "" for r in ordered), default="").encode("utf-8"))
+    for record in ordered:
+        digest.update(f"\n{record.feature}={record.count}".encode())
+    return UsageSummary(install_id=install_id, records=ordered, etag=digest.hexdigest())
+
+
+def omit_client_counts(
+    records: Sequence[UsageRecord], local_counts: Mapping[str, int]
+) -> list[UsageRecord]:
+    """Drop records whose count the client just submitted; it already has them."""
+    return [r for r in records if local_counts.get(r.feature) != r.count]
+
 
 class UsageStore(Protocol):
     def reconcile(self, *, install_id: str, feature: str, local_count: int) -> int: ...
+    def reconcile_many(
+        self,
+        *,
+        install_id: str,
+        local_counts: Mapping[str, int],
+        since: datetime | None = None,
+    ) -> list[UsageRecord]: ...
     def get_total_count(self, *, install_id: str, features: list[str]) -> int: ...
-    def increment(self, *, install_id: str, feature: str) -> None: ...
+    def get_summary(self, *, install_id: str) -> UsageSummary: ...
+
+    def increment(self, *, install_id: str, feature: str, tokens: int = 0) -> None:
+        """Count one use of feature. tokens is the call's provider token usage.
+
+        Only SQLite stores with the event log enabled persist tokens (into
+        the usage_daily rollup); other stores accept and discard them.
+        """
+        ...
+
+    def iter_usage(self, *, page_size: int = DEFAULT_EXPORT_PAGE_SIZE) -> Iterator[UsageRecord]: ...
     def dump(self) -> dict[tuple[str, str], int]: ...
     def close(self) -> None: ...
 
 
-def _open_sqlite_connection(db_path: str) -> sqlite3.Connection:
-    """Open a SQLite connection with WAL mode and a busy timeout.
+UsageKey = tuple[str, str]
+
 
-    Creates the parent directory for file-based databases if it does not exist.
-    Passing ':memory:' opens an in-process, in-memory database.
+def iter_keyset_pages(
+    fetch_page: Callable[[UsageKey | None, int], list[UsageRecord]],
+    *,
+    page_size: int,
+) -> Iterator[UsageRecord]:
+    """Yield records page by page, resuming after the last (install_id, feature) seen.
+
+    fetch_page is called once per page and must return rows ordered by the
+    primary key; stores hold their lock only inside fetch_page, so writers can
+    interleave between pages and memory stays bounded by page_size.
     """
-    if db_path != ":memory:":
-        Path(db_path).expanduser().resolve().parent.mkdir(parents=True, exist_ok=True)
-    connection = sqlite3.connect(db_path, check_same_thread=False)
-    connection.execute("PRAGMA journal_mode=WAL")
-    connection.execute("PRAGMA busy_timeout=5000")
-    return connection
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1")
+    after: UsageKey | None = None
+    while True:
+        page = fetch_page(after, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after = (page[-1].install_id, page[-1].feature)
 
 
 class InMemoryUsageStore:
     def __init__(self):
         self._counts: dict[tuple[str, str], int] = {}
+        self._updated_at: dict[tuple[str, str], datetime] = {}
+        # Every key of _counts in order, so export pages are a bisect away.
+        self._sorted_keys: list[UsageKey] = []
         self._lock = Lock()
 
     def reconcile(self, *, install_id: str, feature: str, local_count: int) -> int:
         key = (install_id, feature)
         with self._lock:
-            current = self._counts.get(key, 0)
-            reconciled = max(current, local_count)
-            self._counts[key] = reconciled
-            return reconciled
+            self._raise_to(key, local_count)
+            return self._counts[key]
+
+    def reconcile_many(
+        self,
+        *,
+        install_id: str,
+        local_counts: Mapping[str, int],
+        since: datetime | None = None,
+    ) -> list[UsageRecord]:
+        """See SQLiteUsageStore.reconcile_many; since is compared exactly."""
+        with self._lock:
+            for feature, count in local_counts.items():
+                self._raise_to((install_id, feature), count)
+            if since is None:
+                features = sorted(local_counts)
+            else:
+                if since.tzinfo is None:
+                    since = since.replace(tzinfo=UTC)
+                features = sorted(
+                    feature
+                    for (owner, feature), updated_at in self._updated_at.items()
+                    if owner == install_id and updated_at >= since
+                )
+            records = [
+                UsageRecord(install_id, feature, self._counts[(install_id, feature)])
+                for feature in features
+            ]
+        return records if since is None else omit_client_counts(records, local_counts)
 
     def get_total_count(self, *, install_id: str, features: list[str]) -> int:
         with self._lock:
             return sum(self._counts.get((install_id, f), 0) for f in features)
 
-    def increment(self, *, install_id: str, feature: str) -> None:
+    def get_summary(self, *, install_id: str) -> UsageSummary:
+        with self._lock:
+            records = [
+                UsageRecord(install_id, feature, count)
+                for (owner, feature), count in self._counts.items()
+                if owner == install_id
+            ]
+        return build_usage_summary(install_id, records)
+
+    def increment(self, *, install_id: str, feature: str, tokens: int = 0) -> None:
+        del tokens  # No token rollup in memory; see UsageStore.increment.
         key = (install_id, feature)
         with self._lock:
-            self._counts[key] = self._counts.get(key, 0) + 1
+            current = self._counts.get(key)
+            if current is None:
+                bisect.insort(self._sorted_keys, key)
+            self._counts[key] = (current or 0) + 1
+            self._updated_at[key] = datetime.now(UTC)
+
+    def iter_usage(self, *, page_size: int = DEFAULT_EXPORT_PAGE_SIZE) -> Iterator[UsageRecord]:
+        return iter_keyset_pages(self._usage_page, page_size=page_size)
+
+    def _usage_page(self, after: UsageKey | None, page_size: int) -> list[UsageRecord]:
+        with self._lock:
+            start = 0 if after is None else bisect.bisect_right(self._sorted_keys, after)
+            keys = self._sorted_keys[start : start + page_size]
+            return [UsageRecord(*key, count=self._counts[key]) for key in keys]
 
     def dump(self) -> dict[tuple[str, str], int]:
         with self._lock:
@@ -57,19 +192,62 @@ class InMemoryUsageStore:
     def close(self) -> None:
         return None
 
+    def _raise_to(self, key: UsageKey, count: int) -> None:
+        """Raise key's counter to at least count; callers hold the lock."""
+        current = self._counts.get(key)
+        if current is None:
+            bisect.insort(self._sorted_keys, key)
+        if current is None or count > current:
+            self._counts[key] = max(current or 0, count)
+            self._updated_at[key] = datetime.now(UTC)
+
 
 class SQLiteUsageStore:
-    def __init__(self, *, db_path: str):
-        self._lock = Lock()
-        self._connection = self._open_connection(db_path=db_path)
+    """Persists per-install feature usage counts in SQLite.
+
+    Writes go through the connection manager's single writer connection and
+    reads use its read-only reader pool, so quota checks are not blocked by
+    concurrent increments. Pass a shared connection_manager to co-locate this
+    store with other stores on the same database file; otherwise the store
+    opens and owns its own manager.
+
+    With event_log enabled, increment appends a row to usage_events instead of
+    updating the hot usage_counts row, and compact() later folds events into
+    usage_counts and the usage_daily rollup. Quota reads add the (bounded)
+    uncompacted events for the install, and reconcile folds the key's pending
+    events first, so counts stay exact between compactions.
+
+    get_summary results are cached per install for summary_cache_ttl_seconds
+    (0 disables the cache). This store's writes invalidate the install's
+    entry; writes from other processes sharing the file show up once the
+    entry expires.
+    """
+
+    def __init__(
+        self,
+        *,
+        db_path: str,
+        connection_manager: SQLiteConnectionManager | None = None,
+        event_log: bool = False,
+        summary_cache_ttl_seconds: float = 0.0,
+        summary_cache_max_entries: int = 10000,
+    ):
+        self._owns_connections = connection_manager is None
+        self._connections = connection_manager or SQLiteConnectionManager(db_path=db_path)
+        self._event_log = event_log
+        self._summaries: TTLCache[str, UsageSummary] = TTLCache(
+            max_entries=summary_cache_max_entries,
+            ttl_seconds=summary_cache_ttl_seconds,
+        )
         self._bootstrap_schema()
 
-    def _open_connection(self, *, db_path: str) -> sqlite3.Connection:
-        return _open_sqlite_connection(db_path)
+    @property
+    def connection_manager(self) -> SQLiteConnectionManager:
+        return self._connections
 
     def _bootstrap_schema(self) -> None:
-        with self._lock:
-            self._connection.execute(
+        with self._connections.writer() as connection:
+            connection.execute(
                 """
                 CREATE TABLE IF NOT EXISTS usage_counts (
                     install_id TEXT NOT NULL,
@@ -80,84 +258,552 @@ class SQLiteUsageStore:
                 )
                 """,
             )
-            self._connection.commit()
-
-    def _reconcile_transaction(self, *, install_id: str, feature: str, local_count: int) -> int:
-        self._connection.execute("BEGIN IMMEDIATE")
-        self._connection.execute(
-            """
-            INSERT INTO usage_counts (install_id, feature, count)
-            VALUES (?, ?, ?)
-            ON CONFLICT (install_id, feature)
-            DO UPDATE SET
-                count = MAX(usage_counts.count, excluded.count),
-                updated_at = CURRENT_TIMESTAMP
-            """,
-            (install_id, feature, local_count),
-        )
-        row = self._connection.execute(
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS usage_events (
+                    id INTEGER PRIMARY KEY,
+                    install_id TEXT NOT NULL,
+                    feature TEXT NOT NULL,
+                    occurred_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                    tokens INTEGER NOT NULL DEFAULT 0
+                )
+                """,
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS usage_events_by_key"
+                " ON usage_events (install_id, feature)",
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS usage_daily (
+                    day TEXT NOT NULL,
+                    install_id TEXT NOT NULL,
+                    feature TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    PRIMARY KEY (install_id, day, feature)
+                )
+                """,
+            )
+            connection.commit()
+
+    def _reconcile_transaction(
+        self,
+        connection: sqlite3.Connection,
+        *,
+        install_id: str,
+        feature: str,
+        local_count: int,
+    ) -> int:
+        connection.execute("BEGIN IMMEDIATE")
+        _fold_events(connection, key=(install_id, feature))
+        connection.execute(_RECONCILE_UPSERT, (install_id, feature, local_count))
+        row = connection.execute(
             "SELECT count FROM usage_counts WHERE install_id = ? AND feature = ?",
             (install_id, feature),
         ).fetchone()
-        self._connection.commit()
+        connection.commit()
         if row is None:
             raise RuntimeError("failed to reconcile usage count")
         return int(row[0])
 
     def reconcile(self, *, install_id: str, feature: str, local_count: int) -> int:
-        with self._lock:
+        with self._connections.writer() as connection:
             try:
-                return self._reconcile_transaction(
+                reconciled = self._reconcile_transaction(
+                    connection,
                     install_id=install_id,
                     feature=feature,
                     local_count=local_count,
                 )
             except Exception:
-                self._connection.rollback()
+                connection.rollback()
                 raise
+        self._summaries.invalidate(install_id)
+        return reconciled
+
+    def reconcile_many(
+        self,
+        *,
+        install_id: str,
+        local_counts: Mapping[str, int],
+        since: datetime | None = None,
+    ) -> list[UsageRecord]:
+        """Reconcile several features for one install in a single transaction.
+
+        Without since, returns the submitted features' counters. With since,
+        returns every counter for the install whose updated_at is at or after
+        since (truncated to the column's one-second resolution), including
+        features the client did not send, except counters that now equal the
+        count the client submitted.
+        """
+        with self._connections.writer() as connection:
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                _fold_events(connection, install_id=install_id)
+                connection.executemany(
+                    _RECONCILE_UPSERT,
+                    [(install_id, feature, count) for feature, count in local_counts.items()],
+                )
+                if since is not None:
+                    rows = connection.execute(
+                        "SELECT feature, count, updated_at FROM usage_counts"
+                        " WHERE install_id = ? AND updated_at >= ? ORDER BY feature",
+                        (install_id, _sqlite_timestamp(since)),
+                    ).fetchall()
+                elif local_counts:
+                    placeholders = ",".join("?" * len(local_counts))
+                    rows = connection.execute(
+                        "SELECT feature, count, updated_at FROM usage_counts"
+                        f" WHERE install_id = ? AND feature IN ({placeholders})"  # noqa: S608
+                        " ORDER BY feature",
+                        (install_id, *local_counts),
+                    ).fetchall()
+                else:
+                    rows = []
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+        self._summaries.invalidate(install_id)
+        records = [
+            UsageRecord(install_id, str(feature), int(count), str(updated_at))
+            for feature, count, updated_at in rows
+        ]
+        return records if since is None else omit_client_counts(records, local_counts)
 
     def get_total_count(self, *, install_id: str, features: list[str]) -> int:
         if not features:
             return 0
-        with self._lock:
-            placeholders = ",".join("?" * len(features))
-            query = (
-                "SELECT COALESCE(SUM(count), 0) FROM usage_counts"
-                f" WHERE install_id = ? AND feature IN ({placeholders})"  # noqa: S608
+        placeholders = ",".join("?" * len(features))
+        params = [install_id, *features]
+        query = (
+            "SELECT"
+            " (SELECT COALESCE(SUM(count), 0) FROM usage_counts"
+            f"  WHERE install_id = ? AND feature IN ({placeholders}))"  # noqa: S608
+        )
+        if self._event_log:
+            query += (
+                " + (SELECT COUNT(*) FROM usage_events"
+                f"  WHERE install_id = ? AND feature IN ({placeholders}))"  # noqa: S608
             )
-            row = self._connection.execute(query, [install_id, *features]).fetchone()
+            params += params
+        with self._connections.reader() as connection:
+            row = connection.execute(query, params).fetchone()
             return int(row[0]) if row else 0
 
-    def increment(self, *, install_id: str, feature: str) -> None:
-        with self._lock:
-            try:
-                self._connection.execute("BEGIN IMMEDIATE")
-                self._connection.execute(
-                    """
-                    INSERT INTO usage_counts (install_id, feature, count)
-                    VALUES (?, ?, 1)
-                    ON CONFLICT (install_id, feature)
-                    DO UPDATE SET
-                        count = usage_counts.count + 1,
-                        updated_at = CURRENT_TIMESTAMP
-                    """,
-                    (install_id, feature),
+    def get_summary(self, *, install_id: str) -> UsageSummary:
+        cached = self._summaries.get(install_id)
+        if cached is not None:
+            return cached
+        # A write that lands during the read bumps the generation, so this
+        # (possibly stale) summary is not cached over its invalidation.
+        generation = self._summaries.generation(install_id)
+        with self._connections.reader() as connection:
+            rows = connection.execute(
+                """
+                SELECT feature, SUM(count), MAX(updated_at) FROM (
+                    SELECT feature, count, updated_at FROM usage_counts WHERE install_id = ?
+                    UNION ALL
+                    SELECT feature, COUNT(*), NULL FROM usage_events
+                    WHERE install_id = ? GROUP BY feature
                 )
-                self._connection.commit()
+                GROUP BY feature
+                """,
+                (install_id, install_id),
+            ).fetchall()
+        summary = build_usage_summary(
+            install_id,
+            [
+                UsageRecord(install_id, str(feature), int(count), updated_at)
+                for feature, count, updated_at in rows
+            ],
+        )
+        self._summaries.set(install_id, summary, generation=generation)
+        return summary
+
+    def increment(self, *, install_id: str, feature: str, tokens: int = 0) -> None:
+        with self._connections.writer() as connection:
+            try:
+                if self._event_log:
+                    connection.execute(
+                        "INSERT INTO usage_events (install_id, feature, tokens) VALUES (?, ?, ?)",
+                        (install_id, feature, tokens),
+                    )
+                else:
+                    connection.execute("BEGIN IMMEDIATE")
+                    connection.execute(
+                        """
+                        INSERT INTO usage_counts (install_id, feature, count)
+                        VALUES (?, ?, 1)
+                        ON CONFLICT (install_id, feature)
+                        DO UPDATE SET
+                            count = usage_counts.count + 1,
+                            updated_at = CURRENT_TIMESTAMP
+                        """,
+                        (install_id, feature),
+                    )
+                connection.commit()
             except Exception:
-                self._connection.rollback()
+                connection.rollback()
                 raise
+        self._summaries.invalidate(install_id)
 
-    def dump(self) -> dict[tuple[str, str], int]:
-        with self._lock:
-            rows = self._connection.execute(
-                "SELECT install_id, feature, count FROM usage_counts",
+    def compact(self, *, batch_size: int | None = None) -> int:
+        """Fold the oldest logged events into usage_counts and usage_daily.
+
+        Returns the number of events folded. Each call is one short writer
+        transaction; pass batch_size to bound how long it holds the writer.
+        """
+        with self._connections.writer() as connection:
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                folded = _fold_events(connection, limit=batch_size)
+                connection.commit()
+                return folded
+            except Exception:
+                connection.rollback()
+                raise
+
+    def daily_usage(self, *, install_id: str, since_day: str | None = None) -> list[DailyUsage]:
+        """Return compacted per-day counts and tokens for an install, oldest first."""
+        with self._connections.reader() as connection:
+            rows = connection.execute(
+                "SELECT day, feature, count, tokens FROM usage_daily"
+                " WHERE install_id = ? AND day >= ? ORDER BY day, feature",
+                (install_id, since_day or ""),
             ).fetchall()
-            return {
-                (str(install_id), str(feature)): int(count)
-                for install_id, feature, count in rows
-            }
+        return [
+            DailyUsage(str(day), str(feature), int(count), int(tokens))
+            for day, feature, count, tokens in rows
+        ]
+
+    def iter_usage(self, *, page_size: int = DEFAULT_EXPORT_PAGE_SIZE) -> Iterator[UsageRecord]:
+        return iter_keyset_pages(self._usage_page, page_size=page_size)
+
+    def _usage_page(self, after: UsageKey | None, page_size: int) -> list[UsageRecord]:
+        with self._connections.reader() as connection:
+            if after is None:
+                rows = connection.execute(
+                    "SELECT install_id, feature, count, updated_at FROM usage_counts"
+                    " ORDER BY install_id, feature LIMIT ?",
+                    (page_size,),
+                ).fetchall()
+            else:
+                rows = connection.execute(
+                    "SELECT install_id, feature, count, updated_at FROM usage_counts"
+                    " WHERE (install_id, feature) > (?, ?)"
+                    " ORDER BY install_id, feature LIMIT ?",
+                    (*after, page_size),
+                ).fetchall()
+        return [
+            UsageRecord(str(install_id), str(feature), int(count), str(updated_at))
+            for install_id, feature, count, updated_at in rows
+        ]
+
+    def dump(self) -> dict[tuple[str, str], int]:
+        if self._event_log:
+            self.compact()
+        return {(record.install_id, record.feature): record.count for record in self.iter_usage()}
 
     def close(self) -> None:
-        with self._lock:
-            self._connection.close()
+        if self._owns_connections:
+            self._connections.close()
+
+
+# Raising a counter bumps updated_at; a stale or equal local count leaves it
+# untouched so delta reconciles (since=...) only report real server-side changes.
+_RECONCILE_UPSERT = """
+    INSERT INTO usage_counts (install_id, feature, count)
+    VALUES (?, ?, ?)
+    ON CONFLICT (install_id, feature)
+    DO UPDATE SET
+        count = MAX(usage_counts.count, excluded.count),
+        updated_at = CASE
+            WHEN excluded.count > usage_counts.count THEN CURRENT_TIMESTAMP
+            ELSE usage_counts.updated_at
+        END
+"""
+
+
+def _sqlite_timestamp(value: datetime) -> str:
+    """Format a datetime like CURRENT_TIMESTAMP (UTC, whole seconds); naive means UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(UTC)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _fold_events(
+    connection: sqlite3.Connection,
+    *,
+    key: UsageKey | None = None,
+    install_id: str | None = None,
+    limit: int | None = None,
+) -> int:
+    """Move logged events into the counters and daily rollups. Caller owns the transaction."""
+    if key is not None:
+        scope, params = "install_id = ? AND feature = ?", key
+    elif install_id is not None:
+        scope, params = "install_id = ?", (install_id,)
+    elif limit is not None:
+        scope = "id <= (SELECT MAX(id) FROM (SELECT id FROM usage_events ORDER BY id LIMIT ?))"
+        params = (limit,)
+    else:
+        scope, params = "true", ()
+    selected = connection.execute(
+        f"SELECT MIN(id), MAX(id), COUNT(*) FROM usage_events WHERE {scope}",  # noqa: S608
+        params,
+    ).fetchone()
+    if selected is None or not selected[2]:
+        return 0
+    low, high, folded = int(selected[0]), int(selected[1]), int(selected[2])
+    window = f"id BETWEEN ? AND ? AND ({scope})"
+    window_params = (low, high, *params)
+    connection.execute(
+        f"""
+        INSERT INTO usage_counts (install_id, feature, count)
+        SELECT install_id, feature, COUNT(*) FROM usage_events
+        WHERE {window}
+        GROUP BY install_id, feature
+        ON CONFLICT (install_id, feature)
+        DO UPDATE SET
+            count = usage_counts.count + excluded.count,
+            updated_at = CURRENT_TIMESTAMP
+        """,  # noqa: S608
+        window_params,
+    )
+    connection.execute(
+        f"""
+        INSERT INTO usage_daily (day, install_id, feature, count, tokens)
+        SELECT date(occurred_at, 'unixepoch'), install_id, feature, COUNT(*), SUM(tokens)
+        FROM usage_events
+        WHERE {window}
+        GROUP BY 1, 2, 3
+        ON CONFLICT (install_id, day, feature)
+        DO UPDATE SET
+            count = usage_daily.count + excluded.count,
+            tokens = usage_daily.tokens + excluded.tokens
+        """,  # noqa: S608
+        window_params,
+    )
+    connection.execute(f"DELETE FROM usage_events WHERE {window}", window_params)  # noqa: S608
+    return folded
+
+
+def shard_index(install_id: str, shard_count: int) -> int:
+    """Map an install_id to a shard with a hash that is stable across processes."""
+    digest = hashlib.blake2b(install_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def shard_db_paths(db_path: str, shard_count: int) -> list[str]:
+    """Return the per-shard database files for a base db_path.
+
+    A single shard is the base file itself, so an unsharded deployment keeps
+    its existing database. Shard files embed the shard count so a reshard can
+    write a new layout next to the old one without clobbering it.
+    """
+    if shard_count < 1:
+        raise ValueError("shard_count must be at least 1")
+    if shard_count == 1:
+        return [db_path]
+    base = Path(db_path)
+    return [
+        str(base.with_name(f"{base.stem}.shard-{index}-of-{shard_count}{base.suffix}"))
+        for index in range(shard_count)
+    ]
+
+
+class ShardedSQLiteUsageStore:
+    """Partitions usage rows across several SQLite files by install_id.
+
+    Every shard is a SQLiteUsageStore with its own connection manager, so each
+    shard has an independent writer connection and lock and writes to
+    different installs proceed in parallel. All operations touch a single
+    install, so each one is routed to exactly one shard.
+    """
+
+    def __init__(
+        self,
+        *,
+        db_path: str,
+        shard_count: int,
+        reader_pool_size: int = 4,
+        pragmas: SQLitePragmas | None = None,
+        event_log: bool = False,
+        summary_cache_ttl_seconds: float = 0.0,
+        summary_cache_max_entries: int = 10000,
+    ):
+        self._shards = [
+            SQLiteUsageStore(
+                db_path=path,
+                connection_manager=SQLiteConnectionManager(
+                    db_path=path,
+                    reader_pool_size=reader_pool_size,
+                    pragmas=pragmas,
+                ),
+                event_log=event_log,
+                summary_cache_ttl_seconds=summary_cache_ttl_seconds,
+                summary_cache_max_entries=summary_cache_max_entries,
+            )
+            for path in shard_db_paths(db_path, shard_count)
+        ]
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._shards)
+
+    @property
+    def shards(self) -> Sequence[SQLiteUsageStore]:
+        return tuple(self._shards)
+
+    def shard_for(self, install_id: str) -> SQLiteUsageStore:
+        return self._shards[shard_index(install_id, len(self._shards))]
+
+    def reconcile(self, *, install_id: str, feature: str, local_count: int) -> int:
+        return self.shard_for(install_id).reconcile(
+            install_id=install_id,
+            feature=feature,
+            local_count=local_count,
+        )
+
+    def get_total_count(self, *, install_id: str, features: list[str]) -> int:
+        return self.shard_for(install_id).get_total_count(install_id=install_id, features=features)
+
+    def increment(self, *, install_id: str, feature: str, tokens: int = 0) -> None:
+        self.shard_for(install_id).increment(install_id=install_id, feature=feature, tokens=tokens)
+
+    def reconcile_many(
+        self,
+        *,
+        install_id: str,
+        local_counts: Mapping[str, int],
+        since: datetime | None = None,
+    ) -> list[UsageRecord]:
+        return self.shard_for(install_id).reconcile_many(
+            install_id=install_id, local_counts=local_counts, since=since
+        )
+
+    def get_summary(self, *, install_id: str) -> UsageSummary:
+        return self.shard_for(install_id).get_summary(install_id=install_id)
+
+    def compact(self, *, batch_size: int | None = None) -> int:
+        return sum(shard.compact(batch_size=batch_size) for shard in self._shards)
+
+    def daily_usage(self, *, install_id: str, since_day: str | None = None) -> list[DailyUsage]:
+        return self.shard_for(install_id).daily_usage(install_id=install_id, since_day=since_day)
+
+    def iter_usage(self, *, page_size: int = DEFAULT_EXPORT_PAGE_SIZE) -> Iterator[UsageRecord]:
+        """Yield every shard's rows in turn; ordering is by key within each shard only."""
+        for shard in self._shards:
+            yield from shard.iter_usage(page_size=page_size)
+
+    def dump_shard(self, index: int) -> dict[tuple[str, str], int]:
+        return self._shards[index].dump()
+
+    def dump(self) -> dict[tuple[str, str], int]:
+        merged: dict[tuple[str, str], int] = {}
+        for shard in self._shards:
+            merged.update(shard.dump())
+        return merged
+
+    def close(self) -> None:
+        for shard in self._shards:
+            shard.connection_manager.close()
+
+
+_RESHARD_BATCH_SIZE = 1000
+
+
+def reshard_usage_databases(*, db_path: str, from_shards: int, to_shards: int) -> int:
+    """Copy usage rows from one shard layout to another. Returns counter rows copied.
+
+    Intended to run offline, with the API stopped, before changing
+    OFFLOAD_USAGE_SHARD_COUNT. Pending usage events are compacted first, then
+    counters and daily rollups are merged with max semantics, so re-running
+    after a partial failure is safe. Source files are kept for rollback.
+    """
+    if from_shards == to_shards:
+        raise ValueError("from_shards and to_shards must differ")
+    source_paths = shard_db_paths(db_path, from_shards)
+    missing = [path for path in source_paths if not Path(path).exists()]
+    if missing:
+        raise FileNotFoundError(f"missing source shard(s): {', '.join(missing)}")
+
+    target_paths = shard_db_paths(db_path, to_shards)
+    targets = [
+        SQLiteUsageStore(db_path=path, connection_manager=SQLiteConnectionManager(db_path=path))
+        for path in target_paths
+    ]
+    copied = 0
+    try:
+        for source_path in source_paths:
+            source = SQLiteConnectionManager(db_path=source_path)
+            try:
+                SQLiteUsageStore(db_path=source_path, connection_manager=source).compact()
+                copied += _copy_rows(source, targets, *_RESHARD_COUNTERS)
+                _copy_rows(source, targets, *_RESHARD_DAILY)
+            finally:
+                source.close()
+    finally:
+        for target in targets:
+            target.connection_manager.close()
+    return copied
+
+
+_RESHARD_COUNTERS = (
+    "SELECT install_id, feature, count, updated_at FROM usage_counts",
+    """
+    INSERT INTO usage_counts (install_id, feature, count, updated_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (install_id, feature)
+    DO UPDATE SET
+        count = MAX(usage_counts.count, excluded.count),
+        updated_at = MAX(usage_counts.updated_at, excluded.updated_at)
+    """,
+)
+_RESHARD_DAILY = (
+    "SELECT install_id, day, feature, count, tokens FROM usage_daily",
+    """
+    INSERT INTO usage_daily (install_id, day, feature, count, tokens)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (install_id, day, feature)
+    DO UPDATE SET
+        count = MAX(usage_daily.count, excluded.count),
+        tokens = MAX(usage_daily.tokens, excluded.tokens)
+    """,
+)
+
+
+def _copy_rows(
+    source: SQLiteConnectionManager,
+    targets: list[SQLiteUsageStore],
+    select: str,
+    upsert: str,
+) -> int:
+    copied = 0
+    with source.reader() as connection:
+        cursor = connection.execute(select)
+        while batch := cursor.fetchmany(_RESHARD_BATCH_SIZE):
+            _write_reshard_batch(targets, upsert, batch)
+            copied += len(batch)
+    return copied
+
+
+def _write_reshard_batch(
+    targets: list[SQLiteUsageStore],
+    upsert: str,
+    batch: list[tuple],
+) -> None:
+    by_shard: dict[int, list[tuple]] = {}
+    for row in batch:
+        by_shard.setdefault(shard_index(row[0], len(targets)), []).append(row)
+    for index, rows in by_shard.items():
+        with targets[index].connection_manager.writer() as connection:
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(upsert, rows)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
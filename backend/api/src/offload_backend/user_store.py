@@ -3,10 +3,9 @@ from __future__ import annotations
 import sqlite3
 import uuid
 from dataclasses import dataclass
-from threading import Lock
 from typing import Protocol
 
-from offload_backend.usage_store import _open_sqlite_connection
+from offload_backend.sqlite_connections import SQLiteConnectionManager
 
 
 @dataclass(frozen=True)
@@ -35,17 +34,28 @@ class SQLiteUserStore:
     """Persists Offload user identities in a SQLite database.
 
     Uses the same db_path as SQLiteUsageStore so all persistent state lives
-    in one file. The table schema is bootstrapped on first access.
+    in one file; pass the usage store's connection_manager to share its writer
+    connection and reader pool. The table schema is bootstrapped on first access.
+
+    A sign-in reads the row from the reader pool and only takes the writer
+    when that row would change, so repeat sign-ins stay read-only. Records are
+    not cached: a cached row could be stale after another process sharing the
+    file changes it, and a sign-in must decide from the stored row.
     """
 
-    def __init__(self, *, db_path: str):
-        self._lock = Lock()
-        self._connection = _open_sqlite_connection(db_path)
+    def __init__(
+        self,
+        *,
+        db_path: str,
+        connection_manager: SQLiteConnectionManager | None = None,
+    ):
+        self._owns_connections = connection_manager is None
+        self._connections = connection_manager or SQLiteConnectionManager(db_path=db_path)
         self._bootstrap_schema()
 
     def _bootstrap_schema(self) -> None:
-        with self._lock:
-            self._connection.execute(
+        with self._connections.writer() as connection:
+            connection.execute(
                 """
                 CREATE TABLE IF NOT EXISTS users (
                     user_id TEXT PRIMARY KEY,
@@ -56,7 +66,7 @@ class SQLiteUserStore:
                 )
                 """,
             )
-            self._connection.commit()
+            connection.commit()
 
     def upsert_by_apple_id(
         self,
@@ -70,27 +80,40 @@ class SQLiteUserStore:
         On conflict, updates install_id and display_name (preserving existing
         display_name when the new value is None).
 
-        Returns the authoritative UserRecord after the upsert.
+        Returns the authoritative UserRecord after the upsert. When the
+        stored row already matches, no write transaction is opened.
         """
+        existing = self.get_by_apple_id(apple_user_id)
+        if existing is not None and _is_unchanged(existing, install_id, display_name):
+            return existing
+
         new_id = str(uuid.uuid4())
-        with self._lock:
-            self._connection.execute("BEGIN IMMEDIATE")
-            self._connection.execute(
-                """
-                INSERT INTO users (user_id, apple_user_id, install_id, display_name)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(apple_user_id) DO UPDATE SET
-                    install_id = excluded.install_id,
-                    display_name = COALESCE(excluded.display_name, users.display_name)
-                """,
-                (new_id, apple_user_id, install_id, display_name),
-            )
-            row = self._connection.execute(
-                "SELECT user_id, apple_user_id, install_id, display_name FROM users"
-                " WHERE apple_user_id = ?",
-                (apple_user_id,),
-            ).fetchone()
-            self._connection.commit()
+        with self._connections.writer() as connection:
+            try:
+                connection.execute("BEGIN IMMEDIATE")
+                # The WHERE keeps a concurrent identical sign-in from rewriting the row.
+                connection.execute(
+                    """
+                    INSERT INTO users (user_id, apple_user_id, install_id, display_name)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(apple_user_id) DO UPDATE SET
+                        install_id = excluded.install_id,
+                        display_name = COALESCE(excluded.display_name, users.display_name)
+                    WHERE users.install_id IS NOT excluded.install_id
+                        OR users.display_name IS NOT
+                            COALESCE(excluded.display_name, users.display_name)
+                    """,
+                    (new_id, apple_user_id, install_id, display_name),
+                )
+                row = connection.execute(
+                    "SELECT user_id, apple_user_id, install_id, display_name FROM users"
+                    " WHERE apple_user_id = ?",
+                    (apple_user_id,),
+                ).fetchone()
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
 
         if row is None:
             raise RuntimeError("failed to upsert user record")
@@ -99,18 +122,25 @@ class SQLiteUserStore:
 
     def get_by_apple_id(self, apple_user_id: str) -> UserRecord | None:
         """Return the UserRecord for the given Apple user ID, or None if not found."""
-        with self._lock:
-            row = self._connection.execute(
+        with self._connections.reader() as connection:
+            row = connection.execute(
                 "SELECT user_id, apple_user_id, install_id, display_name FROM users"
                 " WHERE apple_user_id = ?",
                 (apple_user_id,),
             ).fetchone()
 
-        return _parse_row(row) if row is not None else None
+        if row is None:
+            return None
+        return _parse_row(row)
 
     def close(self) -> None:
-        with self._lock:
-            self._connection.close()
+        if self._owns_connections:
+            self._connections.close()
+
+
+def _is_unchanged(record: UserRecord, install_id: str, display_name: str | None) -> bool:
+    # A None display_name keeps the stored one, so it never counts as a change.
+    return record.install_id == install_id and display_name in (None, record.display_name)
 
 
 def _parse_row(row: sqlite3.Row | tuple) -> UserRecord:
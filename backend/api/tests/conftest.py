@@ -1,12 +1,24 @@
+import asyncio
+import json
 import os
-from collections.abc import Generator
+import re
+import socketserver
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager
 from datetime import UTC, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from typing import Any
 
+import jwt
 import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
 from fastapi.testclient import TestClient
+from jwt.algorithms import RSAAlgorithm
 
 from offload_backend.config import get_settings
 from offload_backend.providers.base import (
@@ -18,6 +30,10 @@ from offload_backend.providers.base import (
     ProviderRequestError,
     ProviderTimeout,
 )
+from offload_backend.redis_rate_limiter import (
+    CHECK_AND_INCREMENT_SCRIPT,
+    CHECK_AND_INCREMENT_SHA,
+)
 from offload_backend.security import SessionClaims, TokenManager
 
 
@@ -36,6 +52,10 @@ def test_env() -> Generator[None, None, None]:
     os.environ["OFFLOAD_DEFAULT_FEATURE_QUOTA"] = "10"
     os.environ["OFFLOAD_BUILD_VERSION"] = "test-build"
     os.environ["OFFLOAD_USAGE_DB_PATH"] = str(usage_db_path)
+    # Nothing listens on the discard port, so the startup JWKS prefetch fails fast.
+    os.environ["OFFLOAD_APPLE_JWKS_URL"] = "http://127.0.0.1:9/auth/keys"
+    # Keep records on the root logger, where caplog sees them.
+    os.environ["OFFLOAD_LOG_PIPELINE_ENABLED"] = "false"
     try:
         yield
     finally:
@@ -108,6 +128,32 @@ def post_usage_reconcile(client: TestClient):
     return _post
 
 
+@pytest.fixture
+def post_usage_reconcile_batch(client: TestClient):
+    def _post(
+        *,
+        authorization: str | None = None,
+        install_id: str = "install-12345",
+        counters: dict[str, int] | None = None,
+        since: str | None = None,
+    ):
+        headers: dict[str, str] = {}
+        if authorization is not None:
+            headers["Authorization"] = authorization
+        body: dict[str, object] = {
+            "install_id": install_id,
+            "counters": [
+                {"feature": feature, "local_count": count}
+                for feature, count in (counters or {}).items()
+            ],
+        }
+        if since is not None:
+            body["since"] = since
+        return client.post("/v1/usage/reconcile/batch", json=body, headers=headers or None)
+
+    return _post
+
+
 @pytest.fixture
 def post_breakdown_generate(client: TestClient):
     def _post(
@@ -250,3 +296,303 @@ class FailureAIProvider:
 
     async def draft_communication(self, **_):
         raise ProviderRequestError("provider failure")
+
+
+# ---------------------------------------------------------------------------
+# Local stand-in for a PostgreSQL connection pool
+# ---------------------------------------------------------------------------
+
+_PG_PLACEHOLDER = re.compile(r"\$(\d+)")
+
+
+class _StandInConnection:
+    def __init__(self, connection: sqlite3.Connection, pool: "PostgresStandInPool"):
+        self._connection = connection
+        self._pool = pool
+
+    def _translate(self, query: str) -> str:
+        return _PG_PLACEHOLDER.sub(r"?\1", query)
+
+    @staticmethod
+    def _params(args) -> tuple:
+        # Timestamps are stored as UTC ISO strings, so compare against the same.
+        return tuple(
+            arg.astimezone(UTC).isoformat() if isinstance(arg, datetime) else arg for arg in args
+        )
+
+    async def execute(self, query, *args):
+        self._connection.execute(self._translate(query), self._params(args))
+
+    async def executemany(self, query, args):
+        if self._pool.hold_writes is not None:
+            self._pool.writes_held.set()
+            await self._pool.hold_writes.wait()
+        self._connection.executemany(
+            self._translate(query), [self._params(row) for row in args]
+        )
+
+    async def fetch(self, query, *args):
+        return self._connection.execute(self._translate(query), self._params(args)).fetchall()
+
+    async def fetchrow(self, query, *args):
+        return self._connection.execute(self._translate(query), self._params(args)).fetchone()
+
+    async def fetchval(self, query, *args):
+        row = await self.fetchrow(query, *args)
+        return None if row is None else row[0]
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncGenerator[None]:
+        self._connection.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+
+class PostgresStandInPool:
+    """asyncpg-shaped pool over SQLite so PostgreSQL stores run without a server.
+
+    Translates $n placeholders and provides GREATEST()/now(), which is enough
+    for the stores' upsert and RETURNING statements to run unchanged. Setting
+    hold_writes parks executemany() until that event is set; writes_held
+    signals that one is waiting.
+    """
+
+    def __init__(self, db_path: str = ":memory:"):
+        self._connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._connection.create_function("GREATEST", 2, max, deterministic=True)
+        self._connection.create_function("now", 0, lambda: datetime.now(UTC).isoformat())
+        self.acquire_count = 0
+        self.closed = False
+        self.hold_writes: asyncio.Event | None = None
+        self.writes_held = threading.Event()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[_StandInConnection]:
+        self.acquire_count += 1
+        yield _StandInConnection(self._connection, self)
+
+    async def close(self) -> None:
+        self.closed = True
+        self._connection.close()
+
+
+@pytest.fixture
+def postgres_standin_pool():
+    return PostgresStandInPool()
+
+
+# ---------------------------------------------------------------------------
+# Local stand-in for Apple's JWKS endpoint
+# ---------------------------------------------------------------------------
+
+
+class AppleJWKSStandIn:
+    """Serves a mutable JWKS document over HTTP on 127.0.0.1 and counts requests."""
+
+    def __init__(self) -> None:
+        self.keys: dict[str, Any] = {}
+        self.status = 200
+        self.delay_seconds = 0.0
+        self.requests = 0
+        stand_in = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                stand_in.requests += 1
+                time.sleep(stand_in.delay_seconds)
+                body = json.dumps(
+                    {"keys": [jwk for _, jwk in stand_in.keys.values()]}
+                ).encode()
+                self.send_response(stand_in.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return None
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+        self._thread.start()
+        self.url = f"http://127.0.0.1:{self._server.server_port}/auth/keys"
+
+    def add_key(self, kid: str) -> None:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update({"kid": kid, "use": "sig", "alg": "RS256"})
+        self.keys[kid] = (private_key, jwk)
+
+    def sign(self, kid: str, *, sub: str = "apple.sub.test", audience: str = "wc.Offload") -> str:
+        now = int(time.time())
+        return jwt.encode(
+            {
+                "iss": "https://appleid.apple.com",
+                "aud": audience,
+                "sub": sub,
+                "iat": now,
+                "exp": now + 600,
+            },
+            self.keys[kid][0],
+            algorithm="RS256",
+            headers={"kid": kid},
+        )
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def apple_jwks_server():
+    server = AppleJWKSStandIn()
+    server.add_key("apple-key-1")
+    yield server
+    server.close()
+
+
+# ---------------------------------------------------------------------------
+# In-process Redis-protocol stand-in
+# ---------------------------------------------------------------------------
+
+
+class RESPStandIn:
+    """A threaded TCP server speaking enough RESP2 for the rate limiter.
+
+    Supports PING, AUTH, SELECT, GET, SET (EX/NX), INCR, PTTL, DEL,
+    MULTI/EXEC (queued commands run atomically under one lock), and SCRIPT
+    LOAD and EVALSHA of the rate limiter's CHECK_AND_INCREMENT_SCRIPT,
+    run as the equivalent command sequence. EVALSHA answers NOSCRIPT until
+    the script is loaded; clear `scripts` to simulate a server restart.
+    Received command names are recorded in `commands`.
+    """
+
+    def __init__(self) -> None:
+        self.data: dict[bytes, tuple[bytes, float | None]] = {}
+        self.commands: list[bytes] = []
+        self.scripts: set[bytes] = set()
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                queued: list[list[bytes]] | None = None
+                while True:
+                    command = _read_command(self.rfile)
+                    if command is None:
+                        return
+                    name = command[0].upper()
+                    stand_in.commands.append(name)
+                    if name == b"MULTI":
+                        queued = []
+                        reply = b"+OK\r\n"
+                    elif name == b"EXEC":
+                        with stand_in._lock:
+                            results = [stand_in._run(c) for c in queued or []]
+                        queued = None
+                        reply = b"*%d\r\n" % len(results) + b"".join(results)
+                    elif queued is not None:
+                        queued.append(command)
+                        reply = b"+QUEUED\r\n"
+                    else:
+                        with stand_in._lock:
+                            reply = stand_in._run(command)
+                    self.wfile.write(reply)
+                    self.wfile.flush()
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+        self._thread.start()
+        self.port = self._server.server_address[1]
+        self.url = f"redis://127.0.0.1:{self.port}/0"
+
+    def _run(self, command: list[bytes]) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        now = time.monotonic()
+        for key in args[:1]:
+            entry = self.data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= now:
+                del self.data[key]
+        if name in (b"PING", b"AUTH", b"SELECT"):
+            return b"+PONG\r\n" if name == b"PING" else b"+OK\r\n"
+        if name == b"GET":
+            entry = self.data.get(args[0])
+            return b"$-1\r\n" if entry is None else b"$%d\r\n%s\r\n" % (len(entry[0]), entry[0])
+        if name == b"SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if b"NX" in options and key in self.data:
+                return b"$-1\r\n"
+            expires_at = None
+            if b"EX" in options:
+                expires_at = now + int(args[2 + options.index(b"EX") + 1])
+            self.data[key] = (value, expires_at)
+            return b"+OK\r\n"
+        if name == b"INCR":
+            value, expires_at = self.data.get(args[0], (b"0", None))
+            count = int(value) + 1
+            self.data[args[0]] = (b"%d" % count, expires_at)
+            return b":%d\r\n" % count
+        if name == b"PTTL":
+            entry = self.data.get(args[0])
+            if entry is None:
+                return b":-2\r\n"
+            if entry[1] is None:
+                return b":-1\r\n"
+            return b":%d\r\n" % int((entry[1] - now) * 1000)
+        if name == b"SCRIPT" and args[0].upper() == b"LOAD":
+            if args[1] != CHECK_AND_INCREMENT_SCRIPT.encode():
+                return b"-ERR unsupported script\r\n"
+            self.scripts.add(CHECK_AND_INCREMENT_SHA.encode())
+            return b"$40\r\n%s\r\n" % CHECK_AND_INCREMENT_SHA.encode()
+        if name == b"EVALSHA":
+            if args[0] not in self.scripts:
+                return b"-NOSCRIPT No matching script. Please use EVAL.\r\n"
+            return self._check_and_increment(keys=args[2:4], argv=args[4:7])
+        if name == b"DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args)
+        return b"-ERR unknown command '%s'\r\n" % name
+
+    def _check_and_increment(self, *, keys: list[bytes], argv: list[bytes]) -> bytes:
+        for index, key in enumerate(keys):
+            self._run([b"PTTL", key])  # drops the key if it has expired
+            count = int(self.data.get(key, (b"0", None))[0])
+            if count >= int(argv[index]):
+                ttl = self._run([b"PTTL", key])
+                return b"*3\r\n:%d\r\n:%d\r\n%s" % (index + 1, count, ttl)
+        replies = []
+        for key in keys:
+            self._run([b"SET", key, b"0", b"EX", argv[2], b"NX"])
+            replies.append(self._run([b"INCR", key]))
+        return b"*3\r\n:0\r\n" + b"".join(replies)
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _read_command(rfile) -> list[bytes] | None:
+    line = rfile.readline()
+    if not line:
+        return None
+    count = int(line[1:-2])
+    command = []
+    for _ in range(count):
+        length = int(rfile.readline()[1:-2])
+        command.append(rfile.read(length + 2)[:-2])
+    return command
+
+
+@pytest.fixture
+def resp_server():
+    server = RESPStandIn()
+    yield server
+    server.close()
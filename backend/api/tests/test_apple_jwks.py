@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from offload_backend.apple_auth import AppleTokenValidationError, AppleTokenValidator
+from offload_backend.apple_jwks import AppleJWKSManager, UnknownSigningKeyError
+from offload_backend.config import get_settings
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def test_start_prefetches_keys_before_first_validation(apple_jwks_server):
+    validator = AppleTokenValidator(jwks_url=apple_jwks_server.url, audience="wc.Offload")
+
+    async def scenario() -> str:
+        assert validator.jwks.start() is True
+        try:
+            await validator.jwks.refresh()
+            requests_after_prefetch = apple_jwks_server.requests
+            sub = await validator.validate(apple_jwks_server.sign("apple-key-1"))
+            assert apple_jwks_server.requests == requests_after_prefetch
+            return sub
+        finally:
+            await validator.jwks.stop()
+
+    assert asyncio.run(scenario()) == "apple.sub.test"
+    assert not validator.jwks.is_stale
+
+
+def test_unknown_kid_refetch_is_shared_by_concurrent_callers(apple_jwks_server):
+    validator = AppleTokenValidator(jwks_url=apple_jwks_server.url, audience="wc.Offload")
+
+    async def scenario() -> list[str]:
+        await validator.jwks.refresh()
+        apple_jwks_server.add_key("apple-key-2")
+        apple_jwks_server.delay_seconds = 0.2
+        token = apple_jwks_server.sign("apple-key-2")
+        return await asyncio.gather(*(validator.validate(token) for _ in range(20)))
+
+    subs = asyncio.run(scenario())
+
+    assert subs == ["apple.sub.test"] * 20
+    assert apple_jwks_server.requests == 2
+    assert validator.jwks.fetch_count == 2
+
+
+def test_stale_keys_are_served_while_refresh_fails(apple_jwks_server):
+    clock = FakeClock()
+    manager = AppleJWKSManager(jwks_url=apple_jwks_server.url, ttl_seconds=10, clock=clock)
+
+    async def scenario() -> None:
+        await manager.refresh()
+        apple_jwks_server.status = 500
+        clock.now += 60
+        assert manager.is_stale
+
+        key = await manager.get_signing_key("apple-key-1")
+        assert key.key_id == "apple-key-1"
+        # The lookup kicked off a background refresh instead of waiting on it.
+        for _ in range(100):
+            if apple_jwks_server.requests == 2 and not manager._fetch_in_flight():
+                break
+            await asyncio.sleep(0.01)
+
+        key = await manager.get_signing_key("apple-key-1")
+        assert key.key_id == "apple-key-1"
+
+    asyncio.run(scenario())
+    assert apple_jwks_server.requests >= 2
+    assert manager.is_stale
+
+
+def test_unknown_kid_refetches_are_rate_limited(apple_jwks_server):
+    clock = FakeClock()
+    manager = AppleJWKSManager(
+        jwks_url=apple_jwks_server.url,
+        unknown_kid_cooldown_seconds=10,
+        clock=clock,
+    )
+
+    async def scenario() -> None:
+        await manager.refresh()
+        for _ in range(5):
+            with pytest.raises(UnknownSigningKeyError):
+                await manager.get_signing_key("forged-kid")
+        assert apple_jwks_server.requests == 2
+
+        clock.now += 11
+        with pytest.raises(UnknownSigningKeyError):
+            await manager.get_signing_key("forged-kid")
+        assert apple_jwks_server.requests == 3
+
+    asyncio.run(scenario())
+
+
+def test_validator_rejects_token_signed_with_unknown_kid(apple_jwks_server):
+    validator = AppleTokenValidator(jwks_url=apple_jwks_server.url, audience="wc.Offload")
+    apple_jwks_server.add_key("rotated-out")
+    token = apple_jwks_server.sign("rotated-out")
+    del apple_jwks_server.keys["rotated-out"]
+
+    with pytest.raises(AppleTokenValidationError, match="Invalid Apple identity token"):
+        asyncio.run(validator.validate(token))
+
+
+def test_validator_reports_unavailable_jwks(apple_jwks_server):
+    apple_jwks_server.status = 503
+    validator = AppleTokenValidator(jwks_url=apple_jwks_server.url, audience="wc.Offload")
+
+    with pytest.raises(AppleTokenValidationError, match="Apple signing keys unavailable"):
+        asyncio.run(validator.validate(apple_jwks_server.sign("apple-key-1")))
+
+
+def test_background_refresh_picks_up_rotated_keys(apple_jwks_server):
+    manager = AppleJWKSManager(jwks_url=apple_jwks_server.url, ttl_seconds=0.1)
+
+    async def scenario() -> None:
+        manager.start()
+        try:
+            await manager.refresh()
+            apple_jwks_server.add_key("apple-key-2")
+            for _ in range(100):
+                if "apple-key-2" in manager._keys:
+                    break
+                await asyncio.sleep(0.01)
+            key = await manager.get_signing_key("apple-key-2")
+            assert key.key_id == "apple-key-2"
+        finally:
+            await manager.stop()
+
+    asyncio.run(scenario())
+    # Found by the background refresh, not by an unknown-kid refetch.
+    assert manager._last_forced_fetch == -math.inf
+
+
+def test_sign_in_validates_against_local_jwks(apple_jwks_server):
+    from offload_backend.main import create_app
+
+    os.environ["OFFLOAD_APPLE_JWKS_URL"] = apple_jwks_server.url
+    get_settings.cache_clear()
+
+    with TestClient(create_app()) as client:
+        response = client.post(
+            "/v1/auth/apple",
+            json={
+                "apple_identity_token": apple_jwks_server.sign("apple-key-1"),
+                "install_id": "install-device-001",
+            },
+        )
+
+    assert response.status_code == 200
+    assert response.json()["user_id"]
+    assert apple_jwks_server.requests == 1
+
+
+def test_repeat_validation_is_served_from_token_cache(apple_jwks_server, monkeypatch):
+    validator = AppleTokenValidator(jwks_url=apple_jwks_server.url, audience="wc.Offload")
+    token = apple_jwks_server.sign("apple-key-1")
+
+    assert asyncio.run(validator.validate(token)) == "apple.sub.test"
+
+    def _no_decode(*args, **kwargs):
+        raise AssertionError("cached token was verified again")
+
+    monkeypatch.setattr("offload_backend.apple_auth.jwt.decode", _no_decode)
+    assert asyncio.run(validator.validate(token)) == "apple.sub.test"
+    assert validator.token_cache.hits == 1
+
+
+def test_cached_token_expires_with_its_exp_claim(apple_jwks_server):
+    clock = FakeClock()
+    clock.now = time.time()
+    validator = AppleTokenValidator(
+        jwks_url=apple_jwks_server.url, audience="wc.Offload", clock=clock
+    )
+    token = apple_jwks_server.sign("apple-key-1")
+    asyncio.run(validator.validate(token))
+
+    # The stand-in signs tokens valid for 600 seconds.
+    clock.now += 599
+    assert validator.token_cache.get(_digest(token)) == "apple.sub.test"
+    clock.now += 1
+    assert validator.token_cache.get(_digest(token)) is None
+
+
+def test_token_cache_is_bounded_and_skips_failures(apple_jwks_server):
+    validator = AppleTokenValidator(
+        jwks_url=apple_jwks_server.url, audience="wc.Offload", token_cache_max_entries=2
+    )
+
+    async def scenario() -> None:
+        for index in range(3):
+            await validator.validate(apple_jwks_server.sign("apple-key-1", sub=f"sub-{index}"))
+        with pytest.raises(AppleTokenValidationError):
+            await validator.validate(apple_jwks_server.sign("apple-key-1", audience="other"))
+
+    asyncio.run(scenario())
+    assert len(validator.token_cache) == 2
@@ -2,10 +2,13 @@ from conftest import FailureAIProvider, FakeAIProvider, TimeoutAIProvider
 
 from offload_backend.dependencies import (
     get_ai_inference_rate_limiter,
+    get_ai_token_budget,
     get_provider,
     get_usage_store,
 )
+from offload_backend.providers.base import ProviderUnavailable
 from offload_backend.session_rate_limiter import InMemorySessionRateLimiter
+from offload_backend.token_budget import TokenBudgetLimiter
 from offload_backend.usage_store import InMemoryUsageStore
 
 
@@ -90,6 +93,27 @@ def test_breakdown_provider_timeout_mapping(client, app, create_session_token):
     app.dependency_overrides.clear()
 
 
+def test_breakdown_provider_unavailable_sets_retry_after(client, app, create_session_token):
+    class UnavailableAIProvider:
+        async def generate_breakdown(self, **_):
+            raise ProviderUnavailable("provider overloaded")
+
+    app.dependency_overrides[get_provider] = lambda: UnavailableAIProvider()
+    token = create_session_token()
+
+    response = client.post(
+        "/v1/ai/breakdown/generate",
+        json={"input_text": "Clean the kitchen", "granularity": 2},
+        headers={"Authorization": f"Bearer {token}", "X-Offload-Cloud-Opt-In": "true"},
+    )
+
+    assert response.status_code == 503
+    assert response.json()["error"]["code"] == "provider_unavailable"
+    assert response.headers["Retry-After"] == "5"
+
+    app.dependency_overrides.clear()
+
+
 def test_breakdown_accepts_list_field_length_boundary(
     client,
     app,
@@ -294,20 +318,47 @@ def test_breakdown_rate_limit_throttles_excess_requests(
     token = create_session_token()
     headers = {"Authorization": f"Bearer {token}", "X-Offload-Cloud-Opt-In": "true"}
 
-    assert (
-        client.post(
-            "/v1/ai/breakdown/generate",
-            json=make_breakdown_payload(),
-            headers=headers,
-        ).status_code
-        == 200
+    allowed = client.post(
+        "/v1/ai/breakdown/generate",
+        json=make_breakdown_payload(),
+        headers=headers,
     )
+    assert allowed.status_code == 200
+    assert allowed.headers["X-RateLimit-Remaining"] == "0"
 
     response = client.post(
         "/v1/ai/breakdown/generate", json=make_breakdown_payload(), headers=headers
     )
     assert response.status_code == 429
     assert response.json()["error"]["code"] == "inference_rate_limited"
+    assert 59 <= int(response.headers["Retry-After"]) <= 60
+
+    app.dependency_overrides.clear()
+
+
+def test_breakdown_token_budget_throttles_and_reconciles(
+    client, app, create_session_token, make_breakdown_payload
+):
+    # The first estimate (input chars / 4 + 1024 output tokens) is clamped to
+    # the whole budget, then reconciled down to the 30 tokens the provider used.
+    budget = TokenBudgetLimiter(limit_per_install=1000, global_limit=0, window_seconds=60)
+    app.dependency_overrides[get_provider] = lambda: FakeAIProvider()
+    app.dependency_overrides[get_ai_token_budget] = lambda: budget
+    token = create_session_token()
+    headers = {"Authorization": f"Bearer {token}", "X-Offload-Cloud-Opt-In": "true"}
+
+    first = client.post(
+        "/v1/ai/breakdown/generate", json=make_breakdown_payload(), headers=headers
+    )
+    assert first.status_code == 200
+
+    # 30 tokens spent; a second full-size estimate no longer fits.
+    response = client.post(
+        "/v1/ai/breakdown/generate", json=make_breakdown_payload(), headers=headers
+    )
+    assert response.status_code == 429
+    assert response.json()["error"]["code"] == "token_budget_exceeded"
+    assert 1 <= int(response.headers["Retry-After"]) <= 2
 
     app.dependency_overrides.clear()
 
@@ -331,6 +382,8 @@ def test_breakdown_quota_exhausted_returns_429(
 
     assert response.status_code == 429
     assert response.json()["error"]["code"] == "quota_exceeded"
+    # Usage counts never reset, so there is no retry time to advertise.
+    assert "Retry-After" not in response.headers
 
     app.dependency_overrides.clear()
 
@@ -352,6 +405,7 @@ def test_breakdown_quota_not_exhausted_increments(
     )
 
     assert response.status_code == 200
+    assert response.headers["X-Quota-Remaining"] == "0"
     assert under_quota_store.get_total_count(
         install_id="install-12345", features=["breakdown", "braindump", "decide"]
     ) == 10
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from offload_backend.cache import TTLCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    cache: TTLCache[str, int] = TTLCache(max_entries=4, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_can_shorten_but_not_extend_lifetime():
+    clock = _Clock()
+    cache: TTLCache[str, int] = TTLCache(max_entries=4, ttl_seconds=5, clock=clock)
+    cache.set("short", 1, ttl_seconds=1)
+    cache.set("long", 2, ttl_seconds=60)
+    cache.set("expired", 3, ttl_seconds=0)
+
+    clock.now = 1.0
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    clock.now = 5.0
+    assert cache.get("long") is None
+    assert "expired" not in cache._entries
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache: TTLCache[str, int] = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_zero_ttl_disables_cache():
+    cache: TTLCache[str, int] = TTLCache(max_entries=2, ttl_seconds=0)
+    cache.set("a", 1)
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+
+
+def test_set_skips_values_computed_before_an_invalidation():
+    cache: TTLCache[str, int] = TTLCache(max_entries=2, ttl_seconds=60)
+    before = cache.generation("a")
+    cache.invalidate("a")
+    cache.set("a", 1, generation=before)
+    assert cache.get("a") is None
+
+    current = cache.generation("a")
+    cache.set("a", 2, generation=current)
+    assert cache.get("a") == 2
+
+    cleared = cache.generation("b")
+    cache.clear()
+    cache.set("b", 3, generation=cleared)
+    assert cache.get("b") is None
+
+
+def test_generations_stay_bounded_and_evictions_only_skip_sets():
+    cache: TTLCache[str, int] = TTLCache(max_entries=2, ttl_seconds=60)
+    before = cache.generation("a")
+    cache.invalidate("a")
+    cache.invalidate("b")
+    cache.invalidate("c")
+
+    assert len(cache._generations) == 2
+    # "a" was pushed out, but its invalidation still rejects the stale value.
+    cache.set("a", 1, generation=before)
+    assert cache.get("a") is None
@@ -79,3 +79,30 @@ def test_production_rejects_weak_signing_keys(monkeypatch):
 
     with pytest.raises(ValidationError, match="OFFLOAD_SESSION_SIGNING_KEYS"):
         Settings()
+
+
+def test_production_disables_metrics_unless_enabled_with_a_token(monkeypatch):
+    monkeypatch.setenv("OFFLOAD_ENVIRONMENT", "production")
+    monkeypatch.setenv("OFFLOAD_SESSION_SECRET", "m6vJ3f7KpQ9xT2sN8wL4cR1yH5uE0aZd")
+
+    assert Settings().metrics_enabled is False
+
+    monkeypatch.setenv("OFFLOAD_METRICS_ENABLED", "true")
+    with pytest.raises(ValidationError, match="OFFLOAD_METRICS_BEARER_TOKEN must be set"):
+        Settings()
+
+    monkeypatch.setenv("OFFLOAD_METRICS_BEARER_TOKEN", "scrape")
+    with pytest.raises(ValidationError, match="OFFLOAD_METRICS_BEARER_TOKEN is too weak"):
+        Settings()
+
+    monkeypatch.setenv("OFFLOAD_METRICS_BEARER_TOKEN", "Q8rT1vY6nB3kW9zE4hM7pL2sD5fG0jXc")
+    assert Settings().metrics_enabled is True
+
+
+def test_production_rejects_weak_admin_api_token(monkeypatch):
+    monkeypatch.setenv("OFFLOAD_ENVIRONMENT", "production")
+    monkeypatch.setenv("OFFLOAD_SESSION_SECRET", "m6vJ3f7KpQ9xT2sN8wL4cR1yH5uE0aZd")
+    monkeypatch.setenv("OFFLOAD_ADMIN_API_TOKEN", "admin")
+
+    with pytest.raises(ValidationError, match="OFFLOAD_ADMIN_API_TOKEN"):
+        Settings()
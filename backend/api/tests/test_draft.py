@@ -28,6 +28,9 @@ def test_draft_communication_success(client, app, create_session_token):
     assert body["usage"]["input_tokens"] == 30
     assert body["usage"]["output_tokens"] == 50
     assert body["latency_ms"] >= 0
+    # Drafts do not count toward the AI quota (10 in the test env).
+    assert response.headers["X-Quota-Remaining"] == "10"
+    assert int(response.headers["X-RateLimit-Remaining"]) >= 0
 
     app.dependency_overrides.clear()
 
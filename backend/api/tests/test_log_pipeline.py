@@ -0,0 +1,112 @@
+import asyncio
+import io
+import json
+import logging
+import threading
+
+from fastapi.testclient import TestClient
+
+from offload_backend.config import get_settings
+from offload_backend.log_pipeline import LogPipeline
+
+LOGGER_NAME = "offload_backend.test_log_pipeline"
+
+
+class _BlockingStream(io.StringIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text: str) -> int:
+        self.release.wait(timeout=5)
+        return super().write(text)
+
+
+def _lines(stream: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_written_as_json_lines_with_extras():
+    stream = io.StringIO()
+    pipeline = LogPipeline(logger_name=LOGGER_NAME, stream=stream)
+    logger = logging.getLogger(LOGGER_NAME)
+    assert pipeline.start()
+    assert not pipeline.start()
+
+    logger.info("usage_compacted", extra={"events": 3, "install_id_hash": "abc"})
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        logger.exception("unhandled_exception", extra={"request_id": "req-1"})
+    asyncio.run(pipeline.stop())
+
+    compacted, failure = _lines(stream)
+    assert compacted["event"] == "usage_compacted"
+    assert compacted["level"] == "INFO"
+    assert compacted["logger"] == LOGGER_NAME
+    assert compacted["events"] == 3
+    assert compacted["install_id_hash"] == "abc"
+    assert failure["request_id"] == "req-1"
+    assert "RuntimeError: boom" in failure["exc_info"]
+    # The logger is handed back as it was.
+    assert logger.propagate
+    assert not logger.handlers
+
+
+def test_sampling_applies_per_event_below_warning():
+    stream = io.StringIO()
+    draws = iter([0.7, 0.2])
+    pipeline = LogPipeline(
+        logger_name=LOGGER_NAME,
+        stream=stream,
+        sample_rates={"request_complete": 0.5},
+        rng=lambda: next(draws),
+    )
+    logger = logging.getLogger(LOGGER_NAME)
+    pipeline.start()
+
+    logger.info("request_complete", extra={"status_code": 200})
+    logger.info("request_complete", extra={"status_code": 201})
+    logger.warning("request_complete", extra={"status_code": 503})
+    logger.info("usage_compacted")
+    asyncio.run(pipeline.stop())
+
+    kept = _lines(stream)
+    assert [line.get("status_code") for line in kept] == [201, 503, None]
+    assert kept[0]["sample_rate"] == 0.5
+    assert "sample_rate" not in kept[1]
+    assert pipeline.metrics()["sampled_out"] == 1
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    stream = _BlockingStream()
+    pipeline = LogPipeline(logger_name=LOGGER_NAME, stream=stream, queue_max_size=1)
+    logger = logging.getLogger(LOGGER_NAME)
+    pipeline.start()
+
+    for index in range(10):
+        logger.info("ai_inference_throttled", extra={"index": index})
+    metrics = pipeline.metrics()
+    stream.release.set()
+    asyncio.run(pipeline.stop())
+
+    assert metrics["dropped"] >= 8
+    assert metrics["enqueued"] + metrics["dropped"] == 10
+    assert len(_lines(stream)) == metrics["enqueued"]
+
+
+def test_app_lifespan_runs_pipeline(monkeypatch):
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_LOG_PIPELINE_ENABLED", "true")
+    monkeypatch.setenv("OFFLOAD_LOG_SAMPLE_RATES", '{"request_complete": 0}')
+    get_settings.cache_clear()
+    app = create_app()
+    logger = logging.getLogger("offload_backend")
+
+    with TestClient(app) as client:
+        assert not logger.propagate
+        client.get("/v1/health")
+
+    assert logger.propagate
+    assert app.state.log_pipeline.metrics()["sampled_out"] == 1
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+
+import httpx
+import pytest
+from conftest import FakeAIProvider
+
+from offload_backend.config import Settings, get_settings
+from offload_backend.dependencies import get_ai_inference_rate_limiter, get_provider
+from offload_backend.metrics import (
+    AI_TOKENS,
+    HTTP_REQUEST_DURATION,
+    PROVIDER_ATTEMPT_DURATION,
+    PROVIDER_RETRIES,
+    RATE_LIMIT_REJECTIONS,
+    SQLITE_CHECKPOINT,
+    SQLITE_LOCK_WAIT,
+    SQLITE_QUERY,
+    MetricsRegistry,
+)
+from offload_backend.providers.openai_adapter import OpenAIProviderAdapter
+from offload_backend.session_rate_limiter import InMemorySessionRateLimiter
+from offload_backend.sqlite_connections import SQLiteConnectionManager
+
+
+def test_counter_sums_increments_from_every_thread():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_events_total", "Events.", ("kind",))
+
+    def work() -> None:
+        for _ in range(1000):
+            counter.inc(("a",))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(("b",), 2.5)
+
+    assert counter.value(("a",)) == 4000
+    assert registry.render().splitlines() == [
+        "# HELP test_events_total Events.",
+        "# TYPE test_events_total counter",
+        'test_events_total{kind="a"} 4000',
+        'test_events_total{kind="b"} 2.5',
+    ]
+
+
+def test_histogram_renders_cumulative_buckets_and_escapes_labels():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Latency.", ("path",), buckets=(0.1, 1.0))
+    labels = ('a"b\\c',)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, labels)
+
+    assert histogram.count(labels) == 4
+    assert registry.render().splitlines()[2:] == [
+        'test_seconds_bucket{path="a\\"b\\\\c",le="0.1"} 2',
+        'test_seconds_bucket{path="a\\"b\\\\c",le="1"} 3',
+        'test_seconds_bucket{path="a\\"b\\\\c",le="+Inf"} 4',
+        'test_seconds_sum{path="a\\"b\\\\c"} 3.65',
+        'test_seconds_count{path="a\\"b\\\\c"} 4',
+    ]
+
+
+def test_metrics_endpoint_reports_route_latency_and_tokens(
+    client, app, create_session_token, make_breakdown_payload
+):
+    app.dependency_overrides[get_provider] = lambda: FakeAIProvider()
+    route_labels = ("POST", "/v1/ai/breakdown/generate", "200")
+    requests_before = HTTP_REQUEST_DURATION.count(route_labels)
+    output_tokens_before = AI_TOKENS.value(("breakdown", "output"))
+    token = create_session_token()
+
+    response = client.post(
+        "/v1/ai/breakdown/generate",
+        json=make_breakdown_payload(),
+        headers={"Authorization": f"Bearer {token}", "X-Offload-Cloud-Opt-In": "true"},
+    )
+    assert response.status_code == 200
+    client.get("/v1/no-such-route")
+    scrape = client.get("/metrics")
+
+    assert scrape.status_code == 200
+    assert scrape.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert HTTP_REQUEST_DURATION.count(route_labels) == requests_before + 1
+    assert AI_TOKENS.value(("breakdown", "output")) == output_tokens_before + 20
+    body = scrape.text
+    assert "# TYPE offload_http_request_duration_seconds histogram" in body
+    assert 'route="<unmatched>",status="404"' in body
+    assert 'offload_rate_limiter_tracked_keys{limiter="session_issuance"}' in body
+    assert "offload_log_pipeline" not in body
+
+    app.dependency_overrides.clear()
+
+
+def test_rate_limit_rejections_are_counted_by_dimension(
+    client, app, create_session_token, make_breakdown_payload
+):
+    app.dependency_overrides[get_provider] = lambda: FakeAIProvider()
+    tight_limiter = InMemorySessionRateLimiter(
+        limit_per_install=1, limit_per_ip=1000, window_seconds=60
+    )
+    app.dependency_overrides[get_ai_inference_rate_limiter] = lambda: tight_limiter
+    before = RATE_LIMIT_REJECTIONS.value(("ai_inference", "install_id"))
+    token = create_session_token()
+    headers = {"Authorization": f"Bearer {token}", "X-Offload-Cloud-Opt-In": "true"}
+
+    responses = [
+        client.post("/v1/ai/breakdown/generate", json=make_breakdown_payload(), headers=headers)
+        for _ in range(2)
+    ]
+
+    assert [response.status_code for response in responses] == [200, 429]
+    assert RATE_LIMIT_REJECTIONS.value(("ai_inference", "install_id")) == before + 1
+
+    app.dependency_overrides.clear()
+
+
+def test_provider_attempts_and_retries_are_recorded():
+    calls = {"count": 0}
+
+    async def no_sleep(delay: float) -> None:
+        _ = delay
+
+    async def flaky_executor(url, payload, headers, timeout):
+        _ = (payload, headers, timeout)
+        calls["count"] += 1
+        request = httpx.Request("POST", url)
+        if calls["count"] == 1:
+            return httpx.Response(503, json={}, request=request)
+        content = '{"draft_text": "Hi", "channel": "email"}'
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": content}}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 4},
+            },
+            request=request,
+        )
+
+    adapter = OpenAIProviderAdapter(
+        settings=Settings(session_secret="test-secret", openai_api_key="test-key"),
+        request_executor=flaky_executor,
+        sleep_fn=no_sleep,
+    )
+    server_errors = PROVIDER_ATTEMPT_DURATION.count(("openai", "draft", "server_error"))
+    successes = PROVIDER_ATTEMPT_DURATION.count(("openai", "draft", "ok"))
+    retries = PROVIDER_RETRIES.value(("openai", "draft"))
+
+    asyncio.run(
+        adapter.draft_communication(
+            input_text="Say hi", channel="email", contact_name=None, context_hints=[]
+        )
+    )
+
+    assert PROVIDER_ATTEMPT_DURATION.count(("openai", "draft", "server_error")) == server_errors + 1
+    assert PROVIDER_ATTEMPT_DURATION.count(("openai", "draft", "ok")) == successes + 1
+    assert PROVIDER_RETRIES.value(("openai", "draft")) == retries + 1
+
+
+def test_sqlite_lock_wait_and_query_time_are_recorded(tmp_path):
+    manager = SQLiteConnectionManager(db_path=str(tmp_path / "metrics.db"))
+    try:
+        with manager.writer() as connection:
+            connection.execute("CREATE TABLE t (x INTEGER)")
+        with manager.reader() as connection:
+            connection.execute("SELECT * FROM t").fetchall()
+    finally:
+        manager.close()
+
+    assert SQLITE_LOCK_WAIT.count(("metrics.db", "writer")) >= 1
+    assert SQLITE_QUERY.count(("metrics.db", "reader")) == 1
+
+
+def test_sqlite_maintenance_is_exported(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_SQLITE_WAL_TRUNCATE_BYTES", "0")
+    get_settings.cache_clear()
+    app = create_app()
+    database = os.path.basename(get_settings().usage_db_path)
+    before = SQLITE_CHECKPOINT.count((database, "TRUNCATE"))
+
+    with TestClient(app) as client:
+        app.state.stores.sqlite_maintenance.run_once()
+        body = client.get("/metrics").text
+
+    assert SQLITE_CHECKPOINT.count((database, "TRUNCATE")) > before
+    assert "# TYPE offload_sqlite_checkpoint_seconds histogram" in body
+    assert "# TYPE offload_sqlite_wal_size_bytes gauge" in body
+    assert 'offload_sqlite_checkpoints_total{mode="TRUNCATE"}' in body
+    assert "offload_sqlite_checkpoints_busy_total 0" in body
+    assert "offload_sqlite_incremental_vacuums_total" in body
+
+
+@pytest.mark.parametrize(
+    ("env", "headers", "status_code"),
+    [
+        ({"OFFLOAD_METRICS_ENABLED": "false"}, {}, 404),
+        ({"OFFLOAD_METRICS_BEARER_TOKEN": "scrape-token"}, {}, 401),
+        (
+            {"OFFLOAD_METRICS_BEARER_TOKEN": "scrape-token"},
+            {"Authorization": "Bearer wrong"},
+            401,
+        ),
+        (
+            {"OFFLOAD_METRICS_BEARER_TOKEN": "scrape-token"},
+            {"Authorization": "Bearer scrape-token"},
+            200,
+        ),
+    ],
+)
+def test_metrics_endpoint_access(monkeypatch, env, headers, status_code):
+    from fastapi.testclient import TestClient
+
+    from offload_backend.main import create_app
+
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    get_settings.cache_clear()
+
+    with TestClient(create_app()) as client:
+        assert client.get("/metrics", headers=headers).status_code == status_code
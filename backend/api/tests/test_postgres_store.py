@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+
+import pytest
+from pydantic import ValidationError
+
+from offload_backend.config import Settings
+from offload_backend.postgres_store import PostgresStorage, PostgresUsageStore, PostgresUserStore
+
+
+@pytest.fixture
+def storage(postgres_standin_pool):
+    async def _factory():
+        return postgres_standin_pool
+
+    s = PostgresStorage(_factory)
+    yield s
+    s.close()
+
+
+def test_reconcile_keeps_server_side_max(storage):
+    store = PostgresUsageStore(storage=storage)
+
+    assert store.reconcile(install_id="inst-1", feature="breakdown", local_count=4) == 4
+    assert store.reconcile(install_id="inst-1", feature="breakdown", local_count=2) == 4
+    assert store.dump() == {("inst-1", "breakdown"): 4}
+    store.close()
+
+
+def test_batched_increments_are_visible_before_flush(storage, postgres_standin_pool):
+    # A long interval and large batch keep every increment in the buffer.
+    store = PostgresUsageStore(storage=storage, write_batch_size=1000, flush_interval_seconds=60)
+    acquires_before = postgres_standin_pool.acquire_count
+
+    for _ in range(5):
+        store.increment(install_id="inst-1", feature="breakdown")
+
+    assert postgres_standin_pool.acquire_count == acquires_before
+    assert store.get_total_count(install_id="inst-1", features=["breakdown", "decide"]) == 5
+    store.close()
+
+    reopened = PostgresUsageStore(storage=storage)
+    assert reopened.dump() == {("inst-1", "breakdown"): 5}
+    reopened.close()
+
+
+def test_reads_do_not_wait_for_a_flush_in_progress(storage, postgres_standin_pool):
+    store = PostgresUsageStore(storage=storage, write_batch_size=1000, flush_interval_seconds=60)
+    for _ in range(3):
+        store.increment(install_id="inst-1", feature="breakdown")
+    hold_writes = asyncio.Event()
+    postgres_standin_pool.hold_writes = hold_writes
+    storage.submit(store.aflush())
+    assert postgres_standin_pool.writes_held.wait(timeout=5)
+
+    # The batch is mid-flush: counted from the buffer, not yet in the table.
+    assert store.get_total_count(install_id="inst-1", features=["breakdown"]) == 3
+    (record,) = store.get_summary(install_id="inst-1").records
+    assert record.count == 3
+
+    postgres_standin_pool.hold_writes = None
+    storage.loop.call_soon_threadsafe(hold_writes.set)
+    assert store.dump() == {("inst-1", "breakdown"): 3}
+    assert store.get_total_count(install_id="inst-1", features=["breakdown"]) == 3
+    store.close()
+
+
+def test_increment_flushes_when_batch_is_full(storage):
+    store = PostgresUsageStore(storage=storage, write_batch_size=2, flush_interval_seconds=60)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(
+            pool.map(
+                lambda i: store.increment(install_id=f"inst-{i % 3}", feature="breakdown"),
+                range(30),
+            )
+        )
+
+    assert sum(store.dump().values()) == 30
+    assert store.get_total_count(install_id="inst-0", features=["breakdown"]) == 10
+    store.close()
+
+
+def test_reconcile_includes_pending_increments(storage):
+    store = PostgresUsageStore(storage=storage, write_batch_size=1000, flush_interval_seconds=60)
+    store.increment(install_id="inst-1", feature="breakdown")
+    store.increment(install_id="inst-1", feature="breakdown")
+
+    assert store.reconcile(install_id="inst-1", feature="breakdown", local_count=1) == 2
+    store.close()
+
+
+def test_reconcile_many_reports_only_changed_counters_since(storage):
+    store = PostgresUsageStore(storage=storage)
+    store.reconcile_many(install_id="inst-1", local_counts={"breakdown": 3, "decide": 1})
+    checkpoint = datetime.now(UTC)
+
+    changed = store.reconcile_many(
+        install_id="inst-1",
+        local_counts={"breakdown": 2, "decide": 5},
+        since=checkpoint,
+    )
+    store.increment(install_id="inst-1", feature="draft")
+    raised_elsewhere = store.reconcile_many(
+        install_id="inst-1", local_counts={"decide": 4}, since=checkpoint
+    )
+
+    # decide now equals what the client sent, so it is not echoed back.
+    assert changed == []
+    assert [(r.feature, r.count) for r in raised_elsewhere] == [("decide", 5), ("draft", 1)]
+    assert store.dump() == {
+        ("inst-1", "breakdown"): 3,
+        ("inst-1", "decide"): 5,
+        ("inst-1", "draft"): 1,
+    }
+    store.close()
+
+
+def test_summary_includes_pending_increments(storage):
+    store = PostgresUsageStore(storage=storage, write_batch_size=1000, flush_interval_seconds=60)
+    store.reconcile(install_id="inst-1", feature="breakdown", local_count=2)
+    before = store.get_summary(install_id="inst-1")
+    store.increment(install_id="inst-1", feature="breakdown")
+    store.increment(install_id="inst-1", feature="decide")
+
+    after = store.get_summary(install_id="inst-1")
+
+    assert [(r.feature, r.count) for r in after.records] == [("breakdown", 3), ("decide", 1)]
+    assert after.etag != before.etag
+    store.close()
+
+
+def test_iter_usage_uses_keyset_pages(storage):
+    store = PostgresUsageStore(storage=storage, write_batch_size=1000, flush_interval_seconds=60)
+    for i in range(5):
+        store.increment(install_id=f"inst-{i}", feature="breakdown")
+
+    records = list(store.iter_usage(page_size=2))
+
+    assert [r.install_id for r in records] == [f"inst-{i}" for i in range(5)]
+    assert all(r.count == 1 and r.updated_at for r in records)
+    store.close()
+
+
+def test_user_store_upsert_matches_sqlite_semantics(storage):
+    store = PostgresUserStore(storage=storage)
+
+    first = store.upsert_by_apple_id(
+        apple_user_id="apple.1", install_id="install-a", display_name="Alice"
+    )
+    second = store.upsert_by_apple_id(
+        apple_user_id="apple.1", install_id="install-b", display_name=None
+    )
+
+    assert first.user_id == second.user_id
+    assert second.install_id == "install-b"
+    assert second.display_name == "Alice"
+    assert store.get_by_apple_id("apple.1") == second
+    assert store.get_by_apple_id("missing") is None
+
+
+def test_postgres_backend_requires_dsn(monkeypatch):
+    monkeypatch.setenv("OFFLOAD_STORAGE_BACKEND", "postgres")
+    monkeypatch.delenv("OFFLOAD_POSTGRES_DSN", raising=False)
+
+    with pytest.raises(ValidationError, match="OFFLOAD_POSTGRES_DSN"):
+        Settings()
+
+
+def test_app_uses_postgres_stores_when_selected(monkeypatch, postgres_standin_pool):
+    from offload_backend import storage as storage_module
+    from offload_backend.config import get_settings
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_STORAGE_BACKEND", "postgres")
+    monkeypatch.setenv("OFFLOAD_POSTGRES_DSN", "postgresql://localhost/offload")
+    get_settings.cache_clear()
+
+    async def _factory():
+        return postgres_standin_pool
+
+    monkeypatch.setattr(storage_module, "asyncpg_pool_factory", lambda **_: _factory)
+    app = create_app()
+
+    assert isinstance(app.state.usage_store, PostgresUsageStore)
+    assert isinstance(app.state.user_store, PostgresUserStore)
+    app.state.stores.close()
+    assert postgres_standin_pool.closed
@@ -0,0 +1,52 @@
+import os
+import time
+
+import pytest
+
+from offload_backend.postgres_store import PostgresStorage, PostgresUsageStore
+from offload_backend.usage_store import SQLiteUsageStore
+
+OPERATIONS = 2000
+
+
+def _ops_per_second(store) -> tuple[float, float]:
+    started_at = time.perf_counter()
+    for i in range(OPERATIONS):
+        store.increment(install_id=f"install-{i % 200}", feature="breakdown")
+    increments = OPERATIONS / (time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    for i in range(OPERATIONS):
+        store.get_total_count(install_id=f"install-{i % 200}", features=["breakdown", "decide"])
+    reads = OPERATIONS / (time.perf_counter() - started_at)
+    return increments, reads
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    bool(os.environ.get('CI')) and not os.environ.get('OFFLOAD_RUN_BENCHMARKS'),
+    reason='Skipped in CI unless OFFLOAD_RUN_BENCHMARKS=1',
+)
+def test_postgres_store_vs_sqlite_throughput(tmp_path, postgres_standin_pool):
+    """Compare SQLite against the batched PostgreSQL store on the local stand-in."""
+
+    sqlite_store = SQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"))
+    sqlite_rates = _ops_per_second(sqlite_store)
+    sqlite_store.close()
+
+    async def _factory():
+        return postgres_standin_pool
+
+    storage = PostgresStorage(_factory)
+    postgres_store = PostgresUsageStore(storage=storage)
+    postgres_rates = _ops_per_second(postgres_store)
+    assert sum(postgres_store.dump().values()) == OPERATIONS
+    postgres_store.close()
+    storage.close()
+
+    print(f'\n--- Usage store ops/sec ({OPERATIONS} each) ---')
+    print(f'  sqlite:   increment {sqlite_rates[0]:,.0f}/s, read {sqlite_rates[1]:,.0f}/s')
+    print(f'  postgres: increment {postgres_rates[0]:,.0f}/s, read {postgres_rates[1]:,.0f}/s')
+    print('  (postgres figures use the in-process stand-in; no network round trips)')
+
+    assert all(rate > 0 for rate in (*sqlite_rates, *postgres_rates))
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import threading
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from offload_backend.config import get_settings
+from offload_backend.dependencies import enforce_ai_inference_rate_limit
+from offload_backend.redis_rate_limiter import (
+    RedisSessionRateLimiter,
+    RESPConnectionPool,
+    RESPError,
+    RESPUnavailableError,
+)
+from offload_backend.session_rate_limiter import SessionRateLimitExceeded
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _limiter(pool: RESPConnectionPool, **overrides) -> RedisSessionRateLimiter:
+    return RedisSessionRateLimiter(
+        pool=pool,
+        namespace=overrides.pop("namespace", "test"),
+        limit_per_ip=overrides.pop("limit_per_ip", 1000),
+        limit_per_install=overrides.pop("limit_per_install", 2),
+        window_seconds=60,
+        **overrides,
+    )
+
+
+def _unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_check_is_one_atomic_script_call(resp_server):
+    pool = RESPConnectionPool(url=resp_server.url)
+    limiter = _limiter(pool)
+
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    # The script body is only sent when the server does not know it.
+    assert resp_server.commands == [b"EVALSHA", b"SCRIPT", b"EVALSHA"]
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    assert resp_server.commands[3:] == [b"EVALSHA"]
+
+    # Both keys share the namespace hash tag, so they map to one cluster slot.
+    assert set(resp_server.data) == {
+        b"offload:ratelimit:{test}:ip:203.0.113.1",
+        b"offload:ratelimit:{test}:install:install-a",
+    }
+    assert resp_server.data[b"offload:ratelimit:{test}:install:install-a"][0] == b"2"
+    pool.close()
+
+
+def test_script_is_reloaded_after_the_store_forgets_it(resp_server):
+    pool = RESPConnectionPool(url=resp_server.url)
+    limiter = _limiter(pool)
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+
+    resp_server.scripts.clear()
+    assert limiter.check(client_ip="203.0.113.1", install_id="install-a") == 0
+
+    assert resp_server.commands.count(b"SCRIPT") == 2
+    assert limiter.fallback_checks == 0
+    pool.close()
+
+
+def test_limits_are_shared_across_limiters(resp_server):
+    pool = RESPConnectionPool(url=resp_server.url)
+    first, second = _limiter(pool), _limiter(pool)
+
+    assert first.check(client_ip="203.0.113.1", install_id="install-a") == 1
+    assert second.check(client_ip="203.0.113.2", install_id="install-a") == 0
+    with pytest.raises(SessionRateLimitExceeded) as excinfo:
+        first.check(client_ip="203.0.113.3", install_id="install-a")
+
+    assert excinfo.value.dimension == "install_id"
+    assert 59 <= excinfo.value.retry_after_seconds <= 60
+    assert first.fallback_checks == second.fallback_checks == 0
+    pool.close()
+
+
+def test_ip_dimension_is_checked_in_the_same_round_trip(resp_server):
+    pool = RESPConnectionPool(url=resp_server.url)
+    limiter = _limiter(pool, limit_per_ip=1, limit_per_install=100)
+
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    with pytest.raises(SessionRateLimitExceeded) as excinfo:
+        limiter.check(client_ip="203.0.113.1", install_id="install-b")
+
+    assert excinfo.value.dimension == "ip"
+    assert resp_server.commands.count(b"EVALSHA") == 3
+    # The IP rejection consumed nothing from install-b's window.
+    assert b"offload:ratelimit:{test}:install:install-b" not in resp_server.data
+    pool.close()
+
+
+def test_pool_reuses_connections_and_passes_error_replies(resp_server):
+    pool = RESPConnectionPool(url=resp_server.url, max_connections=1)
+
+    assert pool.pipeline(("PING",)) == [b"PONG"]
+    replies = pool.pipeline(("SET", "k", "v"), ("GET", "k"), ("NOPE",))
+    assert replies[:2] == [b"OK", b"v"]
+    assert isinstance(replies[2], RESPError)
+    assert pool._open == 1
+    pool.close()
+
+
+def test_exhausted_pool_times_out(resp_server):
+    pool = RESPConnectionPool(url=resp_server.url, max_connections=1, timeout_seconds=0.05)
+    held = pool._acquire()
+    with pytest.raises(RESPUnavailableError):
+        pool.pipeline(("PING",))
+    pool._release(held)
+    assert pool.pipeline(("PING",)) == [b"PONG"]
+    pool.close()
+
+
+def test_unreachable_store_fails_open_to_local_limits():
+    clock = _Clock()
+    pool = RESPConnectionPool(url=f"redis://127.0.0.1:{_unused_port()}/0", timeout_seconds=0.05)
+    limiter = _limiter(pool, clock=clock)
+
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    assert limiter.fallback_active
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    with pytest.raises(SessionRateLimitExceeded):
+        limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    assert limiter.fallback_checks == 3
+
+    clock.now += 5
+    assert not limiter.fallback_active
+
+
+def test_store_outage_fails_open_and_store_is_retried(resp_server):
+    clock = _Clock()
+    pool = RESPConnectionPool(url=resp_server.url, timeout_seconds=0.05)
+    limiter = _limiter(pool, clock=clock)
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+
+    resp_server.close()
+    pool.close()
+    limiter.check(client_ip="203.0.113.1", install_id="install-b")
+    assert limiter.fallback_active
+
+    clock.now += 5
+    limiter.check(client_ip="203.0.113.1", install_id="install-c")
+    assert limiter.fallback_checks == 2
+
+
+def test_app_uses_redis_limiter_when_configured(resp_server):
+    from offload_backend.main import create_app
+
+    os.environ["OFFLOAD_RATE_LIMIT_REDIS_URL"] = resp_server.url
+    os.environ["OFFLOAD_SESSION_ISSUE_LIMIT_PER_INSTALL"] = "1"
+    get_settings.cache_clear()
+    try:
+        statuses = []
+        with TestClient(create_app()) as first, TestClient(create_app()) as second:
+            for client in (first, second):
+                response = client.post(
+                    "/v1/sessions/anonymous",
+                    json={"install_id": "install-12345", "app_version": "1.0", "platform": "ios"},
+                )
+                statuses.append(response.status_code)
+    finally:
+        del os.environ["OFFLOAD_RATE_LIMIT_REDIS_URL"]
+        del os.environ["OFFLOAD_SESSION_ISSUE_LIMIT_PER_INSTALL"]
+
+    assert statuses == [200, 429]
+    assert b"offload:ratelimit:{session_rate_limiter}:install:install-12345" in resp_server.data
+
+
+def test_ai_inference_check_runs_off_the_event_loop(resp_server):
+    check_threads = []
+
+    class RecordingLimiter(RedisSessionRateLimiter):
+        def check(self, *, client_ip: str, install_id: str) -> int:
+            check_threads.append(threading.get_ident())
+            return super().check(client_ip=client_ip, install_id=install_id)
+
+    pool = RESPConnectionPool(url=resp_server.url)
+    limiter = RecordingLimiter(
+        pool=pool, namespace="test", limit_per_ip=1000, limit_per_install=2, window_seconds=60
+    )
+    request = Request(
+        {"type": "http", "method": "POST", "path": "/", "headers": [], "client": ("1.2.3.4", 1)}
+    )
+
+    async def run() -> int:
+        return await enforce_ai_inference_rate_limit(
+            install_id="install-a", request=request, limiter=limiter
+        )
+
+    assert asyncio.run(run()) == 1
+    assert check_threads and check_threads[0] != threading.get_ident()
+    pool.close()
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+import uuid
+
+import httpx
+import pytest
+from fastapi import Request
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+REQUESTS = 3000
+
+
+async def _legacy_request_context(request: Request, call_next):
+    # The @app.middleware("http") implementation this middleware replaced.
+    request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
+    request.state.request_id = request_id
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    _ = int((time.perf_counter() - started_at) * 1000)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+def _requests_per_second(app) -> float:
+    async def run() -> float:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/v1/health")
+            started_at = time.perf_counter()
+            for _ in range(REQUESTS):
+                response = await client.get("/v1/health")
+                assert "X-Request-ID" in response.headers
+            return REQUESTS / (time.perf_counter() - started_at)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    bool(os.environ.get('CI')) and not os.environ.get('OFFLOAD_RUN_BENCHMARKS'),
+    reason='Skipped in CI unless OFFLOAD_RUN_BENCHMARKS=1',
+)
+def test_request_context_middleware_health_throughput():
+    """Report /v1/health requests/sec with the pure ASGI vs BaseHTTPMiddleware context."""
+    from offload_backend.main import create_app
+
+    asgi_app = create_app()
+    legacy_app = create_app()
+    legacy_app.user_middleware = [
+        Middleware(BaseHTTPMiddleware, dispatch=_legacy_request_context)
+    ]
+
+    results = {
+        "base_http_middleware": _requests_per_second(legacy_app),
+        "pure_asgi": _requests_per_second(asgi_app),
+    }
+
+    print(f'\n--- /v1/health requests/sec ({REQUESTS} sequential requests) ---')
+    for name, rate in results.items():
+        print(f'  {name}: {rate:,.0f}/s')
+
+    assert all(rate > 0 for rate in results.values())
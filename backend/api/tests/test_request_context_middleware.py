@@ -0,0 +1,96 @@
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from offload_backend.middleware import RequestContextMiddleware
+
+
+def test_request_id_is_echoed_from_client(client):
+    response = client.get("/v1/health", headers={"X-Request-ID": "req-abc-123"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "req-abc-123"
+
+
+def test_request_id_is_generated_and_matches_error_envelope(client):
+    response = client.get("/v1/usage/summary")
+
+    assert response.status_code == 401
+    request_id = response.headers["X-Request-ID"]
+    assert len(request_id) == 36
+    assert response.json()["error"]["request_id"] == request_id
+
+
+def test_request_complete_is_logged_with_status_and_latency(client, caplog):
+    with caplog.at_level(logging.INFO, logger="offload_backend"):
+        client.get("/v1/health", headers={"X-Request-ID": "req-log"})
+
+    (record,) = [r for r in caplog.records if r.getMessage() == "request_complete"]
+    assert record.request_id == "req-log"
+    assert record.method == "GET"
+    assert record.path == "/v1/health"
+    assert record.status_code == 200
+    assert record.latency_ms >= 0
+
+
+def test_streaming_response_is_not_buffered():
+    second_chunk_sent = asyncio.Event()
+    chunks_seen_before_release: list[bytes] = []
+
+    async def events():
+        yield b"data: one\n\n"
+        second_chunk_sent.set()
+        yield b"data: two\n\n"
+
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/events")
+    async def stream_events():
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    messages: list[dict] = []
+
+    async def scenario() -> None:
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.body" and not second_chunk_sent.is_set():
+                chunks_seen_before_release.append(message["body"])
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/events",
+            "raw_path": b"/events",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"x-request-id", b"req-stream")],
+            "client": ("127.0.0.1", 1234),
+            "server": ("testserver", 80),
+        }
+        await app(scope, receive, send)
+
+    asyncio.run(scenario())
+
+    start = messages[0]
+    assert start["type"] == "http.response.start"
+    assert (b"x-request-id", b"req-stream") in start["headers"]
+    # The first event reached the client before the generator produced the second.
+    assert chunks_seen_before_release == [b"data: one\n\n"]
+
+
+def test_lifespan_scope_passes_through():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    with TestClient(app):
+        pass
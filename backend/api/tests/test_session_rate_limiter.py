@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from offload_backend.session_rate_limiter import (
+    GCRASessionRateLimiter,
+    InMemorySessionRateLimiter,
+    SessionRateLimitExceeded,
+)
+
+
+class _ManualClock:
+    def __init__(self) -> None:
+        self._now = datetime(2026, 2, 16, 12, 0, tzinfo=UTC)
+
+    def now(self) -> datetime:
+        return self._now
+
+    def advance(self, *, seconds: float) -> None:
+        self._now += timedelta(seconds=seconds)
+
+
+def _limiter(clock: _ManualClock, **overrides) -> InMemorySessionRateLimiter:
+    options = {"limit_per_ip": 1000, "limit_per_install": 2, "window_seconds": 60}
+    options.update(overrides)
+    return InMemorySessionRateLimiter(now_provider=clock.now, **options)
+
+
+def test_expired_windows_are_dropped():
+    clock = _ManualClock()
+    limiter = _limiter(clock)
+    for index in range(50):
+        limiter.check(client_ip=f"198.51.100.{index}", install_id=f"install-{index}")
+    assert limiter.tracked_keys == 100
+
+    clock.advance(seconds=61)
+    limiter.check(client_ip="203.0.113.1", install_id="install-fresh")
+    clock.advance(seconds=60)
+    limiter.check(client_ip="203.0.113.1", install_id="install-fresh")
+
+    assert limiter.tracked_keys == 2
+
+
+def test_active_window_survives_generation_rotation():
+    clock = _ManualClock()
+    limiter = _limiter(clock)
+    clock.advance(seconds=59)
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+
+    # The generation rotates at 60s but install-a's window runs until 119s.
+    clock.advance(seconds=59)
+    with pytest.raises(SessionRateLimitExceeded) as excinfo:
+        limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    assert excinfo.value.dimension == "install_id"
+
+    clock.advance(seconds=1)
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+
+
+def test_tracked_keys_are_capped_by_evicting_oldest():
+    clock = _ManualClock()
+    limiter = _limiter(clock, max_tracked_keys=3)
+    for index in range(10):
+        limiter.check(client_ip="203.0.113.1", install_id=f"install-{index}")
+
+    assert limiter.tracked_keys == 4  # one IP plus three installs
+    assert limiter.evictions == 7
+    # The survivors are the newest installs; their counts are intact.
+    limiter.check(client_ip="203.0.113.1", install_id="install-9")
+    with pytest.raises(SessionRateLimitExceeded):
+        limiter.check(client_ip="203.0.113.1", install_id="install-9")
+
+
+class _MonotonicClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_gcra_allows_burst_then_spaces_requests():
+    clock = _MonotonicClock()
+    limiter = GCRASessionRateLimiter(
+        limit_per_ip=1000, limit_per_install=4, window_seconds=60, clock=clock
+    )
+    remaining = [limiter.check(client_ip="203.0.113.1", install_id="install-a") for _ in range(4)]
+    assert remaining == [3, 2, 1, 0]
+
+    with pytest.raises(SessionRateLimitExceeded) as excinfo:
+        limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    assert excinfo.value.dimension == "install_id"
+    assert excinfo.value.retry_after_seconds == 15
+
+    clock.now += 14.5
+    with pytest.raises(SessionRateLimitExceeded) as excinfo:
+        limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    assert excinfo.value.retry_after_seconds == 1
+
+    clock.now += 0.5
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+
+
+@pytest.mark.parametrize("start", [0.0, 100.0, 1_760_000_000.0])
+def test_gcra_burst_admits_exactly_the_limit_despite_float_rounding(start):
+    clock = _MonotonicClock()
+    clock.now = start
+    limiter = GCRASessionRateLimiter(
+        limit_per_ip=7, limit_per_install=1000, window_seconds=60, clock=clock
+    )
+
+    remaining = [limiter.check(client_ip="203.0.113.1", install_id="install-a") for _ in range(7)]
+
+    assert remaining == [6, 5, 4, 3, 2, 1, 0]
+    with pytest.raises(SessionRateLimitExceeded):
+        limiter.check(client_ip="203.0.113.1", install_id="install-b")
+
+
+def test_gcra_has_no_boundary_burst():
+    clock = _MonotonicClock()
+    gcra = GCRASessionRateLimiter(
+        limit_per_ip=1000, limit_per_install=4, window_seconds=60, clock=clock
+    )
+    fixed_clock = _ManualClock()
+    fixed = _limiter(fixed_clock, limit_per_install=4)
+
+    def _allowed(limiter, attempts: int) -> int:
+        allowed = 0
+        for _ in range(attempts):
+            try:
+                limiter.check(client_ip="203.0.113.1", install_id="install-a")
+                allowed += 1
+            except SessionRateLimitExceeded:
+                pass
+        return allowed
+
+    # One request opens the window; then hammer either side of its end.
+    assert _allowed(gcra, 1) == _allowed(fixed, 1) == 1
+    clock.now += 59
+    fixed_clock.advance(seconds=59)
+    burst = {"gcra": _allowed(gcra, 8), "fixed": _allowed(fixed, 8)}
+    clock.now += 1
+    fixed_clock.advance(seconds=1)
+    burst["gcra"] += _allowed(gcra, 8)
+    burst["fixed"] += _allowed(fixed, 8)
+
+    assert burst == {"gcra": 4, "fixed": 7}
+
+
+def test_gcra_rejection_consumes_nothing():
+    clock = _MonotonicClock()
+    limiter = GCRASessionRateLimiter(
+        limit_per_ip=2, limit_per_install=1, window_seconds=60, clock=clock
+    )
+    limiter.check(client_ip="203.0.113.1", install_id="install-a")
+    with pytest.raises(SessionRateLimitExceeded):
+        limiter.check(client_ip="203.0.113.1", install_id="install-a")
+
+    # The rejected install-a request did not spend the IP's second slot.
+    limiter.check(client_ip="203.0.113.1", install_id="install-b")
+
+
+def test_gcra_state_expires_and_is_capped():
+    clock = _MonotonicClock()
+    limiter = GCRASessionRateLimiter(
+        limit_per_ip=1000, limit_per_install=2, window_seconds=60, max_tracked_keys=5, clock=clock
+    )
+    for index in range(8):
+        limiter.check(client_ip="203.0.113.1", install_id=f"install-{index}")
+    assert limiter.tracked_keys == 6
+    assert limiter.evictions == 3
+
+    clock.now += 121
+    limiter.check(client_ip="203.0.113.2", install_id="install-fresh")
+    assert limiter.tracked_keys == 2
@@ -0,0 +1,60 @@
+import os
+import time
+
+import pytest
+
+from offload_backend.session_rate_limiter import (
+    GCRASessionRateLimiter,
+    InMemorySessionRateLimiter,
+    SessionRateLimitExceeded,
+)
+from offload_backend.shared_rate_limiter import SharedGCRASessionRateLimiter
+
+CHECKS = 200_000
+KEYS = 1000
+
+
+def _checks_per_second(limiter) -> float:
+    keys = [(f"198.51.100.{i % 250}", f"install-{i}") for i in range(KEYS)]
+    started_at = time.perf_counter()
+    for i in range(CHECKS):
+        client_ip, install_id = keys[i % KEYS]
+        try:
+            limiter.check(client_ip=client_ip, install_id=install_id)
+        except SessionRateLimitExceeded:
+            pass
+    return CHECKS / (time.perf_counter() - started_at)
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    bool(os.environ.get('CI')) and not os.environ.get('OFFLOAD_RUN_BENCHMARKS'),
+    reason='Skipped in CI unless OFFLOAD_RUN_BENCHMARKS=1',
+)
+def test_session_rate_limiter_check_throughput(tmp_path):
+    """Report check() calls/sec for the fixed-window, GCRA and shared GCRA limiters."""
+
+    results = {
+        name: _checks_per_second(
+            limiter_class(limit_per_ip=1_000_000, limit_per_install=100, window_seconds=60)
+        )
+        for name, limiter_class in (
+            ("fixed_window", InMemorySessionRateLimiter),
+            ("gcra", GCRASessionRateLimiter),
+        )
+    }
+    shared = SharedGCRASessionRateLimiter(
+        path=str(tmp_path / "ratelimit.bin"),
+        namespace="benchmark",
+        limit_per_ip=1_000_000,
+        limit_per_install=100,
+        window_seconds=60,
+    )
+    results["shared_gcra"] = _checks_per_second(shared)
+    shared.close()
+
+    print(f'\n--- Rate limiter checks/sec ({CHECKS} checks over {KEYS} installs) ---')
+    for name, rate in results.items():
+        print(f'  {name}: {rate:,.0f}/s')
+
+    assert all(rate > 0 for rate in results.values())
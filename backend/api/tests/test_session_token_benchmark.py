@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+from offload_backend.security import SessionClaims, TokenFormat, TokenManager
+
+OPERATIONS = 50_000
+
+
+def _per_second(operation, items: list) -> float:
+    started_at = time.perf_counter()
+    for i in range(OPERATIONS):
+        operation(items[i % len(items)])
+    return OPERATIONS / (time.perf_counter() - started_at)
+
+
+def _manager(*, decode_cache_max_entries: int, token_format: TokenFormat = "v2") -> TokenManager:
+    return TokenManager(
+        secret="benchmark-secret-with-enough-entropy-123",
+        decode_cache_max_entries=decode_cache_max_entries,
+        token_format=token_format,
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    bool(os.environ.get('CI')) and not os.environ.get('OFFLOAD_RUN_BENCHMARKS'),
+    reason='Skipped in CI unless OFFLOAD_RUN_BENCHMARKS=1',
+)
+def test_session_token_decode_throughput():
+    """Report decode() calls/sec with the verified-token cache hitting, missing and off."""
+
+    issuer = _manager(decode_cache_max_entries=0)
+    tokens = [
+        issuer.encode(issuer.issue_session(install_id=f"install-{i}", ttl_seconds=3600))
+        for i in range(1000)
+    ]
+
+    results = {
+        "cache_hit": _per_second(_manager(decode_cache_max_entries=len(tokens)).decode, tokens),
+        # Fewer slots than tokens, cycled in order: every lookup misses and evicts.
+        "cache_miss": _per_second(
+            _manager(decode_cache_max_entries=len(tokens) // 2).decode, tokens
+        ),
+        "cache_disabled": _per_second(_manager(decode_cache_max_entries=0).decode, tokens),
+    }
+
+    print(f'\n--- Session token decodes/sec ({OPERATIONS} decodes over {len(tokens)} tokens) ---')
+    for name, rate in results.items():
+        print(f'  {name}: {rate:,.0f}/s')
+
+    assert all(rate > 0 for rate in results.values())
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    bool(os.environ.get('CI')) and not os.environ.get('OFFLOAD_RUN_BENCHMARKS'),
+    reason='Skipped in CI unless OFFLOAD_RUN_BENCHMARKS=1',
+)
+def test_session_token_format_throughput():
+    """Report uncached encode()/decode() calls/sec and token length for v2 and v3."""
+
+    results = {}
+    for token_format in ("v2", "v3"):
+        manager = _manager(decode_cache_max_entries=0, token_format=token_format)
+        claims: list[SessionClaims] = [
+            manager.issue_session(
+                install_id=f"install-{i:08d}", ttl_seconds=3600, user_id=f"user-{i:08d}"
+            )
+            for i in range(1000)
+        ]
+        tokens = [manager.encode(c) for c in claims]
+        results[token_format] = (
+            _per_second(manager.encode, claims),
+            _per_second(manager.decode, tokens),
+            len(tokens[0]),
+        )
+
+    print(f'\n--- Session token formats ({OPERATIONS} operations, cache off) ---')
+    for token_format, (encodes, decodes, length) in results.items():
+        print(
+            f'  {token_format}: encode {encodes:,.0f}/s, decode {decodes:,.0f}/s, '
+            f'{length} chars'
+        )
+
+    assert results["v3"][2] < results["v2"][2]
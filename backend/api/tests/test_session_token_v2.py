@@ -6,8 +6,16 @@ from collections.abc import Mapping
 from datetime import UTC, datetime, timedelta
 
 import pytest
+from fastapi.testclient import TestClient
 
-from offload_backend.security import ExpiredTokenError, SessionClaims, TokenManager
+from offload_backend.config import get_settings
+from offload_backend.security import (
+    ExpiredTokenError,
+    InvalidTokenError,
+    SessionClaims,
+    TokenFormat,
+    TokenManager,
+)
 
 REQUIRED_V2_CLAIMS = {"v", "kid", "iat", "nbf", "iss", "aud", "exp", "install_id"}
 
@@ -113,6 +121,7 @@ def test_token_manager_issue_session_uses_injected_clock():
     assert claims == SessionClaims(
         install_id="install-12345",
         expires_at=datetime(2026, 2, 16, 12, 2, tzinfo=UTC),
+        auth_time=datetime(2026, 2, 16, 12, 0, tzinfo=UTC),
     )
 
 
@@ -135,3 +144,196 @@ def test_token_manager_decode_uses_injected_clock_for_expiry():
     clock.advance(seconds=2)
     with pytest.raises(ExpiredTokenError):
         manager.decode(token)
+
+
+def _manager(
+    clock: _ManualClock,
+    *,
+    decode_cache_max_entries: int = 10000,
+    token_format: TokenFormat = "v2",
+    audience: str = "offload-ios-test",
+) -> TokenManager:
+    return TokenManager(
+        secret="test-secret",
+        issuer="offload-backend-test",
+        audience=audience,
+        active_kid="test-kid",
+        now_provider=clock.now,
+        decode_cache_max_entries=decode_cache_max_entries,
+        token_format=token_format,
+    )
+
+
+def test_token_manager_decode_cache_hit_skips_verification_but_rechecks_expiry():
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock)
+    token = manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=60))
+
+    first = manager.decode(token)
+    assert manager.decode(token) == first
+    assert manager.decode_cache.hits == 1
+    assert len(manager.decode_cache) == 1
+
+    clock.advance(seconds=60)
+    with pytest.raises(ExpiredTokenError):
+        manager.decode(token)
+    assert len(manager.decode_cache) == 0
+
+
+def test_token_manager_decode_cache_ignores_invalid_tokens():
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock)
+    token = manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=60))
+    payload_segment, _ = token.split(".", maxsplit=1)
+    forged = f"{payload_segment}.{_urlsafe_b64encode(b'0' * 32)}"
+
+    for _ in range(2):
+        with pytest.raises(InvalidTokenError):
+            manager.decode(forged)
+    assert len(manager.decode_cache) == 0
+
+
+def test_token_manager_decode_cache_is_bounded():
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock, decode_cache_max_entries=2)
+    for index in range(5):
+        claims = manager.issue_session(install_id=f"install-{index}", ttl_seconds=60)
+        manager.decode(manager.encode(claims))
+    assert len(manager.decode_cache) == 2
+
+
+def test_token_manager_decode_cache_can_be_disabled():
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock, decode_cache_max_entries=0)
+    token = manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=60))
+    manager.decode(token)
+    manager.decode(token)
+    assert len(manager.decode_cache) == 0
+
+
+def test_token_manager_key_rotation_invalidates_decode_cache():
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock)
+    token = manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=60))
+    manager.decode(token)
+
+    manager.rotate_signing_keys(
+        secret="test-secret",
+        active_kid="next-kid",
+        signing_keys={"next-kid": "next-secret"},
+    )
+
+    with pytest.raises(InvalidTokenError):
+        manager.decode(token)
+    rotated = manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=60))
+    assert manager.decode(rotated).install_id == "install-12345"
+
+
+def test_decode_racing_a_key_rotation_is_not_served_from_cache(monkeypatch):
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock)
+    token = manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=60))
+    verify = manager._decode_v2
+
+    def verify_then_rotate(token: str, *, now: datetime) -> SessionClaims:
+        claims = verify(token, now=now)
+        # Keys rotate after verification, before the result is cached.
+        manager.rotate_signing_keys(
+            secret="test-secret",
+            active_kid="next-kid",
+            signing_keys={"next-kid": "next-secret"},
+        )
+        return claims
+
+    monkeypatch.setattr(manager, "_decode_v2", verify_then_rotate)
+    manager.decode(token)
+    monkeypatch.setattr(manager, "_decode_v2", verify)
+
+    assert len(manager.decode_cache) == 1
+    with pytest.raises(InvalidTokenError):
+        manager.decode(token)
+
+
+def test_v3_token_round_trips_and_is_shorter_than_v2():
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    v2 = _manager(clock, decode_cache_max_entries=0)
+    v3 = _manager(clock, decode_cache_max_entries=0, token_format="v3")
+    claims = v3.issue_session(
+        install_id="install-12345", ttl_seconds=60, user_id="6f1c2d4e-user"
+    )
+
+    token = v3.encode(claims)
+
+    assert "." not in token
+    assert len(token) < len(v2.encode(claims)) / 2
+    assert v3.decode(token) == claims
+    # Both formats are accepted whichever one is issued.
+    assert v2.decode(token) == claims
+    assert v3.decode(v2.encode(claims)) == claims
+    anonymous = v3.issue_session(install_id="install-12345", ttl_seconds=60)
+    assert v3.decode(v3.encode(anonymous)).user_id is None
+
+
+@pytest.mark.parametrize("token_format", ["v2", "v3"])
+def test_refreshed_tokens_carry_auth_time_and_age_out(token_format):
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock, decode_cache_max_entries=0, token_format=token_format)
+    first = manager.decode(
+        manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=3600))
+    )
+
+    clock.advance(seconds=3000)
+    refreshed = manager.encode(
+        manager.issue_session(
+            install_id="install-12345", ttl_seconds=3600, auth_time=first.auth_time
+        )
+    )
+
+    assert first.auth_time == datetime(2026, 2, 16, 12, 0, tzinfo=UTC)
+    assert manager.decode(refreshed).auth_time == first.auth_time
+    assert manager.decode(refreshed, max_session_age_seconds=3001).auth_time == first.auth_time
+    with pytest.raises(ExpiredTokenError, match="maximum age"):
+        manager.decode(refreshed, max_session_age_seconds=3000)
+
+
+def test_v3_token_rejects_tampering_and_foreign_audience():
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock, decode_cache_max_entries=0, token_format="v3")
+    token = manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=60))
+    raw = bytearray(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    raw[-20] ^= 0x01  # last byte of install_id
+
+    with pytest.raises(InvalidTokenError, match="signature"):
+        manager.decode(_urlsafe_b64encode(bytes(raw)))
+    with pytest.raises(InvalidTokenError, match="signature"):
+        _manager(clock, token_format="v3", audience="other-audience").decode(token)
+    with pytest.raises(InvalidTokenError):
+        manager.decode(token[:10])
+
+
+def test_v3_token_expires_with_injected_clock():
+    clock = _ManualClock(start=datetime(2026, 2, 16, 12, 0, tzinfo=UTC))
+    manager = _manager(clock, decode_cache_max_entries=0, token_format="v3")
+    token = manager.encode(manager.issue_session(install_id="install-12345", ttl_seconds=60))
+
+    clock.advance(seconds=60)
+    with pytest.raises(ExpiredTokenError):
+        manager.decode(token)
+
+
+def test_v3_format_authenticates_requests(monkeypatch):
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_SESSION_TOKEN_FORMAT", "v3")
+    get_settings.cache_clear()
+
+    with TestClient(create_app()) as client:
+        session = client.post(
+            "/v1/sessions/anonymous",
+            json={"install_id": "install-12345", "app_version": "1.0", "platform": "ios"},
+        )
+        token = session.json()["session_token"]
+        usage = client.get("/v1/usage/summary", headers={"Authorization": f"Bearer {token}"})
+
+    assert "." not in token
+    assert usage.status_code == 200
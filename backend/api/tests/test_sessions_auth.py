@@ -1,11 +1,14 @@
 import base64
 import hashlib
 import hmac
+import os
 from datetime import UTC, datetime, timedelta
 
 import pytest
 
+from offload_backend.config import get_settings
 from offload_backend.dependencies import get_session_rate_limiter
+from offload_backend.security import SessionClaims, TokenManager
 from offload_backend.session_rate_limiter import InMemorySessionRateLimiter
 
 
@@ -119,6 +122,8 @@ def test_anonymous_session_rate_limit_resets_after_window(client, app):
         }
     }
 
+    assert blocked.headers["Retry-After"] == "60"
+
     clock.advance(seconds=61)
     reset = _create_anonymous_session(client, install_id="install-12345", ip="203.0.113.10")
     assert reset.status_code == 200
@@ -202,3 +207,103 @@ def test_valid_token_allows_protected_endpoint(create_session_token, post_usage_
 
     assert response.status_code == 200
     assert response.json()["server_count"] == 3
+
+
+def _session_token(*, expires_at: datetime, user_id: str | None = None) -> str:
+    manager = TokenManager(
+        secret=os.environ["OFFLOAD_SESSION_SECRET"],
+        issuer=os.environ["OFFLOAD_SESSION_TOKEN_ISSUER"],
+        audience=os.environ["OFFLOAD_SESSION_TOKEN_AUDIENCE"],
+        active_kid=os.environ["OFFLOAD_SESSION_TOKEN_ACTIVE_KID"],
+        now_provider=lambda: expires_at - timedelta(seconds=120),
+    )
+    claims = SessionClaims(install_id="install-12345", expires_at=expires_at, user_id=user_id)
+    return manager.encode(claims)
+
+
+def _refresh(client, token: str | None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return client.post("/v1/sessions/refresh", headers=headers)
+
+
+def test_session_refresh_skips_the_issuance_rate_limiter(client, app, create_session_token):
+    limiter = InMemorySessionRateLimiter(limit_per_ip=100, limit_per_install=1, window_seconds=60)
+    app.dependency_overrides[get_session_rate_limiter] = lambda: limiter
+    token = create_session_token()
+
+    statuses = []
+    for _ in range(3):
+        response = _refresh(client, token)
+        statuses.append(response.status_code)
+        token = response.json().get("session_token", token)
+
+    assert statuses == [200, 200, 200]
+    assert limiter.tracked_keys == 2
+    usage = client.get("/v1/usage/summary", headers={"Authorization": f"Bearer {token}"})
+    assert usage.status_code == 200
+
+    app.dependency_overrides.clear()
+
+
+def test_session_refresh_rejects_chains_past_max_age(client):
+    expires_at = datetime.now(UTC) + timedelta(minutes=30)
+    manager = TokenManager(
+        secret=os.environ["OFFLOAD_SESSION_SECRET"],
+        issuer=os.environ["OFFLOAD_SESSION_TOKEN_ISSUER"],
+        audience=os.environ["OFFLOAD_SESSION_TOKEN_AUDIENCE"],
+        active_kid=os.environ["OFFLOAD_SESSION_TOKEN_ACTIVE_KID"],
+    )
+    claims = SessionClaims(
+        install_id="install-12345",
+        expires_at=expires_at,
+        auth_time=datetime.now(UTC) - timedelta(days=31),
+    )
+
+    response = _refresh(client, manager.encode(claims))
+
+    assert response.status_code == 401
+    assert response.json()["error"]["code"] == "expired_token"
+
+
+def test_session_refresh_accepts_recently_expired_token_and_keeps_user(client):
+    token = _session_token(
+        expires_at=datetime.now(UTC) - timedelta(seconds=300), user_id="user-abc"
+    )
+    # Protected endpoints still reject it.
+    usage = client.get("/v1/usage/summary", headers={"Authorization": f"Bearer {token}"})
+    assert usage.status_code == 401
+
+    response = _refresh(client, token)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["user_id"] == "user-abc"
+    assert datetime.fromisoformat(body["expires_at"]) > datetime.now(UTC)
+
+
+def test_session_refresh_rejects_tokens_past_grace_window(client):
+    expired = _session_token(expires_at=datetime.now(UTC) - timedelta(hours=2))
+
+    response = _refresh(client, expired)
+
+    assert response.status_code == 401
+    assert response.json()["error"]["code"] == "expired_token"
+    assert _refresh(client, None).json()["error"]["code"] == "unauthorized"
+    assert _refresh(client, f"{expired}x").json()["error"]["code"] == "invalid_token"
+
+
+def test_reloaded_signing_keys_rotate_the_shared_token_manager(
+    client, create_session_token, monkeypatch
+):
+    token = create_session_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/v1/usage/summary", headers=headers).status_code == 200
+
+    monkeypatch.setenv("OFFLOAD_SESSION_SECRET", "next-test-secret")
+    get_settings.cache_clear()
+    response = client.get("/v1/usage/summary", headers=headers)
+
+    # The verification cached under the old key is no longer served.
+    assert response.status_code == 401
+    assert response.json()["error"]["code"] == "invalid_token"
+    get_settings.cache_clear()
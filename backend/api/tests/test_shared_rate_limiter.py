@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from offload_backend.config import get_settings
+from offload_backend.session_rate_limiter import SessionRateLimitExceeded
+from offload_backend.shared_rate_limiter import SharedGCRASessionRateLimiter
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _limiter(path: str, **overrides) -> SharedGCRASessionRateLimiter:
+    options: dict[str, Any] = {
+        "path": path,
+        "namespace": "test",
+        "limit_per_ip": 1000,
+        "limit_per_install": 3,
+        "window_seconds": 60,
+    }
+    options.update(overrides)
+    return SharedGCRASessionRateLimiter(**options)
+
+
+def _allowed(limiter: SharedGCRASessionRateLimiter, attempts: int, install_id: str) -> int:
+    allowed = 0
+    for _ in range(attempts):
+        try:
+            limiter.check(client_ip="203.0.113.1", install_id=install_id)
+            allowed += 1
+        except SessionRateLimitExceeded:
+            pass
+    return allowed
+
+
+def _worker(path: str, results) -> None:
+    limiter = _limiter(path)
+    results.put(_allowed(limiter, 10, "install-shared"))
+    limiter.close()
+
+
+def test_instances_on_one_file_share_limits(tmp_path):
+    path = str(tmp_path / "ratelimit.bin")
+    first, second = _limiter(path), _limiter(path)
+
+    assert first.check(client_ip="203.0.113.1", install_id="install-a") == 2
+    assert second.check(client_ip="203.0.113.1", install_id="install-a") == 1
+    assert _allowed(second, 5, "install-a") == 1
+    with pytest.raises(SessionRateLimitExceeded) as excinfo:
+        first.check(client_ip="203.0.113.1", install_id="install-a")
+    assert excinfo.value.retry_after_seconds == 20
+    assert not first.fallback_active
+    first.close()
+    second.close()
+
+
+def test_worker_processes_share_limits(tmp_path):
+    path = str(tmp_path / "ratelimit.bin")
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_worker, args=(path, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=10)
+
+    assert sum(results.get(timeout=1) for _ in workers) == 3
+
+
+def test_burst_admits_exactly_the_limit_despite_float_rounding(tmp_path):
+    limiter = _limiter(
+        str(tmp_path / "ratelimit.bin"), limit_per_ip=7, limit_per_install=1000, clock=_Clock()
+    )
+
+    assert _allowed(limiter, 8, "install-a") == 7
+    limiter.close()
+
+
+def test_namespaces_are_independent(tmp_path):
+    path = str(tmp_path / "ratelimit.bin")
+    sessions = _limiter(path, namespace="session_rate_limiter")
+    inference = _limiter(path, namespace="ai_inference_rate_limiter")
+
+    assert _allowed(sessions, 5, "install-a") == 3
+    assert _allowed(inference, 5, "install-a") == 3
+
+
+def test_expired_entries_are_reused_and_full_probe_window_evicts(tmp_path):
+    clock = _Clock()
+    limiter = _limiter(str(tmp_path / "ratelimit.bin"), slots=8, clock=clock)
+
+    for index in range(6):
+        limiter.check(client_ip="203.0.113.1", install_id=f"install-{index}")
+    assert limiter.tracked_keys == 7
+    assert limiter.evictions == 0
+
+    limiter.check(client_ip="203.0.113.1", install_id="install-6")
+    limiter.check(client_ip="203.0.113.1", install_id="install-7")
+    assert limiter.tracked_keys == 8
+    assert limiter.evictions == 1
+
+    clock.now += 61
+    limiter.check(client_ip="203.0.113.2", install_id="install-fresh")
+    assert limiter.tracked_keys == 2
+    assert limiter.evictions == 1
+
+
+def test_unavailable_shared_table_falls_back_to_local_limits(tmp_path):
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    limiter = _limiter(str(blocker / "ratelimit.bin"))
+
+    assert limiter.fallback_active
+    assert _allowed(limiter, 5, "install-a") == 3
+
+
+def test_mismatched_table_is_left_alone_and_limits_fall_back(tmp_path):
+    path = tmp_path / "ratelimit.bin"
+    in_use = _limiter(str(path), slots=8)
+    in_use.check(client_ip="203.0.113.1", install_id="install-a")
+    size = path.stat().st_size
+
+    resized = _limiter(str(path), slots=16)
+
+    assert resized.fallback_active
+    assert _allowed(resized, 5, "install-b") == 3
+    # The first limiter's mapping is intact and still shared.
+    assert path.stat().st_size == size
+    assert in_use.tracked_keys == 2
+    in_use.close()
+    resized.close()
+
+
+def test_app_workers_share_session_issuance_limits(tmp_path):
+    from offload_backend.main import create_app
+
+    os.environ["OFFLOAD_RATE_LIMIT_SHARED_PATH"] = str(tmp_path / "ratelimit.bin")
+    os.environ["OFFLOAD_SESSION_ISSUE_LIMIT_PER_INSTALL"] = "2"
+    get_settings.cache_clear()
+    try:
+        statuses = []
+        with TestClient(create_app()) as first, TestClient(create_app()) as second:
+            for client in (first, second, first):
+                response = client.post(
+                    "/v1/sessions/anonymous",
+                    json={"install_id": "install-12345", "app_version": "1.0", "platform": "ios"},
+                )
+                statuses.append(response.status_code)
+    finally:
+        del os.environ["OFFLOAD_RATE_LIMIT_SHARED_PATH"]
+        del os.environ["OFFLOAD_SESSION_ISSUE_LIMIT_PER_INSTALL"]
+
+    assert statuses == [200, 200, 429]
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from offload_backend.admin_cli import main as admin_main
+from offload_backend.sqlite_backup import (
+    BackupInProgressError,
+    SQLiteBackupRunner,
+    backup_database,
+)
+from offload_backend.sqlite_connections import SQLiteConnectionManager
+from offload_backend.usage_store import SQLiteUsageStore
+
+
+@pytest.fixture
+def manager(tmp_path):
+    m = SQLiteConnectionManager(db_path=str(tmp_path / "usage.sqlite3"))
+    with m.writer() as connection:
+        connection.execute("CREATE TABLE blobs (id INTEGER PRIMARY KEY, body BLOB)")
+        connection.executemany(
+            "INSERT INTO blobs (body) VALUES (?)", [(b"x" * 2048,) for _ in range(100)]
+        )
+        connection.commit()
+    yield m
+    m.close()
+
+
+def _row_count(path) -> int:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_backup_releases_writer_lock_between_steps(manager, tmp_path):
+    steps: list[tuple[int, int]] = []
+
+    def _write_during_backup(copied: int, total: int) -> None:
+        steps.append((copied, total))
+        if len(steps) == 1:
+            # Only possible if the lock was released; the write lands in the copy.
+            with manager.writer() as connection:
+                connection.execute("INSERT INTO blobs (body) VALUES (x'00')")
+                connection.commit()
+
+    target = sqlite3.connect(tmp_path / "copy.sqlite3")
+    manager.backup(target, pages_per_step=5, progress=_write_during_backup)
+    target.close()
+
+    assert len(steps) > 1
+    assert steps[-1][0] == steps[-1][1]
+    assert _row_count(tmp_path / "copy.sqlite3") == 101
+
+
+def test_backup_database_reports_throughput(manager, tmp_path):
+    destination = tmp_path / "backups" / "usage.snapshot.sqlite3"
+    destination.parent.mkdir()
+
+    report = backup_database(manager, str(destination), pages_per_step=8)
+
+    assert report.pages > 0
+    assert report.size_bytes == destination.stat().st_size
+    assert report.pages_per_second > 0
+    assert not (tmp_path / "backups" / "usage.snapshot.sqlite3.partial").exists()
+    assert _row_count(destination) == 100
+
+
+def test_runner_keeps_newest_snapshots_per_database(manager, tmp_path):
+    backup_dir = tmp_path / "backups"
+    backup_dir.mkdir()
+    for stamp in ("20250101T000000Z", "20250102T000000Z", "20250103T000000Z"):
+        (backup_dir / f"usage.{stamp}.sqlite3").write_bytes(b"")
+    other = backup_dir / "usage.shard-0-of-2.20250101T000000Z.sqlite3"
+    other.write_bytes(b"")
+    runner = SQLiteBackupRunner([manager], directory=str(backup_dir), retain=2)
+
+    reports = runner.run()
+
+    kept = sorted(p.name for p in backup_dir.glob("usage.2*.sqlite3"))
+    assert kept == ["usage.20250103T000000Z.sqlite3", reports[0].destination.rsplit("/", 1)[1]]
+    assert other.exists()
+    assert runner.last_reports == reports
+
+
+def test_back_to_back_runs_write_distinct_snapshots(manager, tmp_path):
+    runner = SQLiteBackupRunner([manager], directory=str(tmp_path), retain=3)
+
+    destinations = {runner.run()[0].destination for _ in range(3)}
+
+    assert len(destinations) == 3
+    assert sorted(p.name for p in tmp_path.glob("usage.*.sqlite3")) == sorted(
+        destination.rsplit("/", 1)[1] for destination in destinations
+    )
+
+
+def test_runner_rejects_overlapping_runs(manager, tmp_path):
+    runner = SQLiteBackupRunner([manager], directory=str(tmp_path))
+    runner._running.acquire()
+    try:
+        with pytest.raises(BackupInProgressError):
+            runner.run()
+    finally:
+        runner._running.release()
+
+
+def test_admin_backup_endpoint_requires_configured_token(client):
+    response = client.post("/v1/admin/backups", headers={"X-Offload-Admin-Token": "anything"})
+
+    assert response.status_code == 404
+
+
+def test_admin_backup_endpoint_runs_backup(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+
+    from offload_backend.config import get_settings
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_ADMIN_API_TOKEN", "admin-token-for-tests")
+    monkeypatch.setenv("OFFLOAD_SQLITE_BACKUP_DIR", str(tmp_path / "backups"))
+    get_settings.cache_clear()
+    app = create_app()
+    app.state.usage_store.increment(install_id="inst-1", feature="breakdown")
+
+    with TestClient(app) as client:
+        denied = client.post("/v1/admin/backups", headers={"X-Offload-Admin-Token": "wrong"})
+        response = client.post(
+            "/v1/admin/backups", headers={"X-Offload-Admin-Token": "admin-token-for-tests"}
+        )
+
+    assert denied.status_code == 401
+    assert response.status_code == 200
+    [backup] = response.json()["backups"]
+    assert backup["pages"] > 0
+    restored = SQLiteUsageStore(db_path=backup["destination"])
+    assert restored.dump() == {("inst-1", "breakdown"): 1}
+    restored.close()
+
+
+def test_admin_cli_backup_usage(tmp_path, capsys):
+    from offload_backend.config import get_settings
+
+    store = SQLiteUsageStore(db_path=get_settings().usage_db_path)
+    store.increment(install_id="inst-1", feature="decide")
+    store.close()
+
+    assert admin_main(["backup-usage", "--output-dir", str(tmp_path / "out")]) == 0
+
+    [snapshot] = (tmp_path / "out").glob("usage.*.sqlite3")
+    restored = SQLiteUsageStore(db_path=str(snapshot))
+    assert restored.dump() == {("inst-1", "decide"): 1}
+    restored.close()
+    assert "backed up" in capsys.readouterr().err
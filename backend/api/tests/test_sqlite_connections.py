@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+import pytest
+
+from offload_backend.sqlite_connections import SQLiteConnectionManager, SQLitePragmas
+from offload_backend.usage_store import SQLiteUsageStore
+from offload_backend.user_store import SQLiteUserStore
+
+
+@pytest.fixture
+def manager(tmp_path):
+    m = SQLiteConnectionManager(
+        db_path=str(tmp_path / "usage.sqlite3"),
+        reader_pool_size=2,
+        pragmas=SQLitePragmas(cache_size_kib=4096, mmap_size_bytes=1 << 20, synchronous="FULL"),
+    )
+    yield m
+    m.close()
+
+
+def test_pragmas_apply_to_writer_and_readers(manager):
+    with manager.writer() as connection:
+        assert connection.execute("PRAGMA cache_size").fetchone()[0] == -4096
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    with manager.reader() as connection:
+        assert connection.execute("PRAGMA cache_size").fetchone()[0] == -4096
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 2
+
+
+def test_reader_connections_are_read_only(manager):
+    with manager.writer() as connection:
+        connection.execute("CREATE TABLE t (x INTEGER)")
+        connection.commit()
+
+    with manager.reader() as connection, pytest.raises(sqlite3.OperationalError):
+        connection.execute("INSERT INTO t VALUES (1)")
+
+
+def test_reads_do_not_wait_for_writer_lock(manager):
+    store = SQLiteUsageStore(db_path=manager.db_path, connection_manager=manager)
+    store.increment(install_id="inst-1", feature="breakdown")
+
+    writer_held = threading.Event()
+    release_writer = threading.Event()
+
+    def _hold_writer() -> None:
+        with manager.writer():
+            writer_held.set()
+            release_writer.wait(timeout=5)
+
+    holder = threading.Thread(target=_hold_writer)
+    holder.start()
+    try:
+        assert writer_held.wait(timeout=5)
+        assert store.get_total_count(install_id="inst-1", features=["breakdown"]) == 1
+    finally:
+        release_writer.set()
+        holder.join()
+
+
+def test_stores_share_one_manager_and_report_metrics(manager):
+    usage_store = SQLiteUsageStore(db_path=manager.db_path, connection_manager=manager)
+    user_store = SQLiteUserStore(db_path=manager.db_path, connection_manager=manager)
+
+    usage_store.increment(install_id="inst-1", feature="breakdown")
+    user_store.upsert_by_apple_id(apple_user_id="apple.1", install_id="inst-1", display_name=None)
+    assert user_store.get_by_apple_id("apple.1") is not None
+    assert usage_store.dump() == {("inst-1", "breakdown"): 1}
+
+    # Closing stores that do not own the manager leaves it usable.
+    usage_store.close()
+    user_store.close()
+    with manager.reader() as connection:
+        assert connection.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 1
+
+    metrics = manager.metrics()
+    assert metrics.writer_acquisitions >= 4
+    assert metrics.reader_acquisitions >= 3
+    assert metrics.writer_query_seconds > 0
+    assert metrics.reader_lock_wait_seconds >= 0
+
+
+def test_in_memory_database_routes_reads_through_writer():
+    manager = SQLiteConnectionManager(db_path=":memory:", reader_pool_size=4)
+    store = SQLiteUsageStore(db_path=":memory:", connection_manager=manager)
+    store.increment(install_id="inst-1", feature="breakdown")
+
+    assert store.get_total_count(install_id="inst-1", features=["breakdown"]) == 1
+    assert manager.metrics().reader_acquisitions == 0
+    manager.close()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import pytest
+
+from offload_backend.sqlite_connections import SQLiteConnectionManager
+from offload_backend.sqlite_maintenance import SQLiteMaintenance, wal_size_bytes_for
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def manager(tmp_path):
+    m = SQLiteConnectionManager(db_path=str(tmp_path / "usage.sqlite3"), reader_pool_size=1)
+    with m.writer() as connection:
+        connection.execute("CREATE TABLE blobs (id INTEGER PRIMARY KEY, body BLOB)")
+        connection.commit()
+    yield m
+    m.close()
+
+
+def _write_rows(manager: SQLiteConnectionManager, count: int) -> None:
+    with manager.writer() as connection:
+        connection.executemany(
+            "INSERT INTO blobs (body) VALUES (?)", [(b"x" * 4096,) for _ in range(count)]
+        )
+        connection.commit()
+
+
+def test_truncate_checkpoint_when_wal_crosses_threshold(manager):
+    _write_rows(manager, 50)
+    assert wal_size_bytes_for(manager.db_path) > 0
+    maintenance = SQLiteMaintenance([manager], wal_truncate_bytes=1)
+
+    metrics = maintenance.run_once()
+
+    assert metrics.truncate_checkpoints == 1
+    assert metrics.passive_checkpoints == 0
+    assert metrics.wal_size_bytes == 0
+    assert metrics.last_checkpoint_seconds > 0
+
+
+def test_passive_checkpoint_runs_on_schedule(manager):
+    clock = _Clock()
+    maintenance = SQLiteMaintenance(
+        [manager], checkpoint_interval_seconds=60, wal_truncate_bytes=1 << 30, clock=clock
+    )
+    _write_rows(manager, 5)
+
+    assert maintenance.run_once().passive_checkpoints == 0
+    clock.now = 60
+    metrics = maintenance.run_once()
+    assert metrics.passive_checkpoints == 1
+    assert metrics.wal_size_bytes > 0  # PASSIVE never shrinks the file
+
+
+def test_vacuum_and_optimize_wait_for_low_traffic(manager):
+    clock = _Clock()
+    maintenance = SQLiteMaintenance(
+        [manager], optimize_interval_seconds=100, idle_max_operations=3, clock=clock
+    )
+    _write_rows(manager, 50)
+    with manager.writer() as connection:
+        connection.execute("DELETE FROM blobs")
+        connection.commit()
+    clock.now = 100
+    # Five writes since the last run count as traffic, so maintenance waits.
+    for _ in range(5):
+        _write_rows(manager, 1)
+    assert maintenance.run_once().incremental_vacuums == 0
+
+    metrics = maintenance.run_once()
+
+    assert (metrics.incremental_vacuums, metrics.optimizes) == (1, 1)
+    with manager.reader() as connection:
+        assert connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+        assert connection.execute("PRAGMA freelist_count").fetchone()[0] == 0
+
+
+def test_in_memory_databases_are_skipped():
+    manager = SQLiteConnectionManager(db_path=":memory:")
+    maintenance = SQLiteMaintenance([manager], wal_truncate_bytes=0)
+
+    assert maintenance.run_once().truncate_checkpoints == 0
+    manager.close()
+
+
+def test_app_schedules_maintenance_for_every_shard(monkeypatch):
+    from offload_backend.config import get_settings
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_USAGE_SHARD_COUNT", "2")
+    monkeypatch.setenv("OFFLOAD_SQLITE_WAL_TRUNCATE_BYTES", "0")
+    get_settings.cache_clear()
+    app = create_app()
+
+    maintenance = app.state.stores.sqlite_maintenance
+    assert maintenance is not None
+    # Users share the main file; each of the two shards has its own.
+    assert maintenance.run_once().truncate_checkpoints == 3
+    assert "sqlite_maintenance" in [task.name for task in app.state.background_tasks]
+    app.state.stores.close()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import pytest
+
+from offload_backend.token_budget import (
+    TokenBudgetExceeded,
+    TokenBudgetLimiter,
+    estimate_tokens,
+)
+
+
+class _ManualClock:
+    def __init__(self) -> None:
+        self._now = 1000.0
+
+    def now(self) -> float:
+        return self._now
+
+    def advance(self, *, seconds: float) -> None:
+        self._now += seconds
+
+
+def _budget(
+    clock: _ManualClock, *, limit_per_install: int = 1000, global_limit: int = 0
+) -> TokenBudgetLimiter:
+    return TokenBudgetLimiter(
+        limit_per_install=limit_per_install,
+        global_limit=global_limit,
+        window_seconds=60,
+        clock=clock.now,
+    )
+
+
+def test_estimate_tokens_rounds_input_up_and_adds_output_allowance():
+    assert estimate_tokens(input_chars=0, output_tokens=100) == 100
+    assert estimate_tokens(input_chars=9, output_tokens=100) == 103
+
+
+def test_install_budget_rejects_when_window_is_spent():
+    clock = _ManualClock()
+    budget = _budget(clock)
+    budget.reserve(install_id="install-a", estimated_tokens=600)
+    budget.reserve(install_id="install-a", estimated_tokens=400)
+
+    with pytest.raises(TokenBudgetExceeded) as excinfo:
+        budget.reserve(install_id="install-a", estimated_tokens=300)
+    assert excinfo.value.scope == "install_id"
+    # 300 tokens drain back in 300 * 60 / 1000 = 18 seconds.
+    assert excinfo.value.retry_after_seconds == 18
+
+    # Other installs have their own budget.
+    budget.reserve(install_id="install-b", estimated_tokens=1000)
+
+    clock.advance(seconds=18)
+    budget.reserve(install_id="install-a", estimated_tokens=300)
+
+
+def test_rejected_reservation_charges_nothing():
+    clock = _ManualClock()
+    budget = _budget(clock)
+    budget.reserve(install_id="install-a", estimated_tokens=900)
+    with pytest.raises(TokenBudgetExceeded):
+        budget.reserve(install_id="install-a", estimated_tokens=200)
+
+    budget.reserve(install_id="install-a", estimated_tokens=100)
+
+
+def test_global_budget_limits_all_installs():
+    clock = _ManualClock()
+    budget = _budget(clock, limit_per_install=1000, global_limit=1500)
+    budget.reserve(install_id="install-a", estimated_tokens=1000)
+
+    with pytest.raises(TokenBudgetExceeded) as excinfo:
+        budget.reserve(install_id="install-b", estimated_tokens=600)
+    assert excinfo.value.scope == "global"
+    assert excinfo.value.retry_after_seconds == 4
+
+    # The rejected global check left install-b's budget untouched.
+    budget.reserve(install_id="install-b", estimated_tokens=500)
+
+
+def test_reconcile_charges_actual_usage():
+    clock = _ManualClock()
+    budget = _budget(clock)
+    reservation = budget.reserve(install_id="install-a", estimated_tokens=900)
+    reservation.actual_tokens = 100
+    budget.reconcile(reservation)
+
+    budget.reserve(install_id="install-a", estimated_tokens=900)
+
+
+def test_reconcile_overrun_delays_next_reservation():
+    clock = _ManualClock()
+    budget = _budget(clock)
+    reservation = budget.reserve(install_id="install-a", estimated_tokens=100)
+    reservation.actual_tokens = 1000
+    budget.reconcile(reservation)
+
+    with pytest.raises(TokenBudgetExceeded):
+        budget.reserve(install_id="install-a", estimated_tokens=1)
+
+
+def test_release_refunds_reservation():
+    clock = _ManualClock()
+    budget = _budget(clock, global_limit=1000)
+    reservation = budget.reserve(install_id="install-a", estimated_tokens=1000)
+    budget.release(reservation)
+
+    budget.reserve(install_id="install-a", estimated_tokens=1000)
+
+
+def test_oversized_reservation_is_clamped_to_one_window():
+    clock = _ManualClock()
+    budget = _budget(clock, global_limit=800)
+
+    reservation = budget.reserve(install_id="install-a", estimated_tokens=5000)
+    assert reservation.reserved_tokens == 800
+
+    with pytest.raises(TokenBudgetExceeded):
+        budget.reserve(install_id="install-a", estimated_tokens=5000)
+    clock.advance(seconds=60)
+    budget.reserve(install_id="install-a", estimated_tokens=5000)
+
+
+def test_zero_limits_disable_budget():
+    clock = _ManualClock()
+    budget = _budget(clock, limit_per_install=0, global_limit=0)
+    assert not budget.enabled
+    for _ in range(10):
+        budget.reserve(install_id="install-a", estimated_tokens=10**9)
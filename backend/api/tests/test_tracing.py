@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+from conftest import FakeAIProvider
+
+from offload_backend.config import Settings, get_settings
+from offload_backend.dependencies import get_provider
+from offload_backend.providers.openai_adapter import OpenAIProviderAdapter
+from offload_backend.tracing import RingBufferExporter, Tracer, span
+
+ADMIN_TOKEN = "admin-token-for-tests"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_ADMIN_API_TOKEN", ADMIN_TOKEN)
+    monkeypatch.setenv("OFFLOAD_TRACE_SLOW_THRESHOLD_MS", "0")
+    get_settings.cache_clear()
+    return create_app()
+
+
+def test_spans_nest_across_awaits_and_record_errors():
+    exporter = RingBufferExporter()
+    tracer = Tracer(exporter)
+
+    async def step(name: str) -> None:
+        with span(name):
+            await asyncio.sleep(0)
+            with span(f"{name}.inner"):
+                await asyncio.sleep(0)
+
+    async def run() -> None:
+        with tracer.trace("request", trace_id="req-1"):
+            await asyncio.gather(step("a"), step("b"))
+            with pytest.raises(ValueError), span("failing"):
+                raise ValueError("boom")
+
+    asyncio.run(run())
+
+    (trace,) = exporter.slowest()
+    spans = {recorded.name: recorded for recorded in trace.spans}
+    assert trace.trace_id == "req-1"
+    assert spans["a"].parent_id == spans["b"].parent_id == trace.root.span_id
+    assert spans["a.inner"].parent_id == spans["a"].span_id
+    assert spans["b.inner"].parent_id == spans["b"].span_id
+    assert spans["failing"].status == "error"
+    assert spans["failing"].attributes["error"] == "ValueError"
+    assert trace.root.status == "ok"
+
+
+def test_span_outside_a_trace_is_a_no_op():
+    with span("orphan") as orphan:
+        assert orphan is None
+
+
+def test_ring_buffer_keeps_recent_slow_traces_slowest_first():
+    exporter = RingBufferExporter(max_traces=2, min_duration_seconds=0.0)
+    tracer = Tracer(exporter)
+    for trace_id in ("old", "mid", "new"):
+        with tracer.trace("request", trace_id=trace_id) as root:
+            pass
+        # Durations are read from the spans, so set them directly.
+        root.ended_at = root.started_at + {"old": 3.0, "mid": 1.0, "new": 2.0}[trace_id]
+
+    assert [trace.trace_id for trace in exporter.slowest()] == ["new", "mid"]
+    assert [trace.trace_id for trace in exporter.slowest(min_duration_seconds=1.5)] == ["new"]
+    assert RingBufferExporter(min_duration_seconds=60).slowest() == []
+
+
+def test_each_provider_attempt_is_a_child_span():
+    calls = {"count": 0}
+
+    async def no_sleep(delay: float) -> None:
+        _ = delay
+
+    async def flaky_executor(url, payload, headers, timeout):
+        _ = (payload, headers, timeout)
+        calls["count"] += 1
+        if calls["count"] == 1:
+            raise httpx.ReadTimeout("timed out")
+        content = '{"steps":[{"title":"Step 1","substeps":[]}]}'
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": content}}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 4},
+            },
+            request=httpx.Request("POST", url),
+        )
+
+    adapter = OpenAIProviderAdapter(
+        settings=Settings(session_secret="test-secret", openai_api_key="test-key"),
+        request_executor=flaky_executor,
+        sleep_fn=no_sleep,
+    )
+    exporter = RingBufferExporter()
+
+    async def run() -> None:
+        with Tracer(exporter).trace("request", trace_id="req-2"), span("provider.call"):
+            await adapter.generate_breakdown(
+                input_text="Plan a trip", granularity=3, context_hints=[], template_ids=[]
+            )
+
+    asyncio.run(run())
+
+    (trace,) = exporter.slowest()
+    call = next(recorded for recorded in trace.spans if recorded.name == "provider.call")
+    attempts = [recorded for recorded in trace.spans if recorded.name == "provider.attempt"]
+    assert [attempt.parent_id for attempt in attempts] == [call.span_id, call.span_id]
+    assert [attempt.attributes["outcome"] for attempt in attempts] == ["timeout", "ok"]
+    assert [attempt.attributes["attempt"] for attempt in attempts] == [1, 2]
+    assert attempts[0].attributes["feature"] == "breakdown"
+
+
+def test_admin_traces_dump_request_spans(client, app, create_session_token, make_breakdown_payload):
+    app.dependency_overrides[get_provider] = lambda: FakeAIProvider()
+    token = create_session_token()
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "X-Offload-Cloud-Opt-In": "true",
+        "X-Request-ID": "slow-request-1",
+    }
+
+    generated = client.post(
+        "/v1/ai/breakdown/generate", json=make_breakdown_payload(), headers=headers
+    )
+    denied = client.get("/v1/admin/traces", headers={"X-Offload-Admin-Token": "wrong"})
+    response = client.get(
+        "/v1/admin/traces", params={"limit": 50}, headers={"X-Offload-Admin-Token": ADMIN_TOKEN}
+    )
+
+    assert generated.status_code == 200
+    assert denied.status_code == 401
+    assert response.status_code == 200
+    (trace,) = [t for t in response.json()["traces"] if t["trace_id"] == "slow-request-1"]
+    spans = {span_report["name"]: span_report for span_report in trace["spans"]}
+    root = trace["spans"][0]
+    assert root["name"] == "http.request"
+    assert root["attributes"]["route"] == "/v1/ai/breakdown/generate"
+    assert root["attributes"]["status_code"] == 200
+    assert {
+        "auth.session_claims",
+        "quota.check",
+        "rate_limit.check",
+        "token_budget.reserve",
+        "provider.call",
+        "usage_store.increment",
+    } <= spans.keys()
+    span_ids = {span_report["span_id"] for span_report in trace["spans"]}
+    assert all(span_report["parent_id"] in span_ids for span_report in trace["spans"][1:])
+    assert spans["rate_limit.check"]["attributes"]["limiter"] == "ai_inference"
+
+    app.dependency_overrides.clear()
+
+
+def test_admin_traces_require_tracing(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_ADMIN_API_TOKEN", ADMIN_TOKEN)
+    monkeypatch.setenv("OFFLOAD_TRACING_ENABLED", "false")
+    get_settings.cache_clear()
+
+    with TestClient(create_app()) as client:
+        response = client.get("/v1/admin/traces", headers={"X-Offload-Admin-Token": ADMIN_TOKEN})
+
+    assert response.status_code == 409
+    assert response.json()["error"]["code"] == "tracing_not_configured"
@@ -43,3 +43,110 @@ def test_install_id_mismatch_is_rejected(create_session_token, post_usage_reconc
 
     assert response.status_code == 403
     assert response.json()["error"]["code"] == "install_id_mismatch"
+
+
+def test_batch_reconcile_returns_every_submitted_counter(
+    create_session_token,
+    post_usage_reconcile_batch,
+):
+    token = create_session_token()
+
+    response = post_usage_reconcile_batch(
+        authorization=f"Bearer {token}",
+        counters={"breakdown": 3, "decide": 1},
+    )
+
+    assert response.status_code == 200
+    counters = response.json()["counters"]
+    assert [(c["feature"], c["server_count"], c["effective_remaining"]) for c in counters] == [
+        ("breakdown", 3, 7),
+        ("decide", 1, 9),
+    ]
+    assert all(c["updated_at"] for c in counters)
+
+
+def test_batch_reconcile_since_returns_only_server_side_changes(
+    app,
+    create_session_token,
+    post_usage_reconcile_batch,
+):
+    token = create_session_token()
+    post_usage_reconcile_batch(
+        authorization=f"Bearer {token}",
+        counters={"breakdown": 3, "decide": 1},
+    )
+    with app.state.usage_store.connection_manager.writer() as connection:
+        connection.execute("UPDATE usage_counts SET updated_at = '2020-01-01 00:00:00'")
+        connection.commit()
+    app.state.usage_store.increment(install_id="install-12345", feature="draft")
+
+    response = post_usage_reconcile_batch(
+        authorization=f"Bearer {token}",
+        counters={"breakdown": 2, "decide": 4},
+        since="2021-01-01T00:00:00Z",
+    )
+
+    assert response.status_code == 200
+    counters = response.json()["counters"]
+    # The stale breakdown count changed nothing and decide was raised to the
+    # client's own count; only draft changed server-side.
+    assert [(c["feature"], c["server_count"]) for c in counters] == [("draft", 1)]
+
+
+def test_batch_reconcile_rejects_install_id_mismatch(
+    create_session_token,
+    post_usage_reconcile_batch,
+):
+    token = create_session_token(install_id="install-12345")
+
+    response = post_usage_reconcile_batch(
+        authorization=f"Bearer {token}",
+        install_id="different-install",
+        counters={"breakdown": 1},
+    )
+
+    assert response.status_code == 403
+    assert response.json()["error"]["code"] == "install_id_mismatch"
+
+
+def test_usage_summary_reports_counts_and_remaining(app, client, create_session_token):
+    token = create_session_token()
+    app.state.usage_store.reconcile(install_id="install-12345", feature="breakdown", local_count=3)
+    app.state.usage_store.increment(install_id="install-12345", feature="draft")
+
+    response = client.get("/v1/usage/summary", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [(f["feature"], f["count"]) for f in body["features"]] == [
+        ("breakdown", 3),
+        ("draft", 1),
+    ]
+    # Only AI_FEATURES count toward the shared quota.
+    assert (body["quota"], body["used"], body["remaining"]) == (10, 3, 7)
+    assert response.headers["ETag"].startswith('"')
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+def test_usage_summary_honors_if_none_match(app, client, create_session_token):
+    token = create_session_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    app.state.usage_store.increment(install_id="install-12345", feature="breakdown")
+    etag = client.get("/v1/usage/summary", headers=headers).headers["ETag"]
+
+    not_modified = client.get("/v1/usage/summary", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    app.state.usage_store.increment(install_id="install-12345", feature="breakdown")
+    changed = client.get("/v1/usage/summary", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["used"] == 2
+
+
+def test_usage_summary_requires_session(client):
+    response = client.get("/v1/usage/summary")
+
+    assert response.status_code == 401
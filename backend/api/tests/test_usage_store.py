@@ -1,8 +1,24 @@
 from __future__ import annotations
 
+import csv
+import io
+import json
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import UTC, datetime
 
-from offload_backend.usage_store import InMemoryUsageStore, SQLiteUsageStore
+import pytest
+
+from offload_backend.admin_cli import main as admin_main
+from offload_backend.admin_cli import write_usage_export
+from offload_backend.usage_store import (
+    InMemoryUsageStore,
+    ShardedSQLiteUsageStore,
+    SQLiteUsageStore,
+    reshard_usage_databases,
+    shard_db_paths,
+    shard_index,
+)
 
 
 def test_sqlite_usage_store_persists_across_restart(tmp_path):
@@ -48,6 +64,28 @@ def test_in_memory_increment_increases_count():
     assert store.get_total_count(install_id="inst-1", features=["breakdown", "braindump"]) == 3
 
 
+def test_in_memory_reconcile_many_since_reports_only_server_side_changes():
+    store = InMemoryUsageStore()
+    store.reconcile_many(install_id="inst-1", local_counts={"breakdown": 3, "decide": 1})
+    store.reconcile(install_id="inst-2", feature="draft", local_count=4)
+    checkpoint = datetime.now(UTC)
+    store.increment(install_id="inst-1", feature="draft")
+
+    changed = store.reconcile_many(
+        install_id="inst-1",
+        local_counts={"breakdown": 2, "decide": 5},
+        since=checkpoint,
+    )
+
+    # breakdown did not change and decide is exactly what the client sent.
+    assert [(r.feature, r.count) for r in changed] == [("draft", 1)]
+    assert store.dump()[("inst-1", "decide")] == 5
+    everything = store.reconcile_many(
+        install_id="inst-1", local_counts={}, since=datetime(2019, 1, 1)
+    )
+    assert [r.feature for r in everything] == ["breakdown", "decide", "draft"]
+
+
 def test_sqlite_get_total_count_sums_across_features(tmp_path):
     db_path = tmp_path / "usage.sqlite3"
     store = SQLiteUsageStore(db_path=str(db_path))
@@ -116,3 +154,352 @@ def test_sqlite_usage_store_reconcile_is_atomic_under_concurrency(tmp_path):
 
     store_a.close()
     store_b.close()
+
+
+def test_shard_index_is_stable_and_in_range():
+    assert shard_index("install-1", 8) == shard_index("install-1", 8)
+    indices = {shard_index(f"install-{i}", 4) for i in range(200)}
+    assert indices == {0, 1, 2, 3}
+
+
+def test_single_shard_layout_is_the_base_file(tmp_path):
+    base = str(tmp_path / "usage.sqlite3")
+    assert shard_db_paths(base, 1) == [base]
+    assert shard_db_paths(base, 2) == [
+        str(tmp_path / "usage.shard-0-of-2.sqlite3"),
+        str(tmp_path / "usage.shard-1-of-2.sqlite3"),
+    ]
+
+
+def test_sharded_store_routes_rows_to_one_shard(tmp_path):
+    store = ShardedSQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"), shard_count=4)
+
+    for i in range(40):
+        store.increment(install_id=f"inst-{i}", feature="breakdown")
+    store.reconcile(install_id="inst-0", feature="decide", local_count=5)
+
+    assert store.get_total_count(install_id="inst-0", features=["breakdown", "decide"]) == 6
+    for index in range(store.shard_count):
+        for install_id, _ in store.dump_shard(index):
+            assert shard_index(install_id, 4) == index
+    assert len(store.dump()) == 41
+    store.close()
+
+
+def test_reshard_preserves_counts(tmp_path):
+    db_path = str(tmp_path / "usage.sqlite3")
+    source = SQLiteUsageStore(db_path=db_path)
+    for i in range(25):
+        source.reconcile(install_id=f"inst-{i}", feature="breakdown", local_count=i)
+    expected = source.dump()
+    source.close()
+
+    assert reshard_usage_databases(db_path=db_path, from_shards=1, to_shards=4) == 25
+    # Re-running is idempotent.
+    assert reshard_usage_databases(db_path=db_path, from_shards=1, to_shards=4) == 25
+
+    sharded = ShardedSQLiteUsageStore(db_path=db_path, shard_count=4)
+    assert sharded.dump() == expected
+    sharded.close()
+
+
+def test_reshard_rejects_missing_source(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        reshard_usage_databases(
+            db_path=str(tmp_path / "usage.sqlite3"), from_shards=2, to_shards=4
+        )
+
+
+def test_admin_cli_reshard_usage(tmp_path):
+    db_path = str(tmp_path / "usage.sqlite3")
+    sharded = ShardedSQLiteUsageStore(db_path=db_path, shard_count=2)
+    sharded.increment(install_id="inst-1", feature="breakdown")
+    sharded.close()
+
+    exit_code = admin_main(
+        ["reshard-usage", "--db-path", db_path, "--from-shards", "2", "--to-shards", "1"]
+    )
+
+    assert exit_code == 0
+    merged = SQLiteUsageStore(db_path=db_path)
+    assert merged.dump() == {("inst-1", "breakdown"): 1}
+    merged.close()
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 1000])
+def test_sqlite_iter_usage_pages_in_key_order(tmp_path, page_size):
+    store = SQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"))
+    for i in range(7):
+        store.reconcile(install_id=f"inst-{i}", feature="breakdown", local_count=i)
+        store.reconcile(install_id=f"inst-{i}", feature="decide", local_count=1)
+
+    records = list(store.iter_usage(page_size=page_size))
+
+    keys = [(r.install_id, r.feature) for r in records]
+    assert keys == sorted(keys)
+    assert len(records) == 14
+    assert all(r.updated_at for r in records)
+    assert store.dump() == {key: r.count for key, r in zip(keys, records, strict=True)}
+    store.close()
+
+
+def test_sqlite_iter_usage_releases_connection_between_pages(tmp_path):
+    store = SQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"))
+    for i in range(4):
+        store.increment(install_id=f"inst-{i}", feature="breakdown")
+
+    records = store.iter_usage(page_size=2)
+    first = next(records)
+    # A write between pages neither blocks nor is blocked by the export.
+    store.increment(install_id="inst-9", feature="breakdown")
+    remaining = list(records)
+
+    assert first.install_id == "inst-0"
+    assert [r.install_id for r in remaining] == ["inst-1", "inst-2", "inst-3", "inst-9"]
+    store.close()
+
+
+def test_in_memory_and_sharded_iter_usage_cover_all_rows(tmp_path):
+    memory = InMemoryUsageStore()
+    sharded = ShardedSQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"), shard_count=3)
+    for i in range(10):
+        memory.increment(install_id=f"inst-{i}", feature="breakdown")
+        sharded.increment(install_id=f"inst-{i}", feature="breakdown")
+
+    memory_keys = [(r.install_id, r.feature) for r in memory.iter_usage(page_size=3)]
+    assert memory_keys == sorted(memory.dump())
+    assert {(r.install_id, r.feature) for r in sharded.iter_usage(page_size=3)} == set(
+        memory_keys
+    )
+    sharded.close()
+
+
+def test_in_memory_iter_usage_pages_keys_in_order_as_they_arrive():
+    store = InMemoryUsageStore()
+    for install_id in ("inst-5", "inst-1", "inst-3"):
+        store.increment(install_id=install_id, feature="decide")
+        store.reconcile(install_id=install_id, feature="breakdown", local_count=2)
+
+    pages = store.iter_usage(page_size=2)
+    first = [next(pages), next(pages)]
+    # Keys added between pages are visible if they sort after the cursor.
+    store.increment(install_id="inst-0", feature="breakdown")
+    store.increment(install_id="inst-9", feature="breakdown")
+    rest = list(pages)
+
+    assert [(r.install_id, r.feature) for r in first] == [
+        ("inst-1", "breakdown"),
+        ("inst-1", "decide"),
+    ]
+    assert [(r.install_id, r.feature) for r in rest] == [
+        ("inst-3", "breakdown"),
+        ("inst-3", "decide"),
+        ("inst-5", "breakdown"),
+        ("inst-5", "decide"),
+        ("inst-9", "breakdown"),
+    ]
+
+
+def test_iter_usage_rejects_non_positive_page_size():
+    with pytest.raises(ValueError, match="page_size"):
+        list(InMemoryUsageStore().iter_usage(page_size=0))
+
+
+def test_write_usage_export_formats():
+    store = InMemoryUsageStore()
+    store.reconcile(install_id="inst-1", feature="breakdown", local_count=2)
+    store.reconcile(install_id="inst-2", feature="decide", local_count=1)
+
+    ndjson = io.StringIO()
+    assert write_usage_export(store.iter_usage(), ndjson, fmt="ndjson") == 2
+    lines = [json.loads(line) for line in ndjson.getvalue().splitlines()]
+    assert lines[0] == {
+        "install_id": "inst-1", "feature": "breakdown", "count": 2, "updated_at": None
+    }
+
+    csv_output = io.StringIO()
+    assert write_usage_export(store.iter_usage(), csv_output, fmt="csv") == 2
+    rows = list(csv.reader(io.StringIO(csv_output.getvalue())))
+    assert rows[0] == ["install_id", "feature", "count", "updated_at"]
+    assert rows[2] == ["inst-2", "decide", "1", ""]
+
+
+def test_admin_cli_export_usage_writes_ndjson(tmp_path, capsys):
+    from offload_backend.config import get_settings
+
+    store = SQLiteUsageStore(db_path=get_settings().usage_db_path)
+    store.reconcile(install_id="inst-1", feature="breakdown", local_count=3)
+    store.close()
+    output = tmp_path / "usage.ndjson"
+
+    assert admin_main(["export-usage", "--output", str(output), "--page-size", "1"]) == 0
+
+    exported = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [(row["install_id"], row["count"]) for row in exported] == [("inst-1", 3)]
+    assert "exported 1 usage rows" in capsys.readouterr().err
+
+
+def test_event_log_counts_before_and_after_compaction(tmp_path):
+    store = SQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"), event_log=True)
+    for _ in range(3):
+        store.increment(install_id="inst-1", feature="breakdown", tokens=10)
+    store.increment(install_id="inst-1", feature="decide", tokens=5)
+
+    # Uncompacted events still count toward quota checks.
+    assert store.get_total_count(install_id="inst-1", features=["breakdown", "decide"]) == 4
+
+    assert store.compact(batch_size=2) == 2
+    assert store.compact() == 2
+    assert store.compact() == 0
+
+    assert store.get_total_count(install_id="inst-1", features=["breakdown", "decide"]) == 4
+    daily = store.daily_usage(install_id="inst-1")
+    assert [(row.feature, row.count, row.tokens) for row in daily] == [
+        ("breakdown", 3, 30),
+        ("decide", 1, 5),
+    ]
+    store.close()
+
+
+def test_event_log_reconcile_folds_pending_events(tmp_path):
+    store = SQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"), event_log=True)
+    store.increment(install_id="inst-1", feature="breakdown")
+    store.increment(install_id="inst-1", feature="breakdown")
+
+    assert store.reconcile(install_id="inst-1", feature="breakdown", local_count=1) == 2
+    assert store.reconcile(install_id="inst-1", feature="breakdown", local_count=5) == 5
+    assert store.dump() == {("inst-1", "breakdown"): 5}
+    store.close()
+
+
+def test_event_log_concurrent_increments_are_not_lost(tmp_path):
+    store = SQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"), event_log=True)
+
+    def _increment(_: int) -> None:
+        store.increment(install_id="inst-1", feature="breakdown", tokens=1)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(_increment, range(200)))
+        pool.submit(store.compact, batch_size=50).result()
+
+    assert store.get_total_count(install_id="inst-1", features=["breakdown"]) == 200
+    store.compact()
+    assert store.daily_usage(install_id="inst-1")[0].tokens == 200
+    store.close()
+
+
+def test_app_compacts_usage_events_on_shutdown(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from offload_backend.config import get_settings
+    from offload_backend.main import create_app
+
+    monkeypatch.setenv("OFFLOAD_USAGE_EVENT_LOG_ENABLED", "true")
+    monkeypatch.setenv("OFFLOAD_USAGE_COMPACTION_INTERVAL_SECONDS", "3600")
+    # Shutdown keeps folding batches until no events remain.
+    monkeypatch.setenv("OFFLOAD_USAGE_COMPACTION_BATCH_SIZE", "2")
+    get_settings.cache_clear()
+    app = create_app()
+
+    with TestClient(app):
+        for tokens in (1, 2, 4):
+            app.state.usage_store.increment(
+                install_id="inst-1", feature="breakdown", tokens=tokens
+            )
+
+    store = SQLiteUsageStore(db_path=get_settings().usage_db_path)
+    with store.connection_manager.reader() as connection:
+        assert connection.execute("SELECT COUNT(*) FROM usage_events").fetchone()[0] == 0
+    assert store.daily_usage(install_id="inst-1")[0].tokens == 7
+    store.close()
+
+
+def test_sqlite_reconcile_many_only_bumps_updated_at_on_change(tmp_path):
+    store = SQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"), event_log=True)
+    store.reconcile_many(install_id="inst-1", local_counts={"breakdown": 3, "decide": 1})
+    with store.connection_manager.writer() as connection:
+        connection.execute("UPDATE usage_counts SET updated_at = '2020-01-01 00:00:00'")
+        connection.commit()
+    # Pending events are folded before the delta is computed.
+    store.increment(install_id="inst-1", feature="draft")
+
+    changed = store.reconcile_many(
+        install_id="inst-1",
+        local_counts={"breakdown": 3, "decide": 2},
+        since=datetime(2021, 1, 1, tzinfo=UTC),
+    )
+
+    # decide was raised to the client's own count, so it is not echoed back.
+    assert [(r.feature, r.count) for r in changed] == [("draft", 1)]
+    everything = store.reconcile_many(
+        install_id="inst-1", local_counts={}, since=datetime(2019, 1, 1)
+    )
+    assert [(r.feature, r.count) for r in everything] == [
+        ("breakdown", 3),
+        ("decide", 2),
+        ("draft", 1),
+    ]
+    store.close()
+
+
+def test_sqlite_summary_is_cached_until_a_write(tmp_path):
+    store = SQLiteUsageStore(
+        db_path=str(tmp_path / "usage.sqlite3"),
+        event_log=True,
+        summary_cache_ttl_seconds=60,
+    )
+    store.reconcile(install_id="inst-1", feature="breakdown", local_count=2)
+    store.increment(install_id="inst-1", feature="breakdown")
+
+    first = store.get_summary(install_id="inst-1")
+    reads = store.connection_manager.metrics().reader_acquisitions
+    assert store.get_summary(install_id="inst-1") is first
+    assert store.connection_manager.metrics().reader_acquisitions == reads
+    # Uncompacted events are included.
+    assert [(r.feature, r.count) for r in first.records] == [("breakdown", 3)]
+
+    store.increment(install_id="inst-1", feature="decide")
+    second = store.get_summary(install_id="inst-1")
+    assert second.etag != first.etag
+    assert [(r.feature, r.count) for r in second.records] == [("breakdown", 3), ("decide", 1)]
+    store.close()
+
+
+def test_sqlite_summary_read_racing_a_write_is_not_cached(tmp_path, monkeypatch):
+    store = SQLiteUsageStore(
+        db_path=str(tmp_path / "usage.sqlite3"),
+        event_log=True,
+        summary_cache_ttl_seconds=60,
+    )
+    store.increment(install_id="inst-1", feature="breakdown")
+    reader = store.connection_manager.reader
+
+    @contextmanager
+    def reader_then_write():
+        with reader() as connection:
+            yield connection
+        # Lands after the summary query but before it is cached.
+        store.increment(install_id="inst-1", feature="breakdown")
+
+    monkeypatch.setattr(store.connection_manager, "reader", reader_then_write)
+    stale = store.get_summary(install_id="inst-1")
+    monkeypatch.setattr(store.connection_manager, "reader", reader)
+
+    assert [(r.feature, r.count) for r in stale.records] == [("breakdown", 1)]
+    fresh = store.get_summary(install_id="inst-1")
+    assert [(r.feature, r.count) for r in fresh.records] == [("breakdown", 2)]
+    store.close()
+
+
+def test_in_memory_summary_and_empty_summary_etag(tmp_path):
+    memory = InMemoryUsageStore()
+    sqlite_store = SQLiteUsageStore(db_path=str(tmp_path / "usage.sqlite3"))
+    for store in (memory, sqlite_store):
+        store.reconcile(install_id="inst-1", feature="breakdown", local_count=2)
+
+    assert memory.get_summary(install_id="inst-1").records[0].count == 2
+    assert memory.get_summary(install_id="inst-2").records == ()
+    assert sqlite_store.get_summary(install_id="inst-2").etag == memory.get_summary(
+        install_id="inst-2"
+    ).etag
+    sqlite_store.close()
@@ -0,0 +1,50 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from offload_backend.usage_store import ShardedSQLiteUsageStore
+
+INCREMENTS = 2000
+WORKERS = 8
+
+
+def _increments_per_second(db_path: str, shard_count: int) -> float:
+    store = ShardedSQLiteUsageStore(db_path=db_path, shard_count=shard_count)
+    try:
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            list(
+                pool.map(
+                    lambda i: store.increment(install_id=f"install-{i % 500}", feature="breakdown"),
+                    range(INCREMENTS),
+                )
+            )
+        elapsed = time.perf_counter() - started_at
+        assert sum(store.dump().values()) == INCREMENTS
+    finally:
+        store.close()
+    return INCREMENTS / elapsed
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    bool(os.environ.get('CI')) and not os.environ.get('OFFLOAD_RUN_BENCHMARKS'),
+    reason='Skipped in CI unless OFFLOAD_RUN_BENCHMARKS=1',
+)
+def test_sharded_usage_store_increment_throughput(tmp_path):
+    """Report increments/sec at 1, 4 and 8 shards with concurrent writers."""
+
+    results = {
+        shard_count: _increments_per_second(
+            str(tmp_path / f"bench-{shard_count}" / "usage.sqlite3"), shard_count
+        )
+        for shard_count in (1, 4, 8)
+    }
+
+    print(f'\n--- Usage increments/sec ({WORKERS} writers, {INCREMENTS} increments) ---')
+    for shard_count, rate in results.items():
+        print(f'  {shard_count} shard(s): {rate:,.0f}/s')
+
+    assert all(rate > 0 for rate in results.values())
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import pytest
 
+from offload_backend.sqlite_connections import SQLiteConnectionManager
 from offload_backend.user_store import SQLiteUserStore
 
 
@@ -87,3 +88,81 @@ def test_different_apple_ids_produce_different_user_ids(store):
     )
 
     assert a.user_id != b.user_id
+
+
+def test_unchanged_sign_in_skips_the_writer(tmp_path):
+    manager = SQLiteConnectionManager(db_path=str(tmp_path / "usage.sqlite3"))
+    store = SQLiteUserStore(db_path=manager.db_path, connection_manager=manager)
+    created = store.upsert_by_apple_id(
+        apple_user_id="apple.sub.1", install_id="install-abc", display_name="Name"
+    )
+    before = manager.metrics()
+
+    for display_name in ("Name", None):
+        again = store.upsert_by_apple_id(
+            apple_user_id="apple.sub.1", install_id="install-abc", display_name=display_name
+        )
+        assert again == created
+
+    assert manager.metrics().writer_acquisitions == before.writer_acquisitions
+    manager.close()
+
+
+def test_sign_in_decides_from_the_stored_row(tmp_path):
+    db_path = str(tmp_path / "usage.sqlite3")
+    first = SQLiteUserStore(db_path=db_path)
+    second = SQLiteUserStore(db_path=db_path)
+    first.upsert_by_apple_id(
+        apple_user_id="apple.sub.1", install_id="install-abc", display_name=None
+    )
+    second.upsert_by_apple_id(
+        apple_user_id="apple.sub.1", install_id="install-xyz", display_name=None
+    )
+
+    # first last wrote install-abc, but the stored row now says install-xyz.
+    restored = first.upsert_by_apple_id(
+        apple_user_id="apple.sub.1", install_id="install-abc", display_name=None
+    )
+
+    assert restored.install_id == "install-abc"
+    assert second.get_by_apple_id("apple.sub.1") == restored
+    first.close()
+    second.close()
+
+
+def test_changed_sign_in_writes_and_returns_the_new_row(tmp_path):
+    manager = SQLiteConnectionManager(db_path=str(tmp_path / "usage.sqlite3"))
+    store = SQLiteUserStore(db_path=manager.db_path, connection_manager=manager)
+    store.upsert_by_apple_id(
+        apple_user_id="apple.sub.1", install_id="install-abc", display_name=None
+    )
+    writes = manager.metrics().writer_acquisitions
+
+    moved = store.upsert_by_apple_id(
+        apple_user_id="apple.sub.1", install_id="install-xyz", display_name=None
+    )
+
+    assert manager.metrics().writer_acquisitions == writes + 1
+    assert moved.install_id == "install-xyz"
+    assert store.get_by_apple_id("apple.sub.1") == moved
+    manager.close()
+
+
+def test_get_by_apple_id_sees_changes_from_other_stores(tmp_path):
+    db_path = str(tmp_path / "usage.sqlite3")
+    reader = SQLiteUserStore(db_path=db_path)
+    writer = SQLiteUserStore(db_path=db_path)
+    writer.upsert_by_apple_id(
+        apple_user_id="apple.sub.1", install_id="install-abc", display_name=None
+    )
+    first = reader.get_by_apple_id("apple.sub.1")
+    assert first is not None and first.install_id == "install-abc"
+
+    writer.upsert_by_apple_id(
+        apple_user_id="apple.sub.1", install_id="install-xyz", display_name=None
+    )
+
+    second = reader.get_by_apple_id("apple.sub.1")
+    assert second is not None and second.install_id == "install-xyz"
+    reader.close()
+    writer.close()